@@ -5,18 +5,58 @@ import json
 import time
 import logging
 import secrets
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify, redirect, url_for
-
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+from flask import Flask, Response, request, jsonify
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from core.http_cache import VersionCache, etag_cache, make_etag, client_has_etag, apply_private_caching, not_modified
+from core.json_provider import init_json_provider
+from core.compression import init_compression
+from core.events import event_hub
+from core.metrics import registry, stage_timer, init_request_metrics
+from core.profiler import profiler, init_profiler
+from core.logging_setup import setup_logging, SAMPLED
+from core.health import health_prober
+from core.rate_limit import rate_limiter
+from core.admission import admission_controller, init_admission
+from core.page_cache import page_cache, context_hash
+from core.assets import init_assets
+from database.event_log import event_recorder
+from game.journal import action_journal
+
+# ✅ Logging assíncrono: a thread da requisição só enfileira o registro
+setup_logging()
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# ✅ JSON rápido (orjson) e compressão negociada (br/gzip) das respostas
+init_json_provider(app)
+init_compression(app)
+# ✅ Assets com hash (manifest de tools/build_assets.py) e cache imutável em /assets
+init_assets(app)
+init_request_metrics(app)
+init_profiler(app, profiler)
+# ✅ Sob sobrecarga, descartar primeiro health/perfil/ranking e preservar os saves.
+# /healthz fica isento: recusar o liveness faria o Render reiniciar a instância.
+init_admission(app, admission_controller, priorities={
+    'system_health': 'low',
+    'profile': 'low',
+    'user_profile': 'low',
+    'user_overview': 'low',
+    'save_game_state': 'high',
+    'patch_game_state': 'high',
+    'game_batch': 'high',
+}, exempt=('health_check', 'metrics', 'admin_profiler', 'event_stream', 'serve_asset'))
+
 # ✅ CONFIGURAÇÃO MÍNIMA - Sem sessões complexas
 app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 
+# ✅ Tickets curtos do stream SSE: o EventSource só passa credenciais na URL, e o
+# ID token do Firebase não deve ir para os logs de acesso. Assinados com a
+# SECRET_KEY (o gunicorn.conf.py garante a mesma chave em todos os workers)
+STREAM_TICKET_TTL = int(os.environ.get('SSE_TICKET_TTL_SECONDS', 60))
+stream_tickets = URLSafeTimedSerializer(app.secret_key, salt='sse-stream')
+
 # ✅ CORREÇÃO: Importar e inicializar managers em ordem
 try:
     from auth.auth_manager import auth_manager, require_auth, initialize_auth_manager
@@ -44,7 +84,7 @@ except Exception as e:
         return decorated_function
 
 try:
-    from game.game_logic import GameManager
+    from game.game_logic import GameManager, MAX_BATCH_ACTIONS, SAVE_FAILED_ERROR
     game_manager = GameManager()
     logger.info("✅ GameManager carregado")
 except Exception as e:
@@ -52,16 +92,81 @@ except Exception as e:
     game_manager = None
 
 try:
-    from database.db_models import DatabaseManager
-    db_manager = DatabaseManager()
+    from database.db_models import get_database_manager
+    db_manager = get_database_manager()
     logger.info("✅ DatabaseManager carregado")
 except Exception as e:
     logger.warning(f"⚠️ DatabaseManager não disponível: {e}")
     db_manager = None
 
+# ✅ SSE: ranking consultado uma vez por worker e empurrado a todos os clientes conectados
+if db_manager:
+    event_hub.configure_leaderboard(
+        lambda: db_manager.get_ranking(10),
+        interval=float(os.environ.get('SSE_LEADERBOARD_INTERVAL', 15))
+    )
+
+# ✅ Gauges expostos em /metrics (coletados apenas no scrape)
+def _pool_gauge():
+    if not db_manager:
+        return {('in_use',): 0, ('idle',): 0, ('max',): 0}
+    return {(state,): count for state, count in db_manager.pool_stats().items()}
+
+def _replica_gauge():
+    replicas = getattr(db_manager, 'replicas', None)
+    if not replicas:
+        return {}
+    return {(name,): int(stats['healthy']) for name, stats in replicas.stats().items()}
+
+registry.gauge('popcoin_db_pool_connections', 'Conexões do pool do banco por estado', _pool_gauge, ('state',))
+registry.gauge('popcoin_db_replica_healthy', 'Réplicas de leitura em rotação (1) ou afastadas após falha (0)',
+               _replica_gauge, ('replica',))
+registry.gauge('popcoin_etag_cache_entries', 'Entradas no cache de ETags', lambda: len(etag_cache))
+registry.gauge('popcoin_etag_cache_lookups', 'Consultas ao cache de ETags por resultado',
+               lambda: {('hit',): etag_cache.hits, ('miss',): etag_cache.misses}, ('result',))
+registry.gauge('popcoin_sse_connections', 'Conexões SSE abertas neste worker', event_hub.connection_count)
+registry.gauge('popcoin_sse_events', 'Eventos SSE entregues e descartados por backpressure',
+               lambda: {('published',): event_hub.published, ('dropped',): event_hub.dropped,
+                        ('rejected',): event_hub.rejected}, ('result',))
+registry.gauge('popcoin_rate_limit_buckets', 'Buckets de rate limit em memória neste worker',
+               lambda: len(rate_limiter.backend))
+registry.gauge('popcoin_page_cache_entries', 'Páginas HTML renderizadas em cache', lambda: len(page_cache))
+registry.gauge('popcoin_game_events_buffered', 'Eventos do jogo aguardando o COPY neste worker',
+               lambda: len(event_recorder))
+registry.gauge('popcoin_dropped_saves', 'Saves descartados por serem antigos ou duplicados',
+               lambda: db_manager.dropped_saves if db_manager else 0)
+
+# ✅ Health checks rodam em segundo plano; os endpoints só leem o snapshot
+def _database_health():
+    if not db_manager:
+        return {'healthy': False, 'message': 'DatabaseManager não carregado'}
+    return db_manager.health_check()
+
+def _pool_health():
+    stats = db_manager.pool_stats() if db_manager else {'in_use': 0, 'idle': 0, 'max': 0}
+    # Só o Postgres (um banco ou shards) tem pool; SQLite e memória não esgotam conexões
+    if db_manager and not db_manager.engine.startswith('postgres'):
+        return {'healthy': True, 'engine': db_manager.engine, **stats}
+    return {
+        'healthy': stats['max'] > 0 and stats['in_use'] < stats['max'],
+        **stats
+    }
+
+health_prober.register('database', _database_health)
+health_prober.register('pool', _pool_health)
+health_prober.register('authentication', lambda: {'healthy': bool(auth_manager and auth_manager.is_initialized())})
+health_prober.register('game_system', lambda: {'healthy': game_manager is not None})
+
+registry.gauge('popcoin_health_check_ok', 'Resultado do último health check por componente',
+               lambda: {(name,): int(result['healthy'])
+                        for name, result in health_prober.snapshot()['checks'].items()}, ('check',))
+registry.gauge('popcoin_health_snapshot_age_seconds', 'Idade do último snapshot de health',
+               lambda: health_prober.snapshot()['age_seconds'])
+
 # ✅ CACHE para configuração Firebase
 firebase_config_cache = None
 firebase_config_loaded = False
+firebase_config_hash = None
 
 def get_firebase_config():
     """Obter configuração Firebase (com cache e fallback)"""
@@ -73,7 +178,7 @@ def get_firebase_config():
     try:
         if auth_manager and auth_manager.is_initialized():
             firebase_config_cache = auth_manager.get_firebase_config_for_frontend()
-            logger.info("✅ Configuração Firebase carregada do AuthManager")
+            logger.debug("✅ Configuração Firebase carregada do AuthManager")
         else:
             # Fallback direto das variáveis de ambiente
             firebase_config_cache = {
@@ -84,7 +189,7 @@ def get_firebase_config():
                 'messagingSenderId': os.environ.get('NEXT_PUBLIC_FIREBASE_MESSAGING_SENDER_ID', '337350823197'),
                 'appId': os.environ.get('NEXT_PUBLIC_FIREBASE_APP_ID', '1:337350823197:web:4928ae4827e21c585da5f4')
             }
-            logger.info("✅ Configuração Firebase carregada do ambiente")
+            logger.debug("✅ Configuração Firebase carregada do ambiente")
         
         firebase_config_loaded = True
         return firebase_config_cache
@@ -93,28 +198,52 @@ def get_firebase_config():
         logger.error(f"❌ Erro ao obter configuração Firebase: {e}")
         return {}
 
+# ✅ Visão geral do perfil em cache curto por usuário (ETag + payload)
+overview_cache = VersionCache(
+    ttl=float(os.environ.get('OVERVIEW_CACHE_TTL', 5)),
+    max_entries=int(os.environ.get('OVERVIEW_CACHE_MAX_ENTRIES', 5000))
+)
+OVERVIEW_RANKING_SIZE = int(os.environ.get('OVERVIEW_RANKING_SIZE', 10))
+
+def invalidate_user_cache(user_id):
+    """Descarta os ETags em cache do usuário após qualquer escrita"""
+    etag_cache.invalidate(('game_state', user_id))
+    etag_cache.invalidate(('profile', user_id))
+    overview_cache.invalidate(('overview', user_id))
+
+def record_signup(user_id, provisioned):
+    """Estado inicial do cadastro como primeiro ponto de partida do diário"""
+    game_data = provisioned.get('game_data')
+    if game_data:
+        action_journal.record_snapshot(user_id, game_data)
+
+def serve_page(template):
+    """Serve o shell HTML do cache (renderizado uma vez por template + config)"""
+    global firebase_config_hash
+    firebase_config = get_firebase_config()
+    if firebase_config_hash is None:
+        firebase_config_hash = context_hash(firebase_config)
+    return page_cache.serve(template, firebase_config_hash, lambda: {'firebase_config': firebase_config})
+
 # ========== ROTAS PRINCIPAIS ==========
 
 @app.route('/')
 def index():
     """Página inicial - PÚBLICA (apenas login)"""
-    logger.info("🏠 Página inicial (login)")
-    firebase_config = get_firebase_config()
-    return render_template('index.html', firebase_config=firebase_config)
+    logger.debug("🏠 Página inicial (login)", extra=SAMPLED)
+    return serve_page('index.html')
 
 @app.route('/game')
 def game():
     """Página do jogo - PROTEGIDA (frontend valida)"""
-    logger.info("🎮 Página do jogo (protegida)")
-    firebase_config = get_firebase_config()
-    return render_template('game.html', firebase_config=firebase_config)
+    logger.debug("🎮 Página do jogo (protegida)", extra=SAMPLED)
+    return serve_page('game.html')
 
 @app.route('/profile')
 def profile():
     """Página de perfil - PROTEGIDA (frontend valida)"""
-    logger.info("👤 Página de perfil (protegida)")
-    firebase_config = get_firebase_config()
-    return render_template('profile.html', firebase_config=firebase_config)
+    logger.debug("👤 Página de perfil (protegida)", extra=SAMPLED)
+    return serve_page('profile.html')
 
 # ========== API DE AUTENTICAÇÃO ==========
 
@@ -128,11 +257,12 @@ def auth_verify():
         if not token:
             return jsonify({'error': 'Token não fornecido'}), 400
 
-        logger.info("🔍 Verificando token Firebase...")
+        logger.debug("🔍 Verificando token Firebase...", extra=SAMPLED)
         
         # ✅ CORREÇÃO: Verificação direta com fallback
         if auth_manager and auth_manager.is_initialized():
-            user_info = auth_manager.verify_firebase_token(token)
+            with stage_timer('auth'):
+                user_info = auth_manager.verify_firebase_token(token)
         else:
             logger.error("❌ AuthManager não disponível para verificação")
             return jsonify({'error': 'Sistema de autenticação não disponível'}), 503
@@ -141,12 +271,29 @@ def auth_verify():
             logger.warning("❌ Token inválido")
             return jsonify({'error': 'Token inválido ou expirado'}), 401
 
-        logger.info(f"✅ Token verificado: {user_info['email']}")
+        logger.debug("✅ Token verificado: %s", user_info['email'], extra=SAMPLED)
         
-        return jsonify({
+        # ✅ Primeiro login provisiona usuário + estado inicial no mesmo comando que
+        # lê o perfil; logins seguintes não escrevem nada
+        response = {
             'success': True,
             'user': user_info
-        })
+        }
+        if db_manager:
+            try:
+                provisioned = db_manager.provision_user(user_info)
+                if provisioned:
+                    created = provisioned.pop('created', False)
+                    if created:
+                        invalidate_user_cache(user_info['uid'])
+                        record_signup(user_info['uid'], provisioned)
+                    response['profile'] = {**user_info, **provisioned}
+                    response['game_state'] = provisioned.get('game_data')
+                    response['created'] = created
+            except Exception as db_error:
+                logger.warning(f"⚠️ Erro ao provisionar usuário: {db_error}")
+        
+        return jsonify(response)
             
     except Exception as e:
         logger.error(f"❌ Erro na verificação: {e}")
@@ -172,52 +319,115 @@ def user_profile():
         user_info = request.current_user  # Injetado pelo decorator
         user_id = user_info['uid']
 
+        # ✅ 304 antes de tocar no banco se o cliente já tem a versão em cache
+        cached_etag = etag_cache.get(('profile', user_id))
+        if client_has_etag(cached_etag):
+            return not_modified(cached_etag)
+
         # Carregar dados completos do banco
         user_data = user_info.copy()
         if db_manager:
             try:
-                stored_data = db_manager.get_user_data(user_id)
+                stored_data = db_manager.get_user_data(user_id, read_replica=True)
                 if stored_data:
                     user_data.update(stored_data)
-                    logger.info(f"✅ Dados do banco carregados para: {user_id}")
+                    logger.debug("✅ Dados do banco carregados para: %s", user_id, extra=SAMPLED)
             except Exception as db_error:
                 logger.warning(f"⚠️ Erro ao carregar perfil do banco: {db_error}")
         
-        return jsonify({
+        # ETag pelo conteúdo, ignorando o horário de verificação do token
+        etag = make_etag('profile', json.dumps(
+            {key: value for key, value in user_data.items() if key != 'verified_at'},
+            sort_keys=True, default=str
+        ))
+        etag_cache.set(('profile', user_id), etag)
+        
+        response = jsonify({
             'success': True, 
             'profile': user_data
         })
+        return apply_private_caching(response, etag)
             
     except Exception as e:
         logger.error(f"❌ Erro no perfil: {e}")
         return jsonify({'error': 'Erro interno no servidor'}), 500
 
+@app.route('/api/user/overview', methods=['GET'])
+@require_auth
+def user_overview():
+    """PROTEGIDA - Perfil, estatísticas do jogo, top do ranking e posição do usuário
+
+    Substitui as chamadas separadas da página de perfil: uma verificação de
+    token e uma consulta ao banco, com cache curto por usuário.
+    """
+    try:
+        user_info = request.current_user
+        user_id = user_info['uid']
+
+        cached = overview_cache.get(('overview', user_id))
+        if cached:
+            etag, payload = cached
+            if client_has_etag(etag):
+                return not_modified(etag)
+            return apply_private_caching(jsonify(payload), etag)
+
+        profile_data = user_info.copy()
+        ranking = []
+        own_rank = None
+        if db_manager:
+            try:
+                overview = db_manager.get_user_overview(user_id, OVERVIEW_RANKING_SIZE)
+                profile_data.update(overview['profile'])
+                ranking = overview['ranking']
+                own_rank = overview['own_rank']
+            except Exception as db_error:
+                logger.warning(f"⚠️ Erro ao carregar visão geral do banco: {db_error}")
+
+        payload = {
+            'success': True,
+            'profile': profile_data,
+            'ranking': ranking,
+            'own_rank': own_rank
+        }
+        etag = make_etag('overview', json.dumps(
+            {**payload, 'profile': {k: v for k, v in profile_data.items() if k != 'verified_at'}},
+            sort_keys=True, default=str
+        ))
+        overview_cache.set(('overview', user_id), (etag, payload))
+
+        if client_has_etag(etag):
+            return not_modified(etag)
+        return apply_private_caching(jsonify(payload), etag)
+
+    except Exception as e:
+        logger.error(f"❌ Erro na visão geral do usuário: {e}")
+        return jsonify({'error': 'Erro interno no servidor'}), 500
+
 @app.route('/api/user/create', methods=['POST'])
 @require_auth
 def user_create():
-    """PROTEGIDA - Criar usuário no banco"""
+    """PROTEGIDA - Criar usuário no banco (idempotente; /api/auth/verify já provisiona)"""
     try:
         user_info = request.current_user
         user_id = user_info['uid']
 
-        if db_manager:
-            user_data = {
-                'uid': user_id,
-                'email': user_info['email'],
-                'name': user_info['name'],
-                'picture': user_info['picture'],
-                'created_at': datetime.now().isoformat(),
-                'last_login': datetime.now().isoformat()
-            }
-            
-            success = db_manager.create_user(user_id, user_data)
-            if success:
-                logger.info(f"✅ Usuário criado no banco: {user_id}")
-                return jsonify({'success': True, 'message': 'Usuário criado com sucesso'})
-            else:
-                return jsonify({'error': 'Erro ao criar usuário'}), 500
-        else:
+        if not db_manager:
             return jsonify({'error': 'Banco de dados não disponível'}), 503
+
+        provisioned = db_manager.provision_user(user_info)
+        if not provisioned:
+            return jsonify({'error': 'Erro ao criar usuário'}), 500
+
+        created = provisioned.pop('created', False)
+        if created:
+            invalidate_user_cache(user_id)
+            record_signup(user_id, provisioned)
+            logger.info(f"✅ Usuário criado no banco: {user_id}")
+        return jsonify({
+            'success': True,
+            'created': created,
+            'message': 'Usuário criado com sucesso' if created else 'Usuário já existente'
+        })
             
     except Exception as e:
         logger.error(f"❌ Erro ao criar usuário: {e}")
@@ -227,18 +437,25 @@ def user_create():
 
 @app.route('/api/game/state', methods=['GET'])
 @require_auth
+@rate_limiter.limit('game_state', rate=1.0, burst=20)
 def get_game_state():
     """PROTEGIDA - Obter estado do jogo"""
     try:
         user_info = request.current_user
         user_id = user_info['uid']
 
+        # ✅ 304 antes de tocar no banco se a versão do estado não mudou
+        cached_etag = etag_cache.get(('game_state', user_id))
+        if client_has_etag(cached_etag):
+            return not_modified(cached_etag)
+
         game_data = {}
         
         # Tentar carregar do game_manager
         if game_manager:
             try:
-                game_data = game_manager.get_user_game_state(user_id)
+                with stage_timer('game_logic'):
+                    game_data = game_manager.get_user_game_state(user_id)
             except Exception as mgr_error:
                 logger.warning(f"⚠️ Erro no game_manager: {mgr_error}")
         
@@ -270,7 +487,13 @@ def get_game_state():
                 'achievements': []
             }
         
-        return jsonify(game_data)
+        # ETag derivado da versão persistida; estados sem versão não são cacheados
+        if not game_data.get('state_version'):
+            return jsonify(game_data)
+        
+        etag = make_etag('game_state', user_id, game_data['state_version'], game_data.get('save_seq', 0))
+        etag_cache.set(('game_state', user_id), etag)
+        return apply_private_caching(jsonify(game_data), etag)
             
     except Exception as e:
         logger.error(f"❌ Erro ao obter estado do jogo: {e}")
@@ -278,6 +501,7 @@ def get_game_state():
 
 @app.route('/api/game/save', methods=['POST'])
 @require_auth
+@rate_limiter.limit('save', rate=0.5, burst=10)
 def save_game_state():
     """PROTEGIDA - Salvar estado do jogo"""
     try:
@@ -287,36 +511,294 @@ def save_game_state():
 
         if not data:
             return jsonify({'error': 'Dados não fornecidos'}), 400
+        save_seq = data.get('save_seq')
 
-        # Salvar no game_manager
-        save_success = True
+        # ✅ Um único upsert por save: saves antigos/duplicados viram no-op no banco
+        save_success = False
         if game_manager:
             try:
-                save_success = game_manager.save_game_state(user_id, data)
+                with stage_timer('game_logic'):
+                    save_success = game_manager.save_game_state(user_id, data)
             except Exception as mgr_error:
                 logger.warning(f"⚠️ Erro ao salvar no game_manager: {mgr_error}")
-                save_success = False
-        
-        # Salvar no db_manager também
-        if db_manager:
+        elif db_manager:
             try:
                 user_data = db_manager.get_user_data(user_id) or {}
                 user_data['game_data'] = data
-                user_data['last_activity'] = datetime.now().isoformat()
-                
-                db_manager.save_user_data(user_id, user_data)
-                logger.info(f"✅ Estado do jogo salvo no banco: {user_id}")
+                save_success = db_manager.save_user_data(user_id, user_data)
+                logger.debug("✅ Estado do jogo salvo no banco: %s", user_id, extra=SAMPLED)
             except Exception as db_error:
                 logger.warning(f"⚠️ Erro ao salvar no banco: {db_error}")
         
-        return jsonify({'success': save_success})
+        # ✅ Só o armazenamento marca save_applied: sem ele (falha do banco) nada foi gravado
+        applied = data.pop('save_applied', False)
+        if applied:
+            invalidate_user_cache(user_id)
+            if save_success:
+                action_journal.record_state(user_id, data)
+            event_hub.publish(user_id, 'state', {
+                'full': True,
+                'state_version': data.get('state_version'),
+                'save_seq': save_seq
+            })
+        response = {
+            'success': save_success,
+            'applied': applied,
+            'state_version': data.get('state_version')
+        }
+        if not save_success:
+            response['error'] = SAVE_FAILED_ERROR
+        return jsonify(response)
             
     except Exception as e:
         logger.error(f"❌ Erro ao salvar estado do jogo: {e}")
         return jsonify({'error': 'Erro interno no servidor'}), 500
 
+@app.route('/api/game/state', methods=['PATCH'])
+@require_auth
+@rate_limiter.limit('save', rate=0.5, burst=10)
+def patch_game_state():
+    """PROTEGIDA - Salvamento incremental (apenas campos alterados + versão base)"""
+    try:
+        user_info = request.current_user
+        user_id = user_info['uid']
+        data = request.get_json(silent=True)
+
+        if not data or 'base_version' not in data:
+            return jsonify({'error': 'Delta ou versão base não fornecidos'}), 400
+
+        if not db_manager:
+            return jsonify({'error': 'Banco de dados não disponível'}), 503
+
+        try:
+            base_version = int(data['base_version'])
+            result = db_manager.apply_game_state_patch(user_id, base_version, data)
+        except (TypeError, ValueError) as patch_error:
+            return jsonify({'error': f'Delta inválido: {patch_error}'}), 400
+
+        status = result['status']
+        if status == 'applied':
+            invalidate_user_cache(user_id)
+            publish_state_delta(user_id, data, result['state_version'])
+            action_journal.record_patch(
+                user_id, data, result['state_version'],
+                lambda: (db_manager.get_user_data(user_id) or {}).get('game_data')
+            )
+        if status in ('applied', 'dropped'):
+            return jsonify({
+                'success': True,
+                'applied': status == 'applied',
+                'state_version': result['state_version']
+            })
+        if status == 'conflict':
+            # ✅ Base desatualizada: o cliente deve reenviar o estado completo
+            return jsonify({
+                'error': 'Versão base desatualizada',
+                'state_version': result['state_version']
+            }), 409
+        if status == 'not_found':
+            return jsonify({'error': 'Estado não encontrado, envie o estado completo'}), 404
+        return jsonify({'error': 'Erro ao aplicar delta'}), 500
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao aplicar delta do jogo: {e}")
+        return jsonify({'error': 'Erro interno no servidor'}), 500
+
+@app.route('/api/game/batch', methods=['POST'])
+@require_auth
+@rate_limiter.limit('save', rate=0.5, burst=10)
+def game_batch():
+    """PROTEGIDA - Aplica uma lista ordenada de ações com uma leitura e um save
+
+    Corpo: {"actions": [{"type": "click", "count": 10},
+                        {"type": "upgrade", "upgrade_type": "click_power"},
+                        {"type": "prestige"}]}
+    """
+    try:
+        user_info = request.current_user
+        user_id = user_info['uid']
+        data = request.get_json(silent=True) or {}
+        actions = data.get('actions')
+
+        if not game_manager:
+            return jsonify({'error': 'Sistema de jogo não disponível'}), 503
+        if not isinstance(actions, list) or not actions:
+            return jsonify({'error': 'Lista de ações não fornecida'}), 400
+        if len(actions) > MAX_BATCH_ACTIONS:
+            return jsonify({'error': f'Máximo de {MAX_BATCH_ACTIONS} ações por lote'}), 400
+
+        with stage_timer('game_logic'):
+            result = game_manager.process_batch(user_id, actions)
+
+        if not result.get('success'):
+            if result.get('error') == SAVE_FAILED_ERROR:
+                return jsonify({'error': SAVE_FAILED_ERROR}), 503
+            return jsonify({'error': 'Erro ao aplicar ações'}), 500
+
+        game_state = result['game_state']
+        saved = game_state.pop('save_applied', bool(result['applied']))
+        if result['applied'] and saved:
+            invalidate_user_cache(user_id)
+            event_hub.publish(user_id, 'state', {
+                'full': True,
+                'state_version': game_state.get('state_version')
+            })
+
+        return jsonify({
+            'success': True,
+            'applied': result['applied'],
+            'results': result['results'],
+            'game_state': game_state,
+            'state_version': game_state.get('state_version')
+        })
+
+    except Exception as e:
+        logger.error(f"❌ Erro no lote de ações: {e}")
+        return jsonify({'error': 'Erro interno no servidor'}), 500
+
+def publish_state_delta(user_id, delta, state_version):
+    """Empurra as conquistas novas e o delta aplicado para as conexões SSE do usuário
+
+    As conquistas vão antes do delta: outra aba ainda não as tem e mostra o
+    aviso. `save_seq` identifica o save de origem para a aba que o enviou
+    ignorar o próprio eco.
+    """
+    for achievement_id in (delta.get('append') or {}).get('achievements', []):
+        event_hub.publish(user_id, 'achievement', {'id': achievement_id})
+    event_hub.publish(user_id, 'state', {
+        'full': False,
+        'state_version': state_version,
+        'save_seq': delta.get('save_seq'),
+        'set': delta.get('set') or {},
+        'merge': delta.get('merge') or {},
+        'append': delta.get('append') or {}
+    })
+
+# ========== EVENTOS EM TEMPO REAL ==========
+
+def verify_stream_ticket(ticket):
+    """uid do ticket do stream; None se inválido ou vencido"""
+    try:
+        return stream_tickets.loads(ticket, max_age=STREAM_TICKET_TTL)
+    except BadSignature:
+        return None
+
+@app.route('/api/events/ticket', methods=['POST'])
+@require_auth
+@rate_limiter.limit('stream_ticket', rate=0.2, burst=10)
+def event_stream_ticket():
+    """PROTEGIDA - Ticket de curta duração para abrir /api/events/stream"""
+    try:
+        return jsonify({
+            'ticket': stream_tickets.dumps(request.current_user['uid']),
+            'expires_in': STREAM_TICKET_TTL
+        })
+    except Exception as e:
+        logger.error(f"❌ Erro ao emitir ticket do stream: {e}")
+        return jsonify({'error': 'Erro interno no servidor'}), 500
+
+@app.route('/api/events/stream')
+def event_stream():
+    """PROTEGIDA - Stream SSE com deltas de estado, conquistas e ranking
+
+    O EventSource do navegador não envia headers: autentica por `?ticket=`
+    (POST /api/events/ticket). Clientes que enviam headers podem usar
+    `Authorization: Bearer <token>`.
+
+    Com workers de threads cada conexão ocupa uma thread até o fim, então o
+    worker aceita no máximo SSE_MAX_THREAD_CONNECTIONS (padrão WEB_THREADS / 4);
+    com gevent, SSE_MAX_CONNECTIONS. Acima disso responde 503 com Retry-After.
+    Na entrada ASGI (asgi.py) esta rota não chega ao Flask: roda no event loop.
+    """
+    ticket = request.args.get('ticket')
+    if ticket:
+        user_id = verify_stream_ticket(ticket)
+    else:
+        if not auth_manager or not auth_manager.is_initialized():
+            return jsonify({'error': 'Sistema de autenticação não disponível'}), 503
+        auth_header = request.headers.get('Authorization', '')
+        token = auth_header[7:] if auth_header.startswith('Bearer ') else auth_header
+        with stage_timer('auth'):
+            user_info = auth_manager.verify_firebase_token(token) if token else None
+        user_id = user_info['uid'] if user_info else None
+    if not user_id:
+        return jsonify({'error': 'Token inválido ou expirado'}), 401
+
+    subscription = event_hub.subscribe(user_id, limit=event_hub.connection_limit())
+    if subscription is None:
+        response = jsonify({'error': 'Limite de conexões em tempo real atingido, tente novamente em instantes'})
+        response.headers['Retry-After'] = str(event_hub.retry_after)
+        return response, 503
+    response = Response(event_hub.stream(subscription), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # ========== ROTAS DO SISTEMA ==========
 
+@app.route('/metrics')
+def metrics():
+    """Métricas do worker no formato texto do Prometheus
+
+    Se METRICS_TOKEN estiver definido, exige `Authorization: Bearer <token>`.
+    """
+    metrics_token = os.environ.get('METRICS_TOKEN')
+    if metrics_token:
+        auth_header = request.headers.get('Authorization', '')
+        if not secrets.compare_digest(auth_header, f'Bearer {metrics_token}'):
+            return jsonify({'error': 'Não autorizado'}), 401
+
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+# ========== PROFILER (ADMIN) ==========
+
+def admin_authorized():
+    """Valida `Authorization: Bearer <ADMIN_TOKEN>`; sem ADMIN_TOKEN as rotas admin ficam desligadas"""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    auth_header = request.headers.get('Authorization', '')
+    return secrets.compare_digest(auth_header, f'Bearer {admin_token}')
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST', 'DELETE'])
+def admin_profiler():
+    """ADMIN - Liga (POST), consulta (GET) ou encerra (DELETE) o profiler por amostragem
+
+    Corpo do POST (todos opcionais): duration, interval, route, sample_rate,
+    format ('collapsed' | 'speedscope') e project_only.
+    """
+    if not admin_authorized():
+        return jsonify({'error': 'Não autorizado'}), 401
+
+    try:
+        if request.method == 'GET':
+            return jsonify(profiler.status())
+
+        if request.method == 'DELETE':
+            output = profiler.stop()
+            return jsonify({'success': True, 'output': output})
+
+        data = request.get_json(silent=True) or {}
+        try:
+            status = profiler.start(
+                duration=float(data.get('duration', 30)),
+                interval=float(data.get('interval', 0.005)),
+                route=data.get('route'),
+                sample_rate=float(data.get('sample_rate', 1.0)),
+                output_format=data.get('format', 'collapsed'),
+                project_only=bool(data.get('project_only', False))
+            )
+        except (TypeError, ValueError) as param_error:
+            return jsonify({'error': f'Parâmetros inválidos: {param_error}'}), 400
+        except RuntimeError as busy_error:
+            return jsonify({'error': str(busy_error)}), 409
+
+        return jsonify({'success': True, **status}), 202
+
+    except Exception as e:
+        logger.error(f"❌ Erro no controle do profiler: {e}")
+        return jsonify({'error': 'Erro interno no servidor'}), 500
+
 @app.route('/healthz')
 def health_check():
     """Health check para Render"""
@@ -324,18 +806,41 @@ def health_check():
 
 @app.route('/api/system/health')
 def system_health():
-    """Health check completo do sistema"""
-    auth_status = 'available' if (auth_manager and auth_manager.is_initialized()) else 'unavailable'
-    
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': time.time(),
-        'services': {
-            'authentication': auth_status,
-            'game_system': 'available' if game_manager else 'unavailable',
-            'database': 'available' if db_manager else 'unavailable'
-        }
-    })
+    """Health check completo do sistema a partir do snapshot em cache
+
+    `?deep=1` roda os checks na hora (limitado por HEALTH_DEEP_MIN_INTERVAL).
+    """
+    try:
+        if request.args.get('deep') in ('1', 'true'):
+            snapshot = health_prober.deep_check()
+            if snapshot is None:
+                response = jsonify({'error': 'Deep check recente, tente novamente'})
+                response.headers['Retry-After'] = str(health_prober.deep_retry_after())
+                return response, 429
+        else:
+            snapshot = health_prober.snapshot()
+
+        checks = snapshot['checks']
+        return jsonify({
+            'status': 'healthy' if snapshot['healthy'] else ('starting' if not checks else 'degraded'),
+            'timestamp': time.time(),
+            'checked_at': snapshot['checked_at'],
+            'age_seconds': snapshot['age_seconds'],
+            'services': {
+                name: 'available' if result['healthy'] else 'unavailable'
+                for name, result in checks.items()
+            },
+            'checks': checks,
+            'stats': {
+                'dropped_saves': db_manager.dropped_saves if db_manager else 0,
+                'sse_connections': event_hub.connection_count(),
+                'game_events': event_recorder.stats()
+            }
+        })
+
+    except Exception as e:
+        logger.error(f"❌ Erro no health check: {e}")
+        return jsonify({'error': 'Erro interno no servidor'}), 500
 
 # ========== MANIPULADOR DE ERROS ==========
 
@@ -352,6 +857,9 @@ def internal_error(error):
 def unauthorized(error):
     return jsonify({'error': 'Não autorizado'}), 401
 
+# ✅ Shells HTML renderizados no boot do worker: cada página vira uma consulta a dict
+page_cache.warm(app, {'/': 'index', '/game': 'game', '/profile': 'profile'})
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 10000))
     debug_mode = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
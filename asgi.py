@@ -0,0 +1,446 @@
+# asgi.py - Entrada ASGI: rotas quentes assíncronas + app Flask para o restante
+"""
+Entrada ASGI do PopCoin IDLE
+
+GET /api/game/state e POST /api/game/save rodam como corrotinas sobre o
+AsyncStorage (asyncpg com pool próprio quando o banco é Postgres): enquanto
+esperam o banco não ocupam thread, e um worker mantém centenas de saves em
+andamento. Todas as outras rotas vão para o app Flask (`app.app`) pelo
+adaptador WSGI do a2wsgi, em um pool de WEB_THREADS threads (como no gthread),
+com o comportamento de sempre.
+
+As rotas assíncronas seguem as do Flask: mesmo controle de admissão
+(core/admission.py, contador compartilhado com o Flask: saves 'high', estado
+'normal'), autenticação, rate limit, ETags (cache compartilhado com o Flask),
+compressão e eventos SSE. Com esta entrada ADMISSION_MAX_IN_FLIGHT é o teto de
+requisições simultâneas do worker, não o número de threads.
+
+GET /api/events/stream também roda no event loop (EventHub.stream_async):
+cada conexão é só uma corrotina esperando eventos, sem ocupar uma das threads
+do a2wsgi, então o limite é SSE_MAX_CONNECTIONS.
+
+Uso:
+    WEB_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn asgi:application
+    uvicorn asgi:application --port 8000
+"""
+import os
+import time
+import asyncio
+import logging
+from urllib.parse import parse_qs
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import parse_etags
+
+from app import app, auth_manager, db_manager, game_manager, invalidate_user_cache, verify_stream_ticket
+from core.admission import SHED_REQUESTS, admission_controller
+from core.compression import COMPRESSIBLE_MIMETYPES, choose_encoding, compress_body
+from core.events import event_hub
+from core.http_cache import etag_cache, make_etag
+from core.logging_setup import SAMPLED
+from core.metrics import REQUEST_DURATION, async_route
+from core.rate_limit import RATE_LIMITED, MemoryBackend, rate_limiter
+from database.async_storage import create_async_storage
+from database.event_log import event_recorder
+from game.game_logic import SAVE_FAILED_ERROR
+from game.journal import action_journal
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+MAX_BODY_BYTES = int(os.environ.get('ASGI_MAX_BODY_BYTES', 1024 * 1024))
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+class AsyncRequest:
+    """O necessário de uma requisição ASGI para as rotas assíncronas"""
+
+    def __init__(self, scope: Dict[str, Any], body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope.get('headers', [])}
+        self.args = {name: values[0] for name, values in
+                     parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+        self.body = body
+        self.current_user: Optional[Dict[str, Any]] = None
+
+    def json(self) -> Optional[Any]:
+        if not self.body:
+            return None
+        try:
+            return app.json.loads(self.body)
+        except ValueError:
+            return None
+
+    def has_etag(self, etag: Optional[str]) -> bool:
+        """Equivalente a client_has_etag: If-None-Match contém o ETag (comparação fraca)"""
+        if not etag:
+            return False
+        return parse_etags(self.headers.get('if-none-match')).contains_weak(etag)
+
+
+class AsyncResponse:
+    def __init__(self, payload: Any = None, status: int = 200, etag: Optional[str] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        self.payload = payload
+        self.status = status
+        self.etag = etag
+        self.headers = headers or {}
+
+    def render(self, request: AsyncRequest) -> Tuple[Headers, bytes]:
+        """Corpo JSON + cabeçalhos, com os mesmos ETag/Cache-Control/compressão do Flask"""
+        headers = dict(self.headers)
+        body = b''
+        if self.payload is not None:
+            body = app.json.dumps(self.payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        weak = False
+
+        if 200 <= self.status < 300 and headers.get('Content-Type') in COMPRESSIBLE_MIMETYPES:
+            headers['Vary'] = 'Accept-Encoding'
+            encoding = choose_encoding(request.headers.get('accept-encoding'))
+            if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+                body = compress_body(body, encoding, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY)
+                headers['Content-Encoding'] = encoding
+                # O ETag forte identifica a representação sem compressão
+                weak = True
+
+        if self.etag:
+            headers['ETag'] = f'W/"{self.etag}"' if weak else f'"{self.etag}"'
+            headers['Cache-Control'] = 'private, no-cache'
+
+        headers['Content-Length'] = str(len(body))
+        return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()], body
+
+
+def error(message: str, status: int, headers: Optional[Dict[str, str]] = None) -> AsyncResponse:
+    return AsyncResponse({'error': message}, status, headers=headers)
+
+
+Handler = Callable[[AsyncRequest], Awaitable[AsyncResponse]]
+
+
+def require_auth(handler: Handler) -> Handler:
+    """Mesmas respostas do require_auth do Flask; a verificação do token roda em thread"""
+    async def decorated(request: AsyncRequest) -> AsyncResponse:
+        if not auth_manager or not auth_manager.is_initialized():
+            logger.error("🚫 AuthManager não disponível ou não inicializado")
+            return error('Sistema de autenticação não disponível', 503)
+
+        auth_header = request.headers.get('authorization')
+        if not auth_header:
+            logger.warning("🚫 Requisição sem token de autorização")
+            return error('Token não fornecido', 401)
+
+        token = auth_header[7:] if auth_header.startswith('Bearer ') else auth_header
+        if not token:
+            logger.warning("🚫 Token malformado")
+            return error('Token inválido', 401)
+
+        # Firebase pode buscar chaves públicas pela rede: fora do event loop
+        user_info = await asyncio.to_thread(auth_manager.verify_firebase_token, token)
+        if not user_info:
+            logger.warning("🚫 Token inválido ou expirado")
+            return error('Token inválido ou expirado', 401)
+
+        request.current_user = user_info
+        return await handler(request)
+    return decorated
+
+
+def rate_limited(name: str) -> Callable[[Handler], Handler]:
+    """Usa os limites já configurados pelas rotas do Flask (mesmos buckets por uid)"""
+    def decorator(handler: Handler) -> Handler:
+        async def decorated(request: AsyncRequest) -> AsyncResponse:
+            user_id = (request.current_user or {}).get('uid')
+            if user_id:
+                if isinstance(rate_limiter.backend, MemoryBackend):
+                    allowed, retry_after = rate_limiter.check(name, user_id)
+                else:
+                    # Backend compartilhado (Redis) faz I/O
+                    allowed, retry_after = await asyncio.to_thread(rate_limiter.check, name, user_id)
+                if not allowed:
+                    RATE_LIMITED.inc(name)
+                    return error('Muitas requisições, tente novamente em instantes', 429,
+                                 {'Retry-After': str(max(1, int(retry_after + 0.999)))})
+            return await handler(request)
+        return decorated
+    return decorator
+
+
+def admitted(priority: str) -> Callable[[Handler], Handler]:
+    """Mesma admissão do before_request do Flask (init_admission), antes da autenticação"""
+    def decorator(handler: Handler) -> Handler:
+        async def decorated(request: AsyncRequest) -> AsyncResponse:
+            if not admission_controller.try_admit(priority):
+                SHED_REQUESTS.inc(priority)
+                return error('Servidor sobrecarregado, tente novamente em instantes', 503,
+                             {'Retry-After': str(admission_controller.retry_after)})
+            admitted_at = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                admission_controller.release(time.perf_counter() - admitted_at)
+        return decorated
+    return decorator
+
+
+class PopCoinASGI:
+    """Roteia as rotas quentes para corrotinas e o restante para o Flask"""
+
+    def __init__(self, flask_app, storage):
+        self.storage = storage
+        self.wsgi = WSGIMiddleware(flask_app, workers=int(os.environ.get('WEB_THREADS', 8)))
+        # Sem armazenamento (DatabaseManager não carregou) tudo fica com o Flask
+        self.routes: Dict[Tuple[str, str], Handler] = {
+            ('GET', '/api/game/state'): admitted('normal')(
+                require_auth(rate_limited('game_state')(self.get_game_state))),
+            ('POST', '/api/game/save'): admitted('high')(
+                require_auth(rate_limited('save')(self.save_game_state))),
+        } if storage is not None else {}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        if scope['type'] == 'http' and scope['method'] == 'GET' and scope['path'] == '/api/events/stream':
+            await self.event_stream(scope, receive, send)
+            return
+
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token = async_route.set(scope['path'])
+        try:
+            body = await self.read_body(receive)
+            request = AsyncRequest(scope, body if body is not None else b'')
+            if body is None:
+                response = error('Corpo da requisição muito grande', 413)
+            else:
+                response = await handler(request)
+            await self.send_response(request, response, send, started)
+        finally:
+            async_route.reset(token)
+
+    async def read_body(self, receive) -> Optional[bytes]:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    async def lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    if self.storage is not None:
+                        await self.storage.start()
+                    engine = self.storage.engine if self.storage is not None else 'nenhum'
+                    logger.info(f"✅ Entrada ASGI pronta (armazenamento assíncrono: {engine})")
+                except Exception as e:
+                    logger.error(f"❌ Falha ao iniciar o armazenamento assíncrono: {e}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.storage is not None:
+                    await self.storage.close()
+                # Eventos do jogo ainda no buffer: gravar antes de o worker sair
+                await asyncio.to_thread(event_recorder.close)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # ========== ROTAS ASSÍNCRONAS ==========
+
+    async def event_stream(self, scope, receive, send) -> None:
+        """PROTEGIDA - Stream SSE (GET /api/events/stream do Flask, sem prender thread)
+
+        Isento da admissão como no Flask. Autentica por `?ticket=` ou
+        `Authorization: Bearer <token>`; acima de SSE_MAX_CONNECTIONS no
+        worker responde 503 com Retry-After.
+        """
+        started = time.perf_counter()
+        request = AsyncRequest(scope, b'')
+        ticket = request.args.get('ticket')
+        if ticket:
+            user_id = verify_stream_ticket(ticket)
+        elif not auth_manager or not auth_manager.is_initialized():
+            await self.send_response(request, error('Sistema de autenticação não disponível', 503), send, started)
+            return
+        else:
+            auth_header = request.headers.get('authorization', '')
+            token = auth_header[7:] if auth_header.startswith('Bearer ') else auth_header
+            user_info = await asyncio.to_thread(auth_manager.verify_firebase_token, token) if token else None
+            user_id = user_info['uid'] if user_info else None
+        if not user_id:
+            await self.send_response(request, error('Token inválido ou expirado', 401), send, started)
+            return
+
+        subscription = event_hub.subscribe(user_id, limit=event_hub.max_connections)
+        if subscription is None:
+            await self.send_response(request, error(
+                'Limite de conexões em tempo real atingido, tente novamente em instantes', 503,
+                {'Retry-After': str(event_hub.retry_after)}), send, started)
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        REQUEST_DURATION.observe(time.perf_counter() - started, scope['path'], scope['method'], '200')
+
+        async def watch_disconnect() -> None:
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        # ✅ Cliente desconectado: encerra o stream em vez de esperar o próximo heartbeat
+        stream = asyncio.ensure_future(self.send_events(subscription, send))
+        disconnect = asyncio.ensure_future(watch_disconnect())
+        try:
+            await asyncio.wait((stream, disconnect), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (stream, disconnect):
+                task.cancel()
+            await asyncio.gather(stream, disconnect, return_exceptions=True)
+            event_hub.unsubscribe(subscription)
+
+    async def send_events(self, subscription, send) -> None:
+        events = event_hub.stream_async(subscription)
+        try:
+            async for message in events:
+                await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            await events.aclose()
+
+    async def send_response(self, request: AsyncRequest, response: AsyncResponse, send, started: float) -> None:
+        headers, payload = response.render(request)
+        await send({'type': 'http.response.start', 'status': response.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': payload})
+        REQUEST_DURATION.observe(time.perf_counter() - started, request.path, request.method, str(response.status))
+
+    async def get_game_state(self, request: AsyncRequest) -> AsyncResponse:
+        """PROTEGIDA - Obter estado do jogo (GET /api/game/state do Flask, sem bloquear)"""
+        try:
+            user_id = request.current_user['uid']
+
+            # ✅ 304 antes de tocar no banco se a versão do estado não mudou
+            cached_etag = etag_cache.get(('game_state', user_id))
+            if request.has_etag(cached_etag):
+                return AsyncResponse(status=304, etag=cached_etag)
+
+            game_data = {}
+            if game_manager:
+                try:
+                    game_data = await game_manager.get_user_game_state_async(user_id, self.storage)
+                except Exception as mgr_error:
+                    logger.warning(f"⚠️ Erro no game_manager: {mgr_error}")
+
+            if not game_data:
+                stored_data = await self.storage.get_user_data(user_id)
+                if stored_data:
+                    game_data = stored_data.get('game_data', {})
+
+            if not game_data:
+                game_data = {
+                    'coins': 0,
+                    'coins_per_click': 1,
+                    'coins_per_second': 0,
+                    'total_coins': 0,
+                    'prestige_level': 0,
+                    'upgrades': {
+                        'click_power': 1,
+                        'auto_clickers': 0,
+                        'click_bots': 0
+                    },
+                    'click_count': 0,
+                    'last_update': time.time(),
+                    'inventory': [],
+                    'achievements': []
+                }
+
+            # ETag derivado da versão persistida; estados sem versão não são cacheados
+            if not game_data.get('state_version'):
+                return AsyncResponse(game_data)
+
+            etag = make_etag('game_state', user_id, game_data['state_version'], game_data.get('save_seq', 0))
+            etag_cache.set(('game_state', user_id), etag)
+            return AsyncResponse(game_data, etag=etag)
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter estado do jogo: {e}")
+            return error('Erro interno no servidor', 500)
+
+    async def save_game_state(self, request: AsyncRequest) -> AsyncResponse:
+        """PROTEGIDA - Salvar estado do jogo (POST /api/game/save do Flask, sem bloquear)"""
+        try:
+            user_id = request.current_user['uid']
+            data = request.json()
+
+            if not data:
+                return error('Dados não fornecidos', 400)
+            save_seq = data.get('save_seq')
+
+            # ✅ Um único upsert por save: saves antigos/duplicados viram no-op no banco
+            save_success = False
+            if game_manager:
+                try:
+                    save_success = await game_manager.save_game_state_async(user_id, data, self.storage)
+                except Exception as mgr_error:
+                    logger.warning(f"⚠️ Erro ao salvar no game_manager: {mgr_error}")
+            else:
+                try:
+                    user_data = await self.storage.get_user_data(user_id) or {}
+                    user_data['game_data'] = data
+                    save_success = await self.storage.save_user_data(user_id, user_data)
+                    logger.debug("✅ Estado do jogo salvo no banco: %s", user_id, extra=SAMPLED)
+                except Exception as db_error:
+                    logger.warning(f"⚠️ Erro ao salvar no banco: {db_error}")
+
+            # ✅ Só o armazenamento marca save_applied: sem ele (falha do banco) nada foi gravado
+            applied = data.pop('save_applied', False)
+            if applied:
+                invalidate_user_cache(user_id)
+                if save_success:
+                    action_journal.record_state(user_id, data)
+                event_hub.publish(user_id, 'state', {
+                    'full': True,
+                    'state_version': data.get('state_version'),
+                    'save_seq': save_seq
+                })
+            payload = {
+                'success': save_success,
+                'applied': applied,
+                'state_version': data.get('state_version')
+            }
+            if not save_success:
+                payload['error'] = SAVE_FAILED_ERROR
+            return AsyncResponse(payload)
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar estado do jogo: {e}")
+            return error('Erro interno no servidor', 500)
+
+
+# ✅ Instância única por processo
+application = PopCoinASGI(app, create_async_storage(db_manager) if db_manager else None)
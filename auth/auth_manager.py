@@ -1,6 +1,7 @@
 # auth/auth_manager.py - VERSÃO CORRIGIDA PARA RENDER
 import firebase_admin
 from firebase_admin import auth, credentials, exceptions
+import jwt
 import os
 import json
 import logging
@@ -9,13 +10,41 @@ from typing import Optional, Dict, Any
 from functools import wraps
 from flask import request, jsonify
 
+from core.assets import avatar_url
+from core.metrics import stage_timer
+from core.logging_setup import SAMPLED
+
 logger = logging.getLogger(__name__)
 
 class AuthManager:
     def __init__(self):
         self.firebase_app = None
         self._initialized = False
-        self.init_firebase()
+        self.local_issuer_key = self.load_local_issuer_key()
+        if self.local_issuer_key is None:
+            self.init_firebase()
+
+    def load_local_issuer_key(self):
+        """Chave pública do emissor local de tokens (testes de carga, sem Firebase)
+
+        Ativado por AUTH_LOCAL_ISSUER_PUBLIC_KEY (caminho do PEM RS256). Nunca
+        é ativado no Render, para que um deploy não aceite tokens locais.
+        """
+        key_path = os.environ.get('AUTH_LOCAL_ISSUER_PUBLIC_KEY')
+        if not key_path:
+            return None
+        if os.environ.get('RENDER'):
+            logger.error("❌ AUTH_LOCAL_ISSUER_PUBLIC_KEY ignorada no Render")
+            return None
+        try:
+            with open(key_path, 'rb') as key_file:
+                key = key_file.read()
+            logger.warning("⚠️ Autenticação por emissor LOCAL de tokens (somente testes de carga)")
+            self._initialized = True
+            return key
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar chave do emissor local: {e}")
+            return None
     
     def init_firebase(self) -> bool:
         """Inicialização corrigida para Render"""
@@ -86,6 +115,8 @@ class AuthManager:
 
     def is_initialized(self) -> bool:
         """Verificação robusta de inicialização"""
+        if self.local_issuer_key is not None:
+            return True
         try:
             return (self._initialized and 
                    self.firebase_app is not None and 
@@ -99,6 +130,9 @@ class AuthManager:
             logger.warning("❌ Token inválido ou muito curto")
             return None
             
+        if self.local_issuer_key is not None:
+            return self.verify_local_token(token)
+
         try:
             # ✅ CORREÇÃO: Verificar inicialização antes de usar
             if not self.is_initialized():
@@ -122,19 +156,9 @@ class AuthManager:
                 logger.warning("❌ Token não contém UID")
                 return None
 
-            logger.info(f"✅ Token verificado: {user_email}")
-            
-            user_data = {
-                'uid': user_uid,
-                'email': user_email,
-                'name': decoded_token.get('name') or user_email.split('@')[0],
-                'picture': decoded_token.get('picture') or '/static/images/default-avatar.png',
-                'email_verified': decoded_token.get('email_verified', False),
-                'verified_at': datetime.now().isoformat(),
-                'provider': decoded_token.get('firebase', {}).get('sign_in_provider', 'unknown')
-            }
+            logger.debug("✅ Token verificado: %s", user_email, extra=SAMPLED)
             
-            return user_data
+            return self.build_user_data(decoded_token)
             
         except auth.ExpiredIdTokenError:
             logger.warning("❌ Token expirado")
@@ -152,6 +176,41 @@ class AuthManager:
             logger.error(f"❌ Erro inesperado na verificação do token: {e}")
             return None
 
+    def verify_local_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """Valida um JWT do emissor local com as mesmas claims de um ID token do Firebase"""
+        try:
+            decoded_token = jwt.decode(
+                token,
+                self.local_issuer_key,
+                algorithms=['RS256'],
+                audience=os.environ.get('AUTH_LOCAL_ISSUER_AUDIENCE', 'popcoin-loadtest'),
+                issuer=os.environ.get('AUTH_LOCAL_ISSUER', 'popcoin-loadtest'),
+                options={'require': ['exp', 'iat', 'sub']}
+            )
+        except jwt.ExpiredSignatureError:
+            logger.warning("❌ Token expirado")
+            return None
+        except jwt.InvalidTokenError as token_error:
+            logger.warning(f"❌ Token local inválido: {token_error}")
+            return None
+
+        decoded_token.setdefault('uid', decoded_token['sub'])
+        return self.build_user_data(decoded_token)
+
+    @staticmethod
+    def build_user_data(decoded_token: Dict[str, Any]) -> Dict[str, Any]:
+        """user_info injetado na request a partir das claims do token"""
+        user_email = decoded_token.get('email', 'unknown')
+        return {
+            'uid': decoded_token['uid'],
+            'email': user_email,
+            'name': decoded_token.get('name') or user_email.split('@')[0],
+            'picture': avatar_url(decoded_token.get('picture')),
+            'email_verified': decoded_token.get('email_verified', False),
+            'verified_at': datetime.now().isoformat(),
+            'provider': decoded_token.get('firebase', {}).get('sign_in_provider', 'unknown')
+        }
+
     def get_firebase_config_for_frontend(self) -> Dict[str, Any]:
         """Configuração consistente para frontend"""
         config = {
@@ -163,7 +222,7 @@ class AuthManager:
             'appId': os.environ.get('NEXT_PUBLIC_FIREBASE_APP_ID', '1:337350823197:web:4928ae4827e21c585da5f4')
         }
         
-        logger.info("✅ Configuração Firebase carregada para frontend")
+        logger.debug("✅ Configuração Firebase carregada para frontend")
         return config
 
 # 🔥 DECORATOR CORRIGIDO
@@ -196,7 +255,8 @@ def require_auth(f):
             return jsonify({'error': 'Token inválido'}), 401
         
         # Verificar token com Firebase
-        user_info = auth_manager.verify_firebase_token(token)
+        with stage_timer('auth'):
+            user_info = auth_manager.verify_firebase_token(token)
         
         if not user_info:
             logger.warning("🚫 Token inválido ou expirado")
@@ -205,7 +265,7 @@ def require_auth(f):
         # ✅ INJETAR user_info na request
         request.current_user = user_info
         
-        logger.info(f"✅ Requisição autenticada: {user_info['email']}")
+        logger.debug("✅ Requisição autenticada: %s", user_info['email'], extra=SAMPLED)
         
         return f(*args, **kwargs)
     
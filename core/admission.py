@@ -0,0 +1,144 @@
+# core/admission.py - Controle de admissão e descarte de carga por prioridade
+import os
+import time
+import threading
+import logging
+from typing import Dict, Iterable, Optional
+
+from flask import g, jsonify, request
+
+from core.events import threads_are_cooperative
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ('low', 'normal', 'high')
+
+SHED_REQUESTS = registry.counter(
+    'popcoin_admission_shed_total', 'Requisições recusadas pelo controle de admissão', ('priority',)
+)
+
+
+class AdmissionController:
+    """Decide se uma requisição entra com base nas requisições em andamento e no p95 recente
+
+    Cada prioridade tem um teto de requisições simultâneas (fração de
+    `max_in_flight`). Quando o p95 da janela passa de `latency_target`, os tetos
+    de 'low' e 'normal' caem pela metade, então o tráfego de baixa prioridade é
+    descartado primeiro e os saves ('high') ficam com a capacidade restante.
+    """
+
+    def __init__(self, max_in_flight: int = 8, latency_target: float = 1.0, window: int = 256,
+                 low_fraction: float = 0.5, normal_fraction: float = 0.85, retry_after: int = 2):
+        self.max_in_flight = max_in_flight
+        self.latency_target = latency_target
+        self.fractions = {'low': low_fraction, 'normal': normal_fraction, 'high': 1.0}
+        self.retry_after = retry_after
+
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        # Janela circular de latências; o p95 é recalculado a cada 32 amostras
+        self._latencies = [0.0] * window
+        self._latency_count = 0
+        self._p95 = 0.0
+
+    # ========== ESTADO ==========
+
+    @property
+    def p95(self) -> float:
+        return self._p95
+
+    @property
+    def overloaded(self) -> bool:
+        return self._p95 > self.latency_target
+
+    def limit_for(self, priority: str) -> int:
+        fraction = self.fractions[priority]
+        if self.overloaded and priority != 'high':
+            fraction /= 2
+        return max(1, int(self.max_in_flight * fraction))
+
+    # ========== ADMISSÃO ==========
+
+    def try_admit(self, priority: str) -> bool:
+        limit = self.limit_for(priority)
+        with self._lock:
+            if self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, duration: float) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            window = len(self._latencies)
+            self._latencies[self._latency_count % window] = duration
+            self._latency_count += 1
+            if self._latency_count % 32 == 0:
+                samples = sorted(self._latencies[:min(self._latency_count, window)])
+                self._p95 = samples[int(len(samples) * 0.95) - 1] if samples else 0.0
+
+
+def init_admission(app, controller: AdmissionController, priorities: Dict[str, str],
+                   exempt: Iterable[str] = ()) -> None:
+    """Registra os hooks de admissão
+
+    `priorities` mapeia endpoint -> prioridade (padrão 'normal'); endpoints em
+    `exempt` (liveness, métricas, SSE, estáticos) nunca são contados nem descartados.
+    """
+    exempt = set(exempt) | {'static'}
+
+    @app.before_request
+    def admission_check():
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in exempt:
+            return None
+
+        priority = priorities.get(endpoint, 'normal')
+        if not controller.try_admit(priority):
+            SHED_REQUESTS.inc(priority)
+            response = jsonify({'error': 'Servidor sobrecarregado, tente novamente em instantes'})
+            response.headers['Retry-After'] = str(controller.retry_after)
+            return response, 503
+
+        g._admitted_at = time.perf_counter()
+        return None
+
+    @app.teardown_request
+    def admission_release(error=None):
+        admitted_at: Optional[float] = g.pop('_admitted_at', None)
+        if admitted_at is not None:
+            controller.release(time.perf_counter() - admitted_at)
+
+    logger.info(f"🚦 Admissão: até {controller.max_in_flight} requisições simultâneas por worker "
+                f"(low {controller.limit_for('low')}, normal {controller.limit_for('normal')}, "
+                f"high {controller.limit_for('high')}; ADMISSION_MAX_IN_FLIGHT)")
+
+    registry.gauge('popcoin_admission_in_flight', 'Requisições em andamento contadas pela admissão',
+                   lambda: controller.in_flight)
+    registry.gauge('popcoin_admission_latency_p95_seconds', 'p95 recente das requisições admitidas',
+                   lambda: controller.p95)
+    registry.gauge('popcoin_admission_limit', 'Teto atual de requisições simultâneas por prioridade',
+                   lambda: {(priority,): controller.limit_for(priority) for priority in PRIORITIES},
+                   ('priority',))
+
+
+def default_max_in_flight() -> int:
+    """Capacidade do worker: WEB_WORKER_CONNECTIONS com gevent, WEB_THREADS com threads do SO
+
+    Com gevent o worker atende até worker_connections greenlets; usar as
+    WEB_THREADS ali descartaria perfil e visão geral com concorrência normal.
+    """
+    if threads_are_cooperative():
+        return int(os.environ.get('WEB_WORKER_CONNECTIONS', 1000))
+    return int(os.environ.get('WEB_THREADS', 8))
+
+
+# ✅ Instância única por processo (por padrão, o teto acompanha a capacidade do worker)
+admission_controller = AdmissionController(
+    max_in_flight=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', default_max_in_flight())),
+    latency_target=float(os.environ.get('ADMISSION_LATENCY_TARGET', 1.0)),
+    low_fraction=float(os.environ.get('ADMISSION_LOW_FRACTION', 0.5)),
+    normal_fraction=float(os.environ.get('ADMISSION_NORMAL_FRACTION', 0.85)),
+    retry_after=int(os.environ.get('ADMISSION_RETRY_AFTER', 2))
+)
@@ -0,0 +1,131 @@
+# core/assets.py - URLs com hash de conteúdo e entrega dos assets gerados por tools/build_assets.py
+import os
+import json
+import logging
+import mimetypes
+from typing import Dict, Optional
+
+from flask import abort, request, send_from_directory, url_for
+
+from core.compression import choose_encoding
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIST_DIR = os.path.join(ROOT_DIR, 'static', 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Extensão da variante pré-comprimida por Content-Encoding
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+DEFAULT_AVATAR = 'images/default-avatar.png'
+
+_manifest: Optional[Dict[str, Dict[str, str]]] = None
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, Dict[str, str]]:
+    """Lê o manifest gerado no build; sem build, devolve vazio (assets servidos de /static)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"⚠️ Manifest de assets inválido: {e}")
+        return {}
+
+
+def get_manifest() -> Dict[str, Dict[str, str]]:
+    """Manifest do build, lido uma vez por processo"""
+    global _manifest
+    if _manifest is None:
+        _manifest = load_manifest()
+    return _manifest
+
+
+def asset_path(path: str) -> str:
+    """URL do asset fora de uma requisição (JSON da API, dados do banco)"""
+    entry = get_manifest().get(path)
+    if entry is None:
+        return f'/static/{path}'
+    return f"/assets/{entry['file']}"
+
+
+def default_avatar_url() -> str:
+    return asset_path(DEFAULT_AVATAR)
+
+
+def is_default_avatar(url: Optional[str]) -> bool:
+    """Vazio, /static/images/default-avatar.png ou o avatar padrão de qualquer build"""
+    if not url:
+        return True
+    if url == f'/static/{DEFAULT_AVATAR}':
+        return True
+    return url.startswith('/assets/images/default-avatar.') and url.endswith('.png')
+
+
+def avatar_url(stored: Optional[str]) -> str:
+    """Avatar entregue ao cliente: o padrão sempre aponta para o asset do build atual"""
+    return default_avatar_url() if is_default_avatar(stored) else stored
+
+
+def stored_avatar(url: Optional[str]) -> Optional[str]:
+    """Avatar gravado no banco: o padrão vira NULL (o nome com hash muda a cada build)"""
+    return None if is_default_avatar(url) else url
+
+
+def init_assets(app) -> None:
+    """Registra o helper `asset_url` no Jinja e a rota /assets com cache imutável
+
+    No Render (ou com ASSETS_REQUIRE_MANIFEST=1) o manifest é obrigatório:
+    sem ele os assets sairiam de /static sem hash nem cache imutável.
+    """
+    manifest = get_manifest()
+    require_manifest = os.environ.get('ASSETS_REQUIRE_MANIFEST', '1' if os.environ.get('RENDER') else '0') == '1'
+    if not manifest and require_manifest:
+        raise RuntimeError(f"Manifest de assets ausente em {MANIFEST_PATH} - rode `python -m tools.build_assets`")
+    encodings_by_file = {entry['file']: set(entry.get('encodings', ())) for entry in manifest.values()}
+
+    def asset_url(path: str) -> str:
+        entry = manifest.get(path)
+        if entry is None:
+            return url_for('static', filename=path)
+        return url_for('serve_asset', filename=entry['file'])
+
+    app.jinja_env.globals['asset_url'] = asset_url
+
+    @app.route('/assets/<path:filename>')
+    def serve_asset(filename):
+        """Asset com hash no nome: nunca muda, então pode ficar um ano em cache"""
+        available = encodings_by_file.get(filename)
+        if available is None:
+            abort(404)
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        served_name = filename
+        if encoding in available:
+            served_name = filename + PRECOMPRESSED_SUFFIXES[encoding]
+
+        # mimetype pelo arquivo original, não pela extensão .br/.gz
+        response = send_from_directory(DIST_DIR, served_name, mimetype=_guess_mimetype(filename),
+                                       conditional=True, etag=True)
+        if served_name != filename:
+            response.headers['Content-Encoding'] = encoding
+        if available:
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    if manifest:
+        logger.info(f"✅ Assets com hash: {len(manifest)} arquivos")
+    else:
+        logger.warning("⚠️ Manifest de assets ausente - rode `python -m tools.build_assets`; usando /static")
+
+
+def _guess_mimetype(filename: str) -> str:
+    if filename.endswith('.js'):
+        return 'text/javascript'
+    mimetype, _ = mimetypes.guess_type(filename)
+    return mimetype or 'application/octet-stream'
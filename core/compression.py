@@ -0,0 +1,117 @@
+# core/compression.py - Compressão negociada (gzip / brotli) das respostas
+import os
+import gzip
+import logging
+from typing import Optional
+
+from flask import request
+
+from core.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# ✅ Dependência opcional: sem brotli, apenas gzip é oferecido
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'application/javascript',
+    'image/svg+xml',
+}
+
+# Limite para ler arquivos servidos em passthrough (static) e comprimi-los
+MAX_PASSTHROUGH_BYTES = 2 * 1024 * 1024
+
+
+def supported_encodings():
+    """Codificações disponíveis neste processo, em ordem de preferência"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Escolhe a melhor codificação aceita pelo cliente (respeitando q=0)"""
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for item in accept_encoding.split(','):
+        parts = item.strip().split(';')
+        coding = parts[0].strip().lower()
+        quality = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+
+    for coding in supported_encodings():
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > 0:
+            return coding
+    return None
+
+
+def compress_body(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    """Comprime o corpo com a codificação escolhida"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+    raise ValueError(f"Codificação não suportada: {encoding}")
+
+
+def init_compression(app, min_size: Optional[int] = None,
+                     gzip_level: Optional[int] = None, brotli_quality: Optional[int] = None) -> None:
+    """Registra a compressão negociada de JSON, HTML e CSS/JS acima de um tamanho mínimo"""
+    min_size = min_size if min_size is not None else int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    gzip_level = gzip_level if gzip_level is not None else int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    brotli_quality = (brotli_quality if brotli_quality is not None
+                      else int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5)))
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.status_code in (204, 206)
+                or response.is_streamed and not response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if not encoding:
+            return response
+
+        # Arquivos estáticos chegam em passthrough; só lê os de tamanho conhecido e limitado
+        if response.direct_passthrough:
+            if not response.content_length or response.content_length > MAX_PASSTHROUGH_BYTES:
+                return response
+            response.direct_passthrough = False
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        with stage_timer('compression'):
+            response.set_data(compress_body(data, encoding, gzip_level, brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+
+        # O ETag forte identifica a representação sem compressão
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+        return response
+
+    logger.info(f"✅ Compressão ativa: {', '.join(supported_encodings())} (mínimo {min_size} bytes)")
@@ -0,0 +1,295 @@
+# core/events.py - Hub de eventos (Server-Sent Events) por processo
+import os
+import json
+import time
+import queue
+import asyncio
+import hashlib
+import threading
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def threads_are_cooperative() -> bool:
+    """True com gevent (monkey patch): esperar na fila não prende uma thread do SO"""
+    try:
+        from gevent import monkey
+    except ImportError:  # pragma: no cover - depende do ambiente
+        return False
+    return monkey.is_module_patched('threading')
+
+
+class Subscription:
+    """Conexão SSE de um usuário com fila limitada (backpressure)"""
+
+    def __init__(self, user_id: str, max_queue: int):
+        self.user_id = user_id
+        self.queue: "queue.Queue[str]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.closed = False
+        self.connected_at = time.monotonic()
+        # Chamado a cada evento entregue (stream_async acorda o event loop por aqui)
+        self.notify: Optional[Callable[[], None]] = None
+
+
+class EventHub:
+    """Fan-out de eventos para as conexões SSE deste worker
+
+    - `publish` entrega a todas as conexões de um usuário; `broadcast` a todas.
+    - Cada conexão tem fila limitada: se o cliente não consome, os eventos mais
+      antigos são descartados e, acima de `max_dropped`, a conexão é encerrada.
+    - O gerador `stream` só bloqueia em `queue.get(timeout=...)`, o que funciona
+      tanto com workers de threads quanto com gevent (monkey patch);
+      `stream_async` é a versão para o event loop da entrada ASGI (sem thread).
+    - Conexões têm vida máxima para que o EventSource reconecte e libere o worker.
+    - Conexões por worker são limitadas (`connection_limit`): com gevent até
+      `max_connections`; com threads do SO cada conexão ocupa uma thread, então
+      no máximo `max_thread_connections`, abaixo do total de threads, para
+      sobrar thread para a API.
+    """
+
+    def __init__(self, heartbeat_interval: float = 15.0, max_queue: int = 100,
+                 max_dropped: int = 500, max_connection_seconds: float = 300.0,
+                 retry_ms: int = 5000, max_connections: int = 1000,
+                 max_thread_connections: int = 2, retry_after: int = 30):
+        self.heartbeat_interval = heartbeat_interval
+        self.max_queue = max_queue
+        self.max_dropped = max_dropped
+        self.max_connection_seconds = max_connection_seconds
+        self.retry_ms = retry_ms
+        self.max_connections = max_connections
+        self.max_thread_connections = max_thread_connections
+        self.retry_after = retry_after
+
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._connections = 0
+        self._lock = threading.Lock()
+        self._event_id = 0
+
+        self._leaderboard_fetcher: Optional[Callable[[], List[Dict[str, Any]]]] = None
+        self._leaderboard_interval = 15.0
+        self._leaderboard_thread: Optional[threading.Thread] = None
+        self._leaderboard_hash: Optional[str] = None
+        self._leaderboard_message: Optional[str] = None
+
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    # ========== ASSINATURAS ==========
+
+    def connection_limit(self) -> int:
+        """Conexões aceitas neste worker: threads do SO ficam presas durante toda a conexão"""
+        if threads_are_cooperative():
+            return self.max_connections
+        return min(self.max_connections, self.max_thread_connections)
+
+    def subscribe(self, user_id: str, limit: Optional[int] = None) -> Optional[Subscription]:
+        """Nova conexão do usuário; None se o worker já tem `limit` conexões"""
+        subscription = Subscription(user_id, self.max_queue)
+        with self._lock:
+            if limit is not None and self._connections >= limit:
+                self.rejected += 1
+                return None
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+            self._connections += 1
+            leaderboard_message = self._leaderboard_message
+
+        # ✅ Novo cliente recebe o último ranking conhecido sem consultar o banco
+        if leaderboard_message:
+            self._deliver(subscription, leaderboard_message)
+
+        self._ensure_leaderboard_watcher()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        with self._lock:
+            user_subscriptions = self._subscriptions.get(subscription.user_id)
+            if user_subscriptions and subscription in user_subscriptions:
+                user_subscriptions.discard(subscription)
+                self._connections -= 1
+                if not user_subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def connection_count(self) -> int:
+        return self._connections
+
+    # ========== PUBLICAÇÃO ==========
+
+    def publish(self, user_id: str, event: str, data: Dict[str, Any]) -> None:
+        """Entrega um evento a todas as conexões do usuário neste worker"""
+        with self._lock:
+            targets = list(self._subscriptions.get(user_id, ()))
+        if not targets:
+            return
+
+        message = self._format(event, data)
+        for subscription in targets:
+            self._deliver(subscription, message)
+
+    def broadcast(self, event: str, data: Dict[str, Any]) -> None:
+        """Entrega um evento a todas as conexões deste worker"""
+        with self._lock:
+            targets = [sub for subs in self._subscriptions.values() for sub in subs]
+        if not targets:
+            return
+
+        message = self._format(event, data)
+        for subscription in targets:
+            self._deliver(subscription, message)
+
+    def _format(self, event: str, data: Dict[str, Any]) -> str:
+        with self._lock:
+            self._event_id += 1
+            event_id = self._event_id
+        payload = json.dumps(data, default=str, separators=(',', ':'))
+        return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+    def _deliver(self, subscription: Subscription, message: str) -> None:
+        if subscription.closed:
+            return
+        try:
+            subscription.queue.put_nowait(message)
+            self.published += 1
+            self._notify(subscription)
+        except queue.Full:
+            # ✅ Backpressure: descartar o evento mais antigo do cliente lento
+            try:
+                subscription.queue.get_nowait()
+            except queue.Empty:
+                pass
+            subscription.dropped += 1
+            self.dropped += 1
+            if subscription.dropped > self.max_dropped:
+                logger.warning(f"⚠️ Conexão SSE lenta encerrada: {subscription.user_id}")
+                subscription.closed = True
+                return
+            try:
+                subscription.queue.put_nowait(message)
+                self._notify(subscription)
+            except queue.Full:
+                pass
+
+    def _notify(self, subscription: Subscription) -> None:
+        notify = subscription.notify
+        if notify is None:
+            return
+        try:
+            notify()
+        except RuntimeError:
+            # Event loop já encerrado: a conexão morreu junto com ele
+            subscription.closed = True
+
+    # ========== STREAM ==========
+
+    def stream(self, subscription: Subscription) -> Iterator[str]:
+        """Gerador da resposta SSE: eventos, heartbeats e encerramento por tempo de vida"""
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while not subscription.closed:
+                if time.monotonic() - subscription.connected_at > self.max_connection_seconds:
+                    break
+                try:
+                    yield subscription.queue.get(timeout=self.heartbeat_interval)
+                except queue.Empty:
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stream_async(self, subscription: Subscription) -> AsyncIterator[str]:
+        """Mesmo protocolo de `stream`, esperando no event loop em vez de prender uma thread
+
+        Quem publica pode estar em outra thread (rotas do Flask pelo a2wsgi),
+        então a entrega acorda o loop com call_soon_threadsafe.
+        """
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        subscription.notify = lambda: loop.call_soon_threadsafe(wakeup.set)
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            while not subscription.closed:
+                if time.monotonic() - subscription.connected_at > self.max_connection_seconds:
+                    break
+                try:
+                    yield subscription.queue.get_nowait()
+                    continue
+                except queue.Empty:
+                    pass
+                wakeup.clear()
+                # Evento entregue entre o get_nowait e o clear: não esperar por ele
+                if not subscription.queue.empty():
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+        finally:
+            subscription.notify = None
+            self.unsubscribe(subscription)
+
+    # ========== RANKING ==========
+
+    def configure_leaderboard(self, fetcher: Callable[[], List[Dict[str, Any]]],
+                              interval: float = 15.0) -> None:
+        """Define como obter o ranking; a consulta só roda enquanto houver conexões"""
+        self._leaderboard_fetcher = fetcher
+        self._leaderboard_interval = interval
+
+    def _ensure_leaderboard_watcher(self) -> None:
+        if not self._leaderboard_fetcher:
+            return
+        with self._lock:
+            if self._leaderboard_thread and self._leaderboard_thread.is_alive():
+                return
+            self._leaderboard_thread = threading.Thread(
+                target=self._watch_leaderboard, name='sse-leaderboard', daemon=True
+            )
+            self._leaderboard_thread.start()
+
+    def _watch_leaderboard(self) -> None:
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    # Sem clientes: encerrar; o próximo subscribe reinicia a thread
+                    self._leaderboard_thread = None
+                    return
+            try:
+                self.refresh_leaderboard()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao atualizar ranking para SSE: {e}")
+            time.sleep(self._leaderboard_interval)
+
+    def refresh_leaderboard(self) -> bool:
+        """Consulta o ranking e publica para todos se ele mudou"""
+        ranking = self._leaderboard_fetcher() if self._leaderboard_fetcher else None
+        if ranking is None:
+            return False
+
+        digest = hashlib.sha1(json.dumps(ranking, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        if digest == self._leaderboard_hash:
+            return False
+
+        message = self._format('leaderboard', {'ranking': ranking})
+        with self._lock:
+            self._leaderboard_hash = digest
+            self._leaderboard_message = message
+            targets = [sub for subs in self._subscriptions.values() for sub in subs]
+        for subscription in targets:
+            self._deliver(subscription, message)
+        return True
+
+
+# ✅ Instância única por processo
+# Com threads (gthread), padrão de 1/4 das WEB_THREADS para o SSE
+event_hub = EventHub(
+    heartbeat_interval=float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15)),
+    max_queue=int(os.environ.get('SSE_MAX_QUEUE', 100)),
+    max_connection_seconds=float(os.environ.get('SSE_MAX_CONNECTION_SECONDS', 300)),
+    max_connections=int(os.environ.get('SSE_MAX_CONNECTIONS', 1000)),
+    max_thread_connections=int(os.environ.get('SSE_MAX_THREAD_CONNECTIONS',
+                                              max(1, int(os.environ.get('WEB_THREADS', 8)) // 4))),
+    retry_after=int(os.environ.get('SSE_RETRY_AFTER_SECONDS', 30))
+)
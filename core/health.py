@@ -0,0 +1,107 @@
+# core/health.py - Health checks em segundo plano com snapshot em cache
+import os
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+HealthCheck = Callable[[], Dict[str, Any]]
+
+
+class HealthProber:
+    """Executa os checks registrados a cada `interval` segundos numa thread daemon
+
+    Os endpoints de health leem apenas o último snapshot (O(1), sem tocar no
+    banco). O modo profundo roda os checks na hora, limitado a uma execução a
+    cada `deep_min_interval` segundos por worker.
+    """
+
+    def __init__(self, interval: float = 15.0, deep_min_interval: float = 10.0):
+        self.interval = interval
+        self.deep_min_interval = deep_min_interval
+        self._checks: Dict[str, HealthCheck] = {}
+        self._snapshot: Dict[str, Any] = {'healthy': False, 'checked_at': None, 'checks': {}}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_deep = 0.0
+
+    def register(self, name: str, check: HealthCheck) -> None:
+        """Registra um check; ele deve devolver um dict com a chave 'healthy'"""
+        self._checks[name] = check
+
+    # ========== EXECUÇÃO ==========
+
+    def refresh(self) -> Dict[str, Any]:
+        """Roda todos os checks agora e publica o novo snapshot"""
+        results: Dict[str, Dict[str, Any]] = {}
+        for name, check in self._checks.items():
+            started = time.perf_counter()
+            try:
+                result = dict(check() or {})
+            except Exception as e:
+                result = {'healthy': False, 'message': f'Erro no check: {e}'}
+            result.setdefault('healthy', False)
+            result['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            results[name] = result
+
+        snapshot = {
+            'healthy': all(result['healthy'] for result in results.values()),
+            'checked_at': time.time(),
+            'checks': results,
+        }
+        # ✅ Troca atômica da referência: leitores nunca veem um snapshot pela metade
+        self._snapshot = snapshot
+        return snapshot
+
+    def _ensure_started(self) -> None:
+        # Início preguiçoso: a thread nasce no worker (pós-fork), não no master do gunicorn
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro no health prober: {e}")
+            time.sleep(self.interval)
+
+    # ========== LEITURA ==========
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Último snapshot com a idade em segundos"""
+        self._ensure_started()
+        snapshot = self._snapshot
+        checked_at = snapshot['checked_at']
+        return {
+            **snapshot,
+            'age_seconds': round(time.time() - checked_at, 3) if checked_at else None,
+        }
+
+    def deep_check(self) -> Optional[Dict[str, Any]]:
+        """Check ao vivo; devolve None se o último foi há menos de `deep_min_interval`"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_deep < self.deep_min_interval:
+                return None
+            self._last_deep = now
+        snapshot = self.refresh()
+        return {**snapshot, 'age_seconds': 0.0}
+
+    def deep_retry_after(self) -> int:
+        remaining = self.deep_min_interval - (time.monotonic() - self._last_deep)
+        return max(1, int(remaining + 0.999))
+
+
+# ✅ Instância única por processo
+health_prober = HealthProber(
+    interval=float(os.environ.get('HEALTH_PROBE_INTERVAL', 15)),
+    deep_min_interval=float(os.environ.get('HEALTH_DEEP_MIN_INTERVAL', 10))
+)
@@ -0,0 +1,88 @@
+# core/http_cache.py - Cache HTTP condicional (ETag / If-None-Match)
+import os
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from flask import Response, request
+
+logger = logging.getLogger(__name__)
+
+
+class VersionCache:
+    """Cache em memória (por processo) do último ETag servido por chave
+
+    Permite responder 304 antes de tocar no banco. Entradas expiram após `ttl`
+    segundos para limitar a defasagem entre workers, e o tamanho é limitado
+    com descarte LRU. O valor pode ser qualquer objeto (ex.: ETag + payload).
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or now - entry[1] > self.ttl:
+                if entry:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Tuple[str, str], value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Tuple[str, str]) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def make_etag(*parts: Any) -> str:
+    """Gera o valor de um ETag forte (sem aspas) a partir das partes informadas"""
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def client_has_etag(etag: Optional[str]) -> bool:
+    """Verifica se o `If-None-Match` da requisição atual contém o ETag"""
+    if not etag:
+        return False
+    return request.if_none_match.contains_weak(etag)
+
+
+def apply_private_caching(response: Response, etag: str) -> Response:
+    """Marca a resposta como privada, revalidada a cada uso e com ETag"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    """Resposta 304 sem corpo para um ETag ainda válido no cliente"""
+    return apply_private_caching(Response(status=304), etag)
+
+
+# ✅ Instância compartilhada pelas rotas de estado do jogo e perfil
+etag_cache = VersionCache(
+    ttl=float(os.environ.get('ETAG_CACHE_TTL', 30)),
+    max_entries=int(os.environ.get('ETAG_CACHE_MAX_ENTRIES', 10000))
+)
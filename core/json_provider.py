@@ -0,0 +1,50 @@
+# core/json_provider.py - Serialização JSON rápida para o Flask
+import logging
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+from core.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# ✅ Dependência opcional: sem orjson, cai no encoder padrão do Flask
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Provider JSON plugável que usa orjson quando disponível
+
+    Mantém o comportamento do provider padrão (chaves ordenadas, fallback
+    `default` para Decimal/UUID/dataclasses) e só delega ao stdlib quando são
+    pedidos argumentos que o orjson não suporta (ex.: `indent` em modo debug).
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        with stage_timer('serialization'):
+            if orjson is None or kwargs:
+                return super().dumps(obj, **kwargs)
+
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def init_json_provider(app) -> None:
+    """Instala o provider rápido na aplicação"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    if orjson is None:
+        logger.warning("⚠️ orjson não instalado - usando encoder JSON padrão")
+    else:
+        logger.info("✅ Serialização JSON via orjson")
@@ -0,0 +1,109 @@
+# core/logging_setup.py - Logging assíncrono (QueueHandler/QueueListener) com registros JSON
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# ✅ Marcar logs de sucesso por requisição: `logger.debug("... %s", x, extra=SAMPLED)`
+SAMPLED = {'sampled': True}
+
+# Atributos padrão do LogRecord; o que sobrar veio de `extra=` e vai para o JSON
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Uma linha JSON por registro: ts, level, logger, message + campos de `extra`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key != 'sampled' and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Deixa passar só uma fração dos registros marcados com `extra=SAMPLED`"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, 'sampled', False):
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que não formata na thread da requisição
+
+    O `prepare` padrão chama `format()` antes de enfileirar, o que traz de volta
+    o custo da interpolação. Como fila e listener vivem no mesmo processo, o
+    registro vai intacto e a mensagem só é montada na thread do listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging() -> None:
+    """Substitui os handlers do root logger por uma fila atendida em thread própria
+
+    Variáveis de ambiente:
+    - LOG_LEVEL (INFO): nível do root logger; DEBUG reativa os logs por requisição
+    - LOG_FORMAT (json): 'json' ou 'text'
+    - LOG_SAMPLE_RATE (0.01): fração dos logs marcados com SAMPLED que é emitida
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    sample_rate = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if os.environ.get('LOG_FORMAT', 'json').lower() == 'json':
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = LazyQueueHandler(log_queue)
+    # ✅ Amostragem antes de enfileirar: registro descartado não custa nada ao listener
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Esvazia a fila e encerra a thread do listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
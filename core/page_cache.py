@@ -0,0 +1,100 @@
+# core/page_cache.py - Cache das páginas HTML renderizadas (shells públicos)
+import os
+import json
+import hashlib
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Response, render_template, request
+
+from core.compression import choose_encoding, compress_body, supported_encodings
+
+logger = logging.getLogger(__name__)
+
+
+def context_hash(context: Dict[str, Any]) -> str:
+    """Hash estável do contexto de renderização (ex.: config do Firebase)"""
+    raw = json.dumps(context, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class CachedPage:
+    """HTML renderizado uma vez, com variantes pré-comprimidas e validadores HTTP"""
+
+    def __init__(self, body: bytes, etag: str):
+        self.etag = etag
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        # ✅ Compressão máxima uma única vez, em vez de a cada requisição
+        self.variants: Dict[Optional[str], bytes] = {None: body}
+        for encoding in supported_encodings():
+            self.variants[encoding] = compress_body(body, encoding, gzip_level=9, brotli_quality=11)
+
+
+class PageCache:
+    """Páginas por (template, hash do contexto)
+
+    As páginas não têm dados do usuário (a autenticação é toda no frontend),
+    então o HTML só muda com o template e a config, que são fixos por deploy.
+    `request.endpoint` usado pelo menu vem da requisição em que a página foi
+    renderizada; por isso cada template é renderizado na rota correspondente.
+    """
+
+    def __init__(self, max_age: int = 0):
+        self.max_age = max_age
+        self._pages: Dict[Tuple[str, str], CachedPage] = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+
+    def get(self, template: str, variant: str,
+            context_factory: Callable[[], Dict[str, Any]]) -> CachedPage:
+        """Página em cache; na falta, renderiza na requisição atual e guarda"""
+        key = (template, variant)
+        page = self._pages.get(key)
+        if page is not None:
+            return page
+
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                body = render_template(template, **context_factory()).encode('utf-8')
+                page = CachedPage(body, hashlib.sha1(body).hexdigest()[:32])
+                self._pages[key] = page
+                self.renders += 1
+                logger.info(f"📄 Página em cache: {template} ({len(body)} bytes)")
+        return page
+
+    def serve(self, template: str, variant: str,
+              context_factory: Callable[[], Dict[str, Any]]) -> Response:
+        """Responde com a variante aceita pelo cliente, ETag/Last-Modified e 304 condicional"""
+        page = self.get(template, variant, context_factory)
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+
+        response = Response(page.variants[encoding], mimetype='text/html')
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        # Representações comprimidas recebem ETag fraco, como no hook de compressão
+        response.set_etag(page.etag, weak=bool(encoding))
+        response.last_modified = page.last_modified
+        response.headers['Cache-Control'] = (
+            f'public, max-age={self.max_age}' if self.max_age > 0 else 'public, no-cache'
+        )
+        return response.make_conditional(request)
+
+    def warm(self, app, routes: Dict[str, str]) -> None:
+        """Renderiza as páginas no boot do worker (rota -> endpoint)"""
+        for path, endpoint in routes.items():
+            try:
+                with app.test_request_context(path):
+                    app.view_functions[endpoint]()
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao pré-renderizar {path}: {e}")
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+
+# ✅ Instância única por processo
+page_cache = PageCache(max_age=int(os.environ.get('PAGE_CACHE_MAX_AGE', 0)))
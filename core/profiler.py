@@ -0,0 +1,283 @@
+# core/profiler.py - Profiler por amostragem ativável em tempo de execução
+import os
+import sys
+import json
+import time
+import random
+import signal
+import threading
+import logging
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FrameKey = Tuple[str, str, int]
+
+
+class SamplingProfiler:
+    """Coleta pilhas de todas as threads (ou só das requisições de uma rota) em intervalos fixos
+
+    Desligado, o custo é uma checagem de booleano por requisição. Ligado, uma
+    thread daemon lê `sys._current_frames()` a cada `interval` segundos durante a
+    janela pedida e grava o resultado em formato collapsed-stack (flamegraph.pl,
+    speedscope) ou JSON do speedscope.
+    """
+
+    FORMATS = ('collapsed', 'speedscope')
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.active = False
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._session: Dict[str, Any] = {}
+        self._samples: Counter = Counter()
+        # thread id -> rota, apenas para requisições sorteadas quando há filtro de rota
+        self._tracked_threads: Dict[int, str] = {}
+        self.last_output: Optional[str] = None
+        # Pedidos de liga/desliga vindos do sinal, atendidos pela thread `profiler-signal`
+        self._toggle_requests = 0
+        self._toggle_thread: Optional[threading.Thread] = None
+
+    # ========== CONTROLE ==========
+
+    def start(self, duration: float = 30.0, interval: float = 0.005, route: Optional[str] = None,
+              sample_rate: float = 1.0, output_format: str = 'collapsed',
+              project_only: bool = False) -> Dict[str, Any]:
+        """Inicia uma janela de amostragem; falha se já houver uma ativa"""
+        if output_format not in self.FORMATS:
+            raise ValueError(f"Formato inválido: {output_format}")
+        if not 0 < duration <= 600:
+            raise ValueError("Duração deve estar entre 0 e 600 segundos")
+        if not 0.001 <= interval <= 1:
+            raise ValueError("Intervalo deve estar entre 0.001 e 1 segundo")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate deve estar entre 0 e 1")
+
+        with self._lock:
+            if self.active:
+                raise RuntimeError("Profiler já está ativo")
+
+            self._samples = Counter()
+            self._tracked_threads = {}
+            self._stop_event.clear()
+            self._session = {
+                'started_at': time.time(),
+                'duration': duration,
+                'interval': interval,
+                'route': route,
+                'sample_rate': sample_rate,
+                'format': output_format,
+                'project_only': project_only,
+                'samples': 0,
+            }
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+        logger.info(f"🔬 Profiler iniciado: {duration}s a cada {interval * 1000:.1f}ms"
+                    f"{f' na rota {route} ({sample_rate:.0%})' if route else ''}")
+        return self.status()
+
+    def stop(self) -> Optional[str]:
+        """Encerra a janela atual antes do prazo e aguarda a gravação do arquivo"""
+        thread = self._thread
+        if not self.active or not thread:
+            return self.last_output
+        self._stop_event.set()
+        thread.join(timeout=10)
+        return self.last_output
+
+    def request_toggle(self) -> None:
+        """Seguro dentro de um handler de sinal: só incrementa um contador, sem locks nem logging
+
+        O handler roda na thread principal entre dois bytecodes; se ela estiver
+        dentro de start() segurando `_lock` (ou de outro handler), qualquer lock
+        tomado ali travaria o worker.
+        """
+        self._toggle_requests += 1
+
+    def watch_toggles(self, duration: float, poll_interval: float = 0.5) -> None:
+        """Inicia a thread que liga (por `duration` segundos) ou desliga o profiler a cada pedido"""
+        if self._toggle_thread and self._toggle_thread.is_alive():
+            return
+        self._toggle_thread = threading.Thread(
+            target=self._run_toggles, args=(duration, poll_interval), name='profiler-signal', daemon=True
+        )
+        self._toggle_thread.start()
+
+    def _run_toggles(self, duration: float, poll_interval: float) -> None:
+        handled = self._toggle_requests
+        while True:
+            time.sleep(poll_interval)
+            if self._toggle_requests == handled:
+                continue
+            handled = self._toggle_requests
+            try:
+                self.start(duration=duration)
+            except RuntimeError:
+                self.stop()
+            except Exception as e:
+                logger.error(f"❌ Erro ao alternar o profiler pelo sinal: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'active': self.active,
+            'session': dict(self._session),
+            'last_output': self.last_output,
+        }
+
+    # ========== RASTREIO DE REQUISIÇÕES ==========
+
+    def begin_request(self) -> None:
+        """Marca a thread da requisição atual se ela cair na amostra da rota filtrada"""
+        route_filter = self._session.get('route')
+        if not route_filter or request.url_rule is None or request.url_rule.rule != route_filter:
+            return
+        if random.random() < self._session.get('sample_rate', 1.0):
+            self._tracked_threads[threading.get_ident()] = route_filter
+
+    def end_request(self) -> None:
+        self._tracked_threads.pop(threading.get_ident(), None)
+
+    # ========== AMOSTRAGEM ==========
+
+    def _run(self) -> None:
+        session = self._session
+        deadline = time.monotonic() + session['duration']
+        interval = session['interval']
+        own_id = threading.get_ident()
+        route_filter = session['route']
+
+        try:
+            while not self._stop_event.is_set() and time.monotonic() < deadline:
+                frames = sys._current_frames()
+                for thread_id, frame in frames.items():
+                    if thread_id == own_id:
+                        continue
+                    if route_filter and thread_id not in self._tracked_threads:
+                        continue
+                    stack = self._extract_stack(frame, session['project_only'])
+                    if stack:
+                        self._samples[stack] += 1
+                        session['samples'] += 1
+                self._stop_event.wait(interval)
+        except Exception as e:
+            logger.error(f"❌ Erro no profiler: {e}")
+        finally:
+            try:
+                self.last_output = self._write_output()
+            except Exception as e:
+                logger.error(f"❌ Erro ao gravar perfil: {e}")
+            with self._lock:
+                self.active = False
+                self._tracked_threads = {}
+
+    def _extract_stack(self, frame, project_only: bool) -> Tuple[FrameKey, ...]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            if not project_only or code.co_filename.startswith(ROOT_DIR):
+                stack.append((code.co_name, code.co_filename, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    # ========== SAÍDA ==========
+
+    def _write_output(self) -> Optional[str]:
+        session = self._session
+        if not self._samples:
+            logger.warning("⚠️ Profiler encerrado sem amostras")
+            return None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(session['started_at']))
+        base_name = f"profile-{stamp}-{os.getpid()}"
+
+        if session['format'] == 'speedscope':
+            path = os.path.join(self.output_dir, f"{base_name}.speedscope.json")
+            with open(path, 'w', encoding='utf-8') as output:
+                json.dump(self._to_speedscope(base_name), output)
+        else:
+            path = os.path.join(self.output_dir, f"{base_name}.collapsed.txt")
+            with open(path, 'w', encoding='utf-8') as output:
+                for stack, count in self._samples.most_common():
+                    output.write(';'.join(self._frame_label(key) for key in stack) + f" {count}\n")
+
+        logger.info(f"🔬 Perfil gravado: {path} ({session['samples']} amostras)")
+        return path
+
+    def _frame_label(self, key: FrameKey) -> str:
+        name, filename, _ = key
+        return f"{name} ({os.path.relpath(filename, ROOT_DIR) if filename.startswith(ROOT_DIR) else filename})"
+
+    def _to_speedscope(self, name: str) -> Dict[str, Any]:
+        frame_index: Dict[Tuple[str, str], int] = {}
+        frames = []
+        samples = []
+        weights = []
+        interval = self._session['interval']
+
+        for stack, count in self._samples.items():
+            indexes = []
+            for func_name, filename, line in stack:
+                key = (func_name, filename)
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({'name': func_name, 'file': filename, 'line': line})
+                indexes.append(frame_index[key])
+            samples.append(indexes)
+            weights.append(count * interval)
+
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+            'exporter': 'popcoin-sampling-profiler',
+        }
+
+
+def init_profiler(app, profiler: SamplingProfiler) -> None:
+    """Registra os hooks de rastreio por rota e o gatilho por sinal (SIGUSR2)"""
+
+    @app.before_request
+    def profiler_begin_request():
+        if profiler.active:
+            profiler.begin_request()
+
+    @app.teardown_request
+    def profiler_end_request(error=None):
+        if profiler.active:
+            profiler.end_request()
+
+    signal_seconds = float(os.environ.get('PROFILER_SIGNAL_SECONDS', 30))
+
+    def handle_signal(signum, frame):
+        profiler.request_toggle()
+
+    if hasattr(signal, 'SIGUSR2'):
+        try:
+            signal.signal(signal.SIGUSR2, handle_signal)
+            profiler.watch_toggles(signal_seconds)
+        except ValueError:
+            # signal.signal só pode ser chamado na thread principal
+            logger.debug("Profiler: gatilho por sinal indisponível fora da thread principal")
+
+
+# ✅ Instância única por processo
+profiler = SamplingProfiler(os.environ.get('PROFILER_OUTPUT_DIR', '/tmp/popcoin-profiles'))
@@ -0,0 +1,179 @@
+# core/rate_limit.py - Rate limiting por usuário e rota (token bucket)
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Hashable, Tuple
+
+from flask import jsonify, request
+
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# ✅ Dependência opcional: só é necessária com RATE_LIMIT_REDIS_URL
+try:
+    import redis
+except ImportError:  # pragma: no cover - depende do ambiente
+    redis = None
+
+RATE_LIMITED = registry.counter(
+    'popcoin_rate_limited_total', 'Requisições recusadas pelo rate limiter', ('route',)
+)
+
+
+class RateLimitBackend:
+    """Interface do armazenamento dos buckets
+
+    `consume` retira `cost` fichas do bucket `key` (capacidade `burst`, reposição
+    de `rate` fichas/s) e devolve (permitido, segundos até haver fichas).
+    """
+
+    def consume(self, key: Tuple[str, str], rate: float, burst: float,
+                cost: float = 1.0) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return 0
+
+
+class MemoryBackend(RateLimitBackend):
+    """Buckets em memória do worker: dois floats por chave, LRU limitado a `max_keys`"""
+
+    def __init__(self, max_keys: int = 50000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, cost=1.0):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [burst, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return True, 0.0
+            return False, (cost - bucket[0]) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RedisBackend(RateLimitBackend):
+    """Buckets compartilhados entre workers/instâncias via script Lua atômico"""
+
+    SCRIPT = """
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str, prefix: str = 'popcoin:rl:'):
+        if redis is None:
+            raise RuntimeError("Pacote redis não instalado")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def consume(self, key, rate, burst, cost=1.0):
+        allowed, tokens = self._script(
+            keys=[f"{self.prefix}{key[0]}:{key[1]}"],
+            args=[rate, burst, time.time(), cost]
+        )
+        if int(allowed):
+            return True, 0.0
+        return False, (cost - float(tokens)) / rate
+
+
+class RateLimiter:
+    """Aplica limites nomeados (ex.: 'save', 'game_state') por uid
+
+    Limites vêm do ambiente: RATE_LIMIT_<NOME>_RATE (fichas/s) e
+    RATE_LIMIT_<NOME>_BURST; RATE_LIMIT_ENABLED=false desliga tudo.
+    """
+
+    def __init__(self, backend: RateLimitBackend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self._limits: Dict[str, Tuple[float, float]] = {}
+
+    def configure(self, name: str, rate: float, burst: float) -> Tuple[float, float]:
+        env_name = name.upper()
+        rate = float(os.environ.get(f'RATE_LIMIT_{env_name}_RATE', rate))
+        burst = float(os.environ.get(f'RATE_LIMIT_{env_name}_BURST', burst))
+        self._limits[name] = (rate, burst)
+        return rate, burst
+
+    def check(self, name: str, user_id: str) -> Tuple[bool, float]:
+        if not self.enabled:
+            return True, 0.0
+        rate, burst = self._limits[name]
+        try:
+            return self.backend.consume((user_id, name), rate, burst)
+        except Exception as e:
+            # ✅ Falha aberta: backend compartilhado fora do ar não derruba o jogo
+            logger.warning(f"⚠️ Rate limiter indisponível: {e}")
+            return True, 0.0
+
+    def limit(self, name: str, rate: float, burst: float):
+        """Decorator para rotas já protegidas por @require_auth (usa request.current_user)"""
+        self.configure(name, rate, burst)
+
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                user = getattr(request, 'current_user', None) or {}
+                user_id = user.get('uid')
+                if user_id:
+                    allowed, retry_after = self.check(name, user_id)
+                    if not allowed:
+                        RATE_LIMITED.inc(name)
+                        response = jsonify({'error': 'Muitas requisições, tente novamente em instantes'})
+                        response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                        return response, 429
+                return f(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+
+def _create_backend() -> RateLimitBackend:
+    redis_url = os.environ.get('RATE_LIMIT_REDIS_URL')
+    if redis_url:
+        try:
+            backend = RedisBackend(redis_url)
+            logger.info("✅ Rate limiter com backend Redis")
+            return backend
+        except Exception as e:
+            logger.warning(f"⚠️ Redis indisponível para rate limit, usando memória: {e}")
+    return MemoryBackend(int(os.environ.get('RATE_LIMIT_MAX_KEYS', 50000)))
+
+
+# ✅ Instância única por processo
+rate_limiter = RateLimiter(
+    _create_backend(),
+    enabled=os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() != 'false'
+)
@@ -0,0 +1,247 @@
+# database/async_storage.py - Acesso assíncrono ao armazenamento (entrada ASGI)
+import os
+import re
+import json
+import asyncio
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from core.metrics import count_statement
+from core.assets import stored_avatar
+from core.logging_setup import SAMPLED
+from database.db_models import USER_DATA_QUERY, RANKING_QUERY, SAVE_USER_QUERY, SAVE_GAME_STATE_QUERY
+from database.storage import STATE_DECIMAL_FIELDS, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# ✅ Dependência opcional: sem asyncpg, as chamadas vão para threads sobre a engine síncrona
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - depende do ambiente
+    asyncpg = None
+
+
+def to_asyncpg(query: str) -> str:
+    """Converte os placeholders `%s` do psycopg2 nos `$1, $2...` do asyncpg"""
+    counter = iter(range(1, query.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f'${next(counter)}', query)
+
+
+# As mesmas consultas do DatabaseManager (tools/query_plans.py cobre os planos)
+ASYNC_USER_DATA_QUERY = to_asyncpg(USER_DATA_QUERY)
+ASYNC_RANKING_QUERY = to_asyncpg(RANKING_QUERY)
+ASYNC_SAVE_USER_QUERY = to_asyncpg(SAVE_USER_QUERY)
+ASYNC_SAVE_GAME_STATE_QUERY = to_asyncpg(SAVE_GAME_STATE_QUERY)
+
+
+class AsyncStorage:
+    """Interface assíncrona com as operações das rotas quentes
+
+    Cobre leitura e save do usuário e o ranking; o resto do app continua no
+    StorageBackend síncrono. `backend` é a engine síncrona do processo, usada
+    para os dados padrão, a conversão das linhas e o contador de saves descartados.
+    """
+
+    engine = 'base'
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def get_user_data(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def save_user_data(self, user_id: str, user_data: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    async def get_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class ThreadedAsyncStorage(AsyncStorage):
+    """Engine síncrona (SQLite, memória, Postgres sem asyncpg) em threads do executor padrão
+
+    Não bloqueia o event loop, mas a concorrência fica limitada pelo executor.
+    """
+
+    def __init__(self, backend: StorageBackend):
+        super().__init__(backend)
+        self.engine = f'{backend.engine}+threads'
+
+    async def get_user_data(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.backend.get_user_data, user_id)
+
+    async def save_user_data(self, user_id: str, user_data: Dict[str, Any]) -> bool:
+        return await asyncio.to_thread(self.backend.save_user_data, user_id, user_data)
+
+    async def get_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.backend.get_ranking, limit)
+
+
+class AsyncpgStorage(AsyncStorage):
+    """Postgres via asyncpg com pool próprio
+
+    Uma requisição esperando o banco não ocupa thread: um worker ASGI mantém
+    centenas de saves em andamento, limitados pelo pool (DATABASE_ASYNC_POOL_MAX)
+    e não pelo número de threads.
+    """
+
+    engine = 'asyncpg'
+
+    def __init__(self, backend: StorageBackend, database_url: str, sslmode: str = 'require'):
+        super().__init__(backend)
+        self.database_url = database_url
+        self.sslmode = sslmode
+        self.pool_min = int(os.environ.get('DATABASE_ASYNC_POOL_MIN', 2))
+        self.pool_max = int(os.environ.get('DATABASE_ASYNC_POOL_MAX', 20))
+        self.pool = None
+
+    async def start(self) -> None:
+        # O pool pertence ao event loop do worker: criado no startup do ASGI, nunca no import
+        self.pool = await asyncpg.create_pool(
+            self.database_url,
+            min_size=self.pool_min,
+            max_size=self.pool_max,
+            ssl=self.sslmode,
+            init=self._init_connection
+        )
+        logger.info(f"✅ Pool asyncpg criado! (min: {self.pool_min}, max: {self.pool_max})")
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _init_connection(self, conn) -> None:
+        # JSONB chega como dict/list e os parâmetros ::jsonb aceitam objetos Python
+        for type_name in ('json', 'jsonb'):
+            await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+    async def get_user_data(self, user_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            async with self.pool.acquire() as conn:
+                count_statement()
+                result = await conn.fetchrow(ASYNC_USER_DATA_QUERY, user_id)
+
+            if not result:
+                logger.warning(f"⚠️ Usuário não encontrado no banco: {user_id}")
+                return self.backend.get_default_user_data(user_id)
+            return self.backend._row_to_user_data(result)
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter dados do usuário {user_id}: {e}")
+            return self.backend.get_default_user_data(user_id)
+
+    async def save_user_data(self, user_id: str, user_data: Dict[str, Any]) -> bool:
+        current_time = datetime.now()
+        try:
+            async with self.pool.acquire() as conn:
+                transaction = conn.transaction()
+                await transaction.start()
+                try:
+                    count_statement()
+                    await conn.execute(ASYNC_SAVE_USER_QUERY,
+                                       user_id,
+                                       user_data.get('email', ''),
+                                       user_data.get('name', ''),
+                                       stored_avatar(user_data.get('picture')),
+                                       user_data.get('email_verified', False),
+                                       current_time,
+                                       current_time,
+                                       user_data.get('preferences', {}))
+
+                    if user_data.get('game_data'):
+                        game_data = user_data['game_data']
+                        state_version = await self._save_game_state(conn, user_id, game_data, current_time)
+                        if state_version is None:
+                            # Save antigo ou duplicado: descartar também o upsert do usuário
+                            await transaction.rollback()
+                            game_data['save_applied'] = False
+                            return True
+                        game_data['state_version'] = state_version
+                        game_data['save_applied'] = True
+
+                    await transaction.commit()
+                except BaseException:
+                    await transaction.rollback()
+                    raise
+
+            logger.debug("✅ Dados salvos (asyncpg) para usuário: %s", user_id, extra=SAMPLED)
+            return True
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar dados do usuário {user_id}: {e}")
+            return False
+
+    async def _save_game_state(self, conn, user_id: str, game_data: Dict[str, Any],
+                               current_time: datetime) -> Optional[int]:
+        """Upsert condicional do estado; None quando o save_seq já foi aplicado"""
+        aligned_game_data = self.backend._align_game_data_structure(game_data)
+        save_seq = self.backend._parse_save_seq(aligned_game_data.get('save_seq'))
+
+        # asyncpg não converte float em BIGINT/NUMERIC como o psycopg2: arredondar como as colunas
+        state = self.backend._coerce_state({
+            'coins': aligned_game_data.get('coins', 0),
+            'coins_per_click': aligned_game_data.get('coins_per_click', 1),
+            'coins_per_second': aligned_game_data.get('coins_per_second', 0),
+            'total_coins': aligned_game_data.get('total_coins', 0),
+            'prestige_level': aligned_game_data.get('prestige_level', 0),
+            'click_count': aligned_game_data.get('click_count', 0),
+            'level': aligned_game_data.get('level', 1),
+            'experience': aligned_game_data.get('experience', 0),
+        })
+        for field in STATE_DECIMAL_FIELDS:
+            state[field] = Decimal(str(state[field]))
+
+        count_statement()
+        row = await conn.fetchrow(
+            ASYNC_SAVE_GAME_STATE_QUERY,
+            user_id,
+            state['coins'],
+            state['coins_per_click'],
+            state['coins_per_second'],
+            state['total_coins'],
+            state['prestige_level'],
+            state['click_count'],
+            state['level'],
+            state['experience'],
+            aligned_game_data.get('upgrades', {'click_power': 1, 'auto_clickers': 0, 'click_bots': 0}),
+            aligned_game_data.get('achievements', []),
+            aligned_game_data.get('inventory', []),
+            current_time,
+            save_seq,
+            save_seq,
+            save_seq
+        )
+        if row is None:
+            self.backend._record_dropped_save(user_id, save_seq)
+            return None
+        return row['state_version']
+
+    async def get_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
+        try:
+            async with self.pool.acquire() as conn:
+                count_statement()
+                rows = await conn.fetch(ASYNC_RANKING_QUERY, limit)
+            return [self.backend._ranking_entry(row, idx + 1) for idx, row in enumerate(rows)]
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter ranking: {e}")
+            return self.backend.get_mock_ranking(limit)
+
+
+def create_async_storage(backend: StorageBackend) -> AsyncStorage:
+    """asyncpg quando a engine é Postgres com pool ativo; threads nas demais (e no modo desenvolvimento)"""
+    database_url = getattr(backend, 'database_url', None)
+    if backend.engine == 'postgres' and database_url and backend.pool_stats()['max'] > 0:
+        if asyncpg is not None:
+            return AsyncpgStorage(backend, database_url, getattr(backend, 'sslmode', 'require'))
+        logger.warning("⚠️ asyncpg não instalado - acesso assíncrono via threads")
+    return ThreadedAsyncStorage(backend)
@@ -10,26 +10,203 @@ import logging
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
+from core.metrics import stage_timer, count_statement
+from core.assets import stored_avatar
+from core.logging_setup import SAMPLED
+from database.storage import PATCH_JSONB_FIELDS, StorageBackend
+from database.replicas import DB_READS, RecentWrites, ReplicaSet, load_replica_urls
+from database.sharding import load_shard_urls
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
-# ✅ CORREÇÃO: Pool de conexões thread-safe
-connection_pool = None
+# ✅ CORREÇÃO: Criação do pool de conexões thread-safe (um pool por DatabaseManager)
 pool_lock = threading.Lock()
 
-class DatabaseManager:
+# ✅ Índices criados por ensure_indexes (CONCURRENTLY, fora da transação do create_tables)
+INDEXES = [
+    ('idx_user_game_states_coins', 'user_game_states', 'coins DESC'),
+    # ✅ Mesma ordenação do ranking: top N sem sort e posição (own_rank) por range scan
+    ('idx_user_game_states_ranking', 'user_game_states',
+     'total_coins DESC, prestige_level DESC, level DESC'),
+    ('idx_user_ranking_score', 'user_ranking', 'total_score DESC'),
+    ('idx_users_email', 'users', 'email')
+]
+
+# Chave do pg_advisory_lock que serializa a criação de índices entre workers
+INDEX_LOCK_KEY = 0x706f70636f696e
+
+# ========== CONSULTAS QUENTES ==========
+# Usadas a cada requisição; tools/query_plans.py verifica os planos delas no Postgres
+
+USER_DATA_QUERY = '''
+SELECT 
+    u.user_id, u.email, u.display_name, u.avatar_url,
+    u.email_verified, u.created_at, u.last_login, 
+    COALESCE(u.last_activity, u.last_login) as last_activity,
+    COALESCE(u.preferences, '{}'::jsonb) as preferences,
+    g.coins, g.coins_per_click, g.coins_per_second, g.total_coins,
+    g.prestige_level, g.click_count, g.level, g.experience,
+    g.upgrades, g.achievements, g.inventory, g.last_update,
+    g.state_version, g.save_seq
+FROM users u
+LEFT JOIN user_game_states g ON u.user_id = g.user_id
+WHERE u.user_id = %s
+'''
+
+# Lote de usuários (mesmas colunas de USER_DATA_QUERY), um round trip
+USERS_DATA_QUERY = USER_DATA_QUERY.replace('WHERE u.user_id = %s', 'WHERE u.user_id = ANY(%s)')
+
+RANKING_QUERY = '''
+SELECT u.user_id, u.display_name, u.avatar_url,
+       g.total_coins as total_score, g.prestige_level, g.level
+FROM user_game_states g
+JOIN users u ON g.user_id = u.user_id
+ORDER BY g.total_coins DESC, g.prestige_level DESC, g.level DESC
+LIMIT %s
+'''
+
+USER_OVERVIEW_QUERY = '''
+WITH top AS (
+    SELECT u.user_id, u.display_name, u.avatar_url,
+           g.total_coins as total_score, g.prestige_level, g.level
+    FROM user_game_states g
+    JOIN users u ON g.user_id = u.user_id
+    ORDER BY g.total_coins DESC, g.prestige_level DESC, g.level DESC
+    LIMIT %s
+)
+SELECT 
+    u.user_id, u.email, u.display_name, u.avatar_url,
+    u.email_verified, u.created_at, u.last_login, 
+    COALESCE(u.last_activity, u.last_login) as last_activity,
+    COALESCE(u.preferences, '{}'::jsonb) as preferences,
+    g.coins, g.coins_per_click, g.coins_per_second, g.total_coins,
+    g.prestige_level, g.click_count, g.level, g.experience,
+    g.upgrades, g.achievements, g.inventory, g.last_update,
+    g.state_version, g.save_seq,
+    (SELECT COALESCE(json_agg(t ORDER BY t.total_score DESC, t.prestige_level DESC, t.level DESC), '[]'::json)
+     FROM top t) as top_ranking,
+    CASE WHEN g.user_id IS NULL THEN NULL ELSE (
+        SELECT COUNT(*) + 1
+        FROM user_game_states o
+        WHERE (o.total_coins, o.prestige_level, o.level)
+            > (g.total_coins, g.prestige_level, g.level)
+    ) END as own_rank
+FROM users u
+LEFT JOIN user_game_states g ON u.user_id = g.user_id
+WHERE u.user_id = %s
+'''
+
+# Quantos jogadores estão à frente de uma posição (ranking somado entre shards)
+COUNT_AHEAD_QUERY = '''
+SELECT COUNT(*) FROM user_game_states
+WHERE (total_coins, prestige_level, level) > (%s, %s, %s)
+'''
+
+SAVE_USER_QUERY = '''
+INSERT INTO users (user_id, email, display_name, avatar_url, 
+                 email_verified, last_login, last_activity, preferences)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb)
+ON CONFLICT (user_id) DO UPDATE SET
+    email = EXCLUDED.email,
+    display_name = EXCLUDED.display_name,
+    avatar_url = EXCLUDED.avatar_url,
+    email_verified = EXCLUDED.email_verified,
+    last_login = EXCLUDED.last_login,
+    last_activity = EXCLUDED.last_activity,
+    preferences = EXCLUDED.preferences,
+    updated_at = CURRENT_TIMESTAMP
+'''
+
+SAVE_GAME_STATE_QUERY = '''
+INSERT INTO user_game_states 
+(user_id, coins, coins_per_click, coins_per_second, total_coins,
+ prestige_level, click_count, level, experience,
+ upgrades, achievements, inventory, last_update, save_seq)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s::jsonb, %s::jsonb, %s,
+        COALESCE(%s::bigint, 0))
+ON CONFLICT (user_id) DO UPDATE SET
+    coins = EXCLUDED.coins,
+    coins_per_click = EXCLUDED.coins_per_click,
+    coins_per_second = EXCLUDED.coins_per_second,
+    total_coins = EXCLUDED.total_coins,
+    prestige_level = EXCLUDED.prestige_level,
+    click_count = EXCLUDED.click_count,
+    level = EXCLUDED.level,
+    experience = EXCLUDED.experience,
+    upgrades = EXCLUDED.upgrades,
+    achievements = EXCLUDED.achievements,
+    inventory = EXCLUDED.inventory,
+    last_update = EXCLUDED.last_update,
+    state_version = user_game_states.state_version + 1,
+    save_seq = GREATEST(user_game_states.save_seq, EXCLUDED.save_seq),
+    updated_at = CURRENT_TIMESTAMP
+WHERE %s::bigint IS NULL OR user_game_states.save_seq < %s::bigint
+RETURNING state_version
+'''
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor que mede o tempo de cada comando (etapa `db_query`) e conta statements"""
+
+    def execute(self, query, vars=None):
+        count_statement()
+        with stage_timer('db_query'):
+            return super().execute(query, vars)
+
+
+class TimedDictCursor(DictCursor):
+    """DictCursor com a mesma instrumentação do TimedCursor"""
+
+    def execute(self, query, vars=None):
+        count_statement()
+        with stage_timer('db_query'):
+            return super().execute(query, vars)
+
+
+class DatabaseManager(StorageBackend):
     """Gerenciador de banco de dados para o PopCoin IDLE - VERSÃO ALINHADA"""
     
-    def __init__(self):
-        self.initialized = False
-        self.database_url = os.environ.get('DATABASE_URL')
+    engine = 'postgres'
+    
+    def __init__(self, database_url: Optional[str] = None, name: str = 'primary', use_replicas: bool = True):
+        super().__init__()
+        # Sem argumentos: o banco de DATABASE_URL; com database_url: um shard (ShardedDatabaseManager)
+        self.database_url = database_url or os.environ.get('DATABASE_URL')
+        self.name = name
+        self.use_replicas = use_replicas
+        self.connection_pool = None
+        # Postgres local (testes de carga) normalmente roda sem TLS: DATABASE_SSLMODE=disable
+        self.sslmode = os.environ.get('DATABASE_SSLMODE', 'require')
         self.pool_min = 1
         self.pool_max = 10
+        # ✅ Réplicas de leitura (opcionais): ranking, perfil e visão geral
+        self.replicas = None
+        self.recent_writes = RecentWrites(float(os.environ.get('DATABASE_READ_YOUR_WRITES_SECONDS', 10)))
         self.init_db()
     
+    def get_read_connection(self, user_id: Optional[str] = None):
+        """Conexão para leituras que toleram atraso de replicação
+
+        Réplica em round-robin, exceto para quem salvou há pouco (read-your-writes);
+        sem réplica disponível, o primário. Devolver com return_db_connection.
+        """
+        if self.replicas and not self.recent_writes.is_pinned(user_id):
+            with stage_timer('db_checkout'):
+                conn = self.replicas.checkout()
+            if conn is not None:
+                DB_READS.inc('replica')
+                return conn
+        DB_READS.inc('primary')
+        return self.get_db_connection()
+    
     def get_db_connection(self):
         """✅ CORREÇÃO: Obtém conexão de forma segura"""
-        global connection_pool
+        with stage_timer('db_checkout'):
+            return self._checkout_connection()
+
+    def _checkout_connection(self):
+        """Retira uma conexão do pool (ou abre uma direta) e valida com SELECT 1"""
+        connection_pool = self.connection_pool
         
         if not self.initialized or not connection_pool:
             return self.create_direct_connection()
@@ -52,7 +229,9 @@ class DatabaseManager:
 
     def return_db_connection(self, conn):
         """✅ CORREÇÃO: Retorna conexão de forma segura"""
-        global connection_pool
+        connection_pool = self.connection_pool
+        if conn and self.replicas and self.replicas.release(conn):
+            return
         try:
             if connection_pool and conn and not conn.closed:
                 connection_pool.putconn(conn)
@@ -78,8 +257,9 @@ class DatabaseManager:
 
             conn = psycopg2.connect(
                 dsn=database_url,
-                sslmode='require',
-                connect_timeout=10
+                sslmode=self.sslmode,
+                connect_timeout=10,
+                cursor_factory=TimedCursor
             )
 
             with conn.cursor() as cur:
@@ -97,8 +277,6 @@ class DatabaseManager:
 
     def init_db(self):
         """✅ CORREÇÃO: Inicialização robusta"""
-        global connection_pool
-        
         if self.initialized:
             return
             
@@ -123,18 +301,28 @@ class DatabaseManager:
                 if database_url.startswith('postgres://'):
                     database_url = database_url.replace('postgres://', 'postgresql://')
                     
-                connection_pool = pool.SimpleConnectionPool(
+                # ✅ Pool thread-safe: workers gthread/gevent atendem requisições concorrentes
+                self.connection_pool = pool.ThreadedConnectionPool(
                     self.pool_min, 
                     self.pool_max,
                     dsn=database_url,
-                    sslmode='require'
+                    sslmode=self.sslmode,
+                    cursor_factory=TimedCursor
                 )
                 
-            logger.info(f"✅ Pool de conexões criado! (min: {self.pool_min}, max: {self.pool_max})")
+            logger.info(f"✅ Pool de conexões criado! ({self.name}, min: {self.pool_min}, max: {self.pool_max})")
             
             self.create_tables()
             self.initialized = True
             
+            replica_urls = load_replica_urls() if self.use_replicas else []
+            if replica_urls:
+                self.replicas = ReplicaSet(
+                    replica_urls, self.sslmode,
+                    int(os.environ.get('DATABASE_REPLICA_POOL_MAX', self.pool_max)), TimedCursor
+                )
+                logger.info(f"✅ {len(self.replicas)} réplica(s) de leitura: {', '.join(self.replicas.stats())}")
+            
         except Exception as e:
             logger.error(f"❌ Erro na inicialização do banco: {e}")
             self.initialized = True
@@ -198,6 +386,8 @@ class DatabaseManager:
                         }'::jsonb,
                         achievements JSONB DEFAULT '[]'::jsonb,
                         inventory JSONB DEFAULT '[]'::jsonb,
+                        state_version BIGINT DEFAULT 0,
+                        save_seq BIGINT DEFAULT 0,
                         last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -224,32 +414,75 @@ class DatabaseManager:
             else:
                 logger.info("✅ Tabela 'user_ranking' já existe")
 
-            # ✅ CORREÇÃO: Criar índices
-            indexes = [
-                ('idx_user_game_states_coins', 'user_game_states', 'coins DESC'),
-                ('idx_user_ranking_score', 'user_ranking', 'total_score DESC'),
-                ('idx_users_email', 'users', 'email')
-            ]
-            
-            for index_name, table_name, columns in indexes:
-                cur.execute(f"""
-                    SELECT indexname FROM pg_indexes 
-                    WHERE tablename = '{table_name}' AND indexname = '{index_name}'
-                """)
-                if not cur.fetchone():
-                    cur.execute(f'CREATE INDEX {index_name} ON {table_name}({columns})')
-                    logger.info(f"✅ Índice '{index_name}' criado")
-            
             conn.commit()
             logger.info("🎯 Estrutura do banco ALINHADA com sucesso!")
             
         except Exception as e:
             logger.error(f"❌ Erro na criação das tabelas: {e}")
             conn.rollback()
+            return
         finally:
             cur.close()
             self.return_db_connection(conn)
 
+        # ✅ Índices fora do boot: CREATE INDEX CONCURRENTLY não bloqueia os saves, mas pode demorar
+        threading.Thread(target=self.ensure_indexes, name='db-indexes', daemon=True).start()
+
+    def ensure_indexes(self, wait: bool = False) -> bool:
+        """Cria os INDEXES que faltam com CREATE INDEX CONCURRENTLY (sem travar escritas na tabela)
+
+        CONCURRENTLY não roda dentro de transação, então a conexão fica em
+        autocommit durante a criação. Um advisory lock evita que os workers
+        construam o mesmo índice ao mesmo tempo: sem `wait`, quem não pega o
+        lock deixa o trabalho para quem pegou; com `wait` (ferramentas que
+        precisam dos índices prontos), espera por ele. Um índice que ficou
+        inválido (build interrompido) é descartado e refeito.
+        """
+        conn = self.get_db_connection()
+        if not conn:
+            logger.error("❌ Falha ao conectar para criar índices")
+            return False
+
+        try:
+            conn.rollback()
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                if wait:
+                    cur.execute('SELECT pg_advisory_lock(%s)', (INDEX_LOCK_KEY,))
+                else:
+                    cur.execute('SELECT pg_try_advisory_lock(%s)', (INDEX_LOCK_KEY,))
+                    if not cur.fetchone()[0]:
+                        logger.info("ℹ️ Índices sendo criados por outro processo")
+                        return True
+                try:
+                    for index_name, table_name, columns in INDEXES:
+                        cur.execute("""
+                            SELECT i.indisvalid FROM pg_index i
+                            JOIN pg_class c ON c.oid = i.indexrelid
+                            WHERE c.relname = %s
+                        """, (index_name,))
+                        row = cur.fetchone()
+                        if row and row[0]:
+                            continue
+                        if row:
+                            logger.warning(f"⚠️ Índice '{index_name}' inválido; recriando")
+                            cur.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}')
+                        cur.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} '
+                                    f'ON {table_name}({columns})')
+                        logger.info(f"✅ Índice '{index_name}' criado")
+                finally:
+                    cur.execute('SELECT pg_advisory_unlock(%s)', (INDEX_LOCK_KEY,))
+            return True
+        except Exception as e:
+            logger.error(f"❌ Erro na criação dos índices: {e}")
+            return False
+        finally:
+            try:
+                conn.autocommit = False
+            except Exception:
+                pass
+            self.return_db_connection(conn)
+
     def _add_missing_columns(self, conn, cur):
         """✅ CORREÇÃO: Adicionar colunas faltantes na tabela users"""
         try:
@@ -318,6 +551,18 @@ class DatabaseManager:
                 ''')
                 logger.info("✅ Dados de clicks migrados para click_count")
             
+            # ✅ Versão do estado usada pelo salvamento incremental (delta)
+            cur.execute('''
+                ALTER TABLE user_game_states
+                ADD COLUMN IF NOT EXISTS state_version BIGINT DEFAULT 0
+            ''')
+            
+            # ✅ Sequência monotônica do cliente para descartar saves antigos/duplicados
+            cur.execute('''
+                ALTER TABLE user_game_states
+                ADD COLUMN IF NOT EXISTS save_seq BIGINT DEFAULT 0
+            ''')
+            
             # ✅ CORREÇÃO: Atualizar estrutura de upgrades para formato alinhado
             logger.info("🔄 Atualizando estrutura de upgrades...")
             cur.execute('''
@@ -363,24 +608,11 @@ class DatabaseManager:
                 current_time = datetime.now()
                 
                 # ✅ CORREÇÃO: Inserir/atualizar usuário
-                cur.execute('''
-                    INSERT INTO users (user_id, email, display_name, avatar_url, 
-                                     email_verified, last_login, last_activity, preferences)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb)
-                    ON CONFLICT (user_id) DO UPDATE SET
-                        email = EXCLUDED.email,
-                        display_name = EXCLUDED.display_name,
-                        avatar_url = EXCLUDED.avatar_url,
-                        email_verified = EXCLUDED.email_verified,
-                        last_login = EXCLUDED.last_login,
-                        last_activity = EXCLUDED.last_activity,
-                        preferences = EXCLUDED.preferences,
-                        updated_at = CURRENT_TIMESTAMP
-                ''', (
+                cur.execute(SAVE_USER_QUERY, (
                     user_id,
                     user_data.get('email', ''),
                     user_data.get('name', ''),
-                    user_data.get('picture'),
+                    stored_avatar(user_data.get('picture')),
                     user_data.get('email_verified', False),
                     current_time,
                     current_time,
@@ -393,28 +625,11 @@ class DatabaseManager:
                     
                     # ✅ CORREÇÃO: Converter estrutura para formato alinhado
                     aligned_game_data = self._align_game_data_structure(game_data)
+                    save_seq = self._parse_save_seq(aligned_game_data.get('save_seq'))
                     
-                    cur.execute('''
-                        INSERT INTO user_game_states 
-                        (user_id, coins, coins_per_click, coins_per_second, total_coins,
-                         prestige_level, click_count, level, experience,
-                         upgrades, achievements, inventory, last_update)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s::jsonb, %s::jsonb, %s)
-                        ON CONFLICT (user_id) DO UPDATE SET
-                            coins = EXCLUDED.coins,
-                            coins_per_click = EXCLUDED.coins_per_click,
-                            coins_per_second = EXCLUDED.coins_per_second,
-                            total_coins = EXCLUDED.total_coins,
-                            prestige_level = EXCLUDED.prestige_level,
-                            click_count = EXCLUDED.click_count,
-                            level = EXCLUDED.level,
-                            experience = EXCLUDED.experience,
-                            upgrades = EXCLUDED.upgrades,
-                            achievements = EXCLUDED.achievements,
-                            inventory = EXCLUDED.inventory,
-                            last_update = EXCLUDED.last_update,
-                            updated_at = CURRENT_TIMESTAMP
-                    ''', (
+                    # ✅ Sem save_seq (saves do servidor) o upsert é incondicional;
+                    # com save_seq, só grava se for maior que o último aplicado
+                    cur.execute(SAVE_GAME_STATE_QUERY, (
                         user_id,
                         aligned_game_data.get('coins', 0),
                         aligned_game_data.get('coins_per_click', 1),
@@ -431,10 +646,26 @@ class DatabaseManager:
                         })),
                         json.dumps(aligned_game_data.get('achievements', [])),
                         json.dumps(aligned_game_data.get('inventory', [])),
-                        current_time
+                        current_time,
+                        save_seq,
+                        save_seq,
+                        save_seq
                     ))
+                    
+                    # ✅ Devolver a nova versão para o cliente usar como base do delta
+                    version_row = cur.fetchone()
+                    if not version_row:
+                        # Save antigo ou duplicado: descartar também o upsert do usuário
+                        conn.rollback()
+                        self._record_dropped_save(user_id, save_seq)
+                        game_data['save_applied'] = False
+                        return True
+                    
+                    game_data['state_version'] = version_row[0]
+                    game_data['save_applied'] = True
                 
                 conn.commit()
+                self.recent_writes.touch(user_id)
                 logger.debug(f"✅ Dados ALINHADOS salvos para usuário: {user_id}")
                 return True
                 
@@ -445,101 +676,121 @@ class DatabaseManager:
         finally:
             self.return_db_connection(conn)
 
-    def _align_game_data_structure(self, game_data: Dict[str, Any]) -> Dict[str, Any]:
-        """✅ CORREÇÃO: Converte estrutura de game_data para formato alinhado"""
-        aligned_data = game_data.copy()
+    def apply_game_state_patch(self, user_id: str, base_version: int,
+                               changes: Dict[str, Any]) -> Dict[str, Any]:
+        """✅ Aplica um delta sobre o estado salvo se a versão base ainda for a atual
+
+        `changes` aceita três seções:
+        - `set`: substitui campos numéricos ou JSONB inteiros
+        - `merge`: mescla objetos JSONB com `||` (ex.: upgrades)
+        - `append`: concatena itens a arrays JSONB com `||` (ex.: achievements)
+
+        Um `save_seq` opcional descarta deltas antigos ou duplicados sem erro.
+
+        Retorna `{'status': 'applied' | 'dropped' | 'conflict' | 'not_found' | 'error',
+        'state_version': int}`.
+        """
+        set_fields, merge_fields, append_fields = self._normalize_patch(changes)
+        assignments = []
+        params = []
         
-        # ✅ CORREÇÃO: Converter popcoins para coins
-        if 'popcoins' in aligned_data and 'coins' not in aligned_data:
-            aligned_data['coins'] = aligned_data.pop('popcoins', 0)
+        for field, value in set_fields.items():
+            if field in PATCH_JSONB_FIELDS:
+                assignments.append(f'{field} = %s::jsonb')
+                params.append(json.dumps(value))
+            else:
+                assignments.append(f'{field} = %s')
+                params.append(value)
         
-        # ✅ CORREÇÃO: Converter clicks para click_count
-        if 'clicks' in aligned_data and 'click_count' not in aligned_data:
-            aligned_data['click_count'] = aligned_data.pop('clicks', 0)
+        for field, value in merge_fields.items():
+            assignments.append(f"{field} = COALESCE({field}, '{{}}'::jsonb) || %s::jsonb")
+            params.append(json.dumps(value))
         
-        # ✅ CORREÇÃO: Garantir estrutura de upgrades alinhada
-        upgrades = aligned_data.get('upgrades', {})
-        if 'auto_clicker' in upgrades:
-            # Migrar auto_clicker para auto_clickers
-            auto_clicker_value = upgrades.pop('auto_clicker', 0)
-            if 'auto_clickers' not in upgrades:
-                upgrades['auto_clickers'] = auto_clicker_value
-            elif upgrades['auto_clickers'] < auto_clicker_value:
-                upgrades['auto_clickers'] = auto_clicker_value
+        for field, value in append_fields.items():
+            assignments.append(f"{field} = COALESCE({field}, '[]'::jsonb) || %s::jsonb")
+            params.append(json.dumps(value))
         
-        # ✅ CORREÇÃO: Garantir todos os upgrades necessários existem
-        required_upgrades = ['click_power', 'auto_clickers', 'click_bots']
-        for upgrade in required_upgrades:
-            if upgrade not in upgrades:
-                upgrades[upgrade] = 1 if upgrade == 'click_power' else 0
+        if not assignments:
+            return {'status': 'applied', 'state_version': base_version}
         
-        aligned_data['upgrades'] = upgrades
+        save_seq = self._parse_save_seq(changes.get('save_seq'))
         
-        return aligned_data
+        if not self.initialized:
+            logger.warning("⚠️ Banco não inicializado - delta não aplicado")
+            return {'status': 'error', 'state_version': base_version}
+        
+        conn = self.get_db_connection()
+        if not conn:
+            logger.error("❌ Falha ao conectar para aplicar delta")
+            return {'status': 'error', 'state_version': base_version}
+        
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f'''
+                    UPDATE user_game_states SET
+                        {', '.join(assignments)},
+                        state_version = state_version + 1,
+                        save_seq = COALESCE(%s::bigint, save_seq),
+                        last_update = CURRENT_TIMESTAMP,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE user_id = %s AND state_version = %s
+                      AND (%s::bigint IS NULL OR save_seq < %s::bigint)
+                    RETURNING state_version
+                ''', (*params, save_seq, user_id, base_version, save_seq, save_seq))
+                row = cur.fetchone()
+                
+                if row:
+                    conn.commit()
+                    self.recent_writes.touch(user_id)
+                    logger.debug(f"✅ Delta aplicado para {user_id}: v{row[0]}")
+                    return {'status': 'applied', 'state_version': row[0]}
+                
+                # ✅ Nenhuma linha afetada: save antigo, versão base antiga ou estado inexistente
+                cur.execute('SELECT state_version, save_seq FROM user_game_states WHERE user_id = %s',
+                            (user_id,))
+                current = cur.fetchone()
+                conn.rollback()
+                
+                if current is None:
+                    return {'status': 'not_found', 'state_version': 0}
+                if save_seq is not None and save_seq <= (current[1] or 0):
+                    self._record_dropped_save(user_id, save_seq)
+                    return {'status': 'dropped', 'state_version': current[0] or 0}
+                return {'status': 'conflict', 'state_version': current[0] or 0}
+                
+        except Exception as e:
+            logger.error(f"❌ Erro ao aplicar delta para {user_id}: {e}")
+            conn.rollback()
+            return {'status': 'error', 'state_version': base_version}
+        finally:
+            self.return_db_connection(conn)
+
+    def get_user_data(self, user_id: str, read_replica: bool = False) -> Optional[Dict[str, Any]]:
+        """✅ CORREÇÃO: Obter dados com estrutura ALINHADA
 
-    def get_user_data(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """✅ CORREÇÃO: Obter dados com estrutura ALINHADA"""
+        `read_replica=True` para leituras só de exibição (perfil): podem vir de
+        uma réplica. Leituras que antecedem um save ficam no primário.
+        """
         if not self.initialized:
             logger.warning("⚠️ Banco não inicializado - retornando dados padrão")
             return self.get_default_user_data(user_id)
         
-        conn = self.get_db_connection()
+        conn = self.get_read_connection(user_id) if read_replica else self.get_db_connection()
         if not conn:
             logger.error("❌ Falha ao conectar para obter dados do usuário")
             return self.get_default_user_data(user_id)
         
         try:
-            with conn.cursor(cursor_factory=DictCursor) as cur:
+            with conn.cursor(cursor_factory=TimedDictCursor) as cur:
                 # ✅ CORREÇÃO: Query atualizada para usar COALESCE nas colunas que podem não existir
-                cur.execute('''
-                    SELECT 
-                        u.user_id, u.email, u.display_name, u.avatar_url,
-                        u.email_verified, u.created_at, u.last_login, 
-                        COALESCE(u.last_activity, u.last_login) as last_activity,
-                        COALESCE(u.preferences, '{}'::jsonb) as preferences,
-                        g.coins, g.coins_per_click, g.coins_per_second, g.total_coins,
-                        g.prestige_level, g.click_count, g.level, g.experience,
-                        g.upgrades, g.achievements, g.inventory, g.last_update
-                    FROM users u
-                    LEFT JOIN user_game_states g ON u.user_id = g.user_id
-                    WHERE u.user_id = %s
-                ''', (user_id,))
+                cur.execute(USER_DATA_QUERY, (user_id,))
                 
                 result = cur.fetchone()
                 if not result:
                     logger.warning(f"⚠️ Usuário não encontrado no banco: {user_id}")
                     return self.get_default_user_data(user_id)
                 
-                # ✅ CORREÇÃO: Estrutura ALINHADA de dados
-                user_data = {
-                    'uid': result['user_id'],
-                    'email': result['email'],
-                    'name': result['display_name'] or result['email'].split('@')[0],
-                    'picture': result['avatar_url'] or '/static/images/default-avatar.png',
-                    'email_verified': result['email_verified'],
-                    'created_at': result['created_at'].isoformat() if result['created_at'] else datetime.now().isoformat(),
-                    'last_login': result['last_login'].isoformat() if result['last_login'] else datetime.now().isoformat(),
-                    'last_activity': result['last_activity'].isoformat() if result['last_activity'] else datetime.now().isoformat(),
-                    'preferences': result['preferences'] or {},
-                    'game_data': {
-                        'coins': result['coins'] or 0,
-                        'click_count': result['click_count'] or 0,
-                        'level': result['level'] or 1,
-                        'experience': result['experience'] or 0,
-                        'coins_per_click': float(result['coins_per_click'] or 1),
-                        'coins_per_second': float(result['coins_per_second'] or 0),
-                        'total_coins': result['total_coins'] or 0,
-                        'prestige_level': result['prestige_level'] or 0,
-                        'upgrades': result['upgrades'] or {
-                            'click_power': 1,
-                            'auto_clickers': 0,
-                            'click_bots': 0
-                        },
-                        'achievements': result['achievements'] or [],
-                        'inventory': result['inventory'] or [],
-                        'last_update': result['last_update'].timestamp() if result['last_update'] else time.time()
-                    }
-                }
+                user_data = self._row_to_user_data(result)
                 
                 logger.debug(f"✅ Dados ALINHADOS carregados do banco para usuário: {user_id}")
                 return user_data
@@ -550,48 +801,107 @@ class DatabaseManager:
         finally:
             self.return_db_connection(conn)
 
-    def get_default_user_data(self, user_id: str) -> Dict[str, Any]:
-        """✅ CORREÇÃO: Dados padrão ALINHADOS"""
-        current_time = datetime.now().isoformat()
-        return {
-            'uid': user_id,
-            'email': 'unknown@example.com',
-            'name': 'Jogador',
-            'picture': '/static/images/default-avatar.png',
-            'email_verified': False,
-            'created_at': current_time,
-            'last_login': current_time,
-            'last_activity': current_time,
-            'preferences': {
-                'notifications': True,
-                'sound_effects': True,
-                'music': True,
-                'autosave': True
-            },
-            'game_data': self.get_default_game_state()
-        }
+    def get_users_data(self, user_ids) -> Dict[str, Dict[str, Any]]:
+        """Vários usuários em uma consulta (usuários inexistentes ficam de fora)"""
+        user_ids = list(user_ids)
+        if not self.initialized or not user_ids:
+            return {}
+        
+        conn = self.get_db_connection()
+        if not conn:
+            logger.error("❌ Falha ao conectar para obter dados dos usuários")
+            return {}
+        
+        try:
+            with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+                cur.execute(USERS_DATA_QUERY, (user_ids,))
+                return {row['user_id']: self._row_to_user_data(row) for row in cur.fetchall()}
+                
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter dados de {len(user_ids)} usuários: {e}")
+            return {}
+        finally:
+            self.return_db_connection(conn)
 
-    def get_default_game_state(self) -> Dict[str, Any]:
-        """✅ CORREÇÃO: Estado padrão do jogo ALINHADO"""
-        import time
-        return {
-            'coins': 0,
-            'click_count': 0,
-            'level': 1,
-            'experience': 0,
-            'coins_per_click': 1,
-            'coins_per_second': 0,
-            'total_coins': 0,
-            'prestige_level': 0,
-            'upgrades': {
-                'click_power': 1,
-                'auto_clickers': 0,
-                'click_bots': 0
-            },
-            'achievements': [],
-            'inventory': [],
-            'last_update': time.time()
-        }
+    def provision_user(self, user_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Cria usuário e estado inicial se ainda não existirem e devolve o perfil completo
+
+        Um único comando: os INSERTs (ON CONFLICT DO NOTHING) ficam em CTEs e o
+        SELECT devolve a linha recém-criada ou, se já existia, a linha atual.
+        Usuários existentes não sofrem escrita. Retorna o perfil com a chave
+        'created' ou None em caso de erro.
+        """
+        user_id = user_info['uid']
+        if not self.initialized:
+            return {**self.get_default_user_data(user_id), 'created': False}
+        
+        conn = self.get_db_connection()
+        if not conn:
+            logger.error("❌ Falha ao conectar para provisionar usuário")
+            return {**self.get_default_user_data(user_id), 'created': False}
+        
+        columns = '''
+            u.user_id, u.email, u.display_name, u.avatar_url,
+            u.email_verified, u.created_at, u.last_login,
+            COALESCE(u.last_activity, u.last_login) as last_activity,
+            COALESCE(u.preferences, '{}'::jsonb) as preferences,
+            g.coins, g.coins_per_click, g.coins_per_second, g.total_coins,
+            g.prestige_level, g.click_count, g.level, g.experience,
+            g.upgrades, g.achievements, g.inventory, g.last_update,
+            g.state_version, g.save_seq
+        '''
+        
+        try:
+            with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+                # O SELECT final enxerga o snapshot anterior aos INSERTs: para um
+                # usuário novo só o primeiro ramo retorna linha; para um existente, só o segundo
+                cur.execute(f'''
+                    WITH new_user AS (
+                        INSERT INTO users (user_id, email, display_name, avatar_url, email_verified)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (user_id) DO NOTHING
+                        RETURNING *
+                    ), new_state AS (
+                        INSERT INTO user_game_states (user_id)
+                        VALUES (%s)
+                        ON CONFLICT (user_id) DO NOTHING
+                        RETURNING *
+                    )
+                    SELECT {columns}, TRUE as created
+                    FROM new_user u
+                    LEFT JOIN new_state g ON g.user_id = u.user_id
+                    UNION ALL
+                    SELECT {columns}, FALSE as created
+                    FROM users u
+                    LEFT JOIN user_game_states g ON g.user_id = u.user_id
+                    WHERE u.user_id = %s
+                ''', (
+                    user_id,
+                    user_info.get('email', ''),
+                    user_info.get('name', ''),
+                    stored_avatar(user_info.get('picture')),
+                    user_info.get('email_verified', False),
+                    user_id,
+                    user_id
+                ))
+                
+                result = cur.fetchone()
+                conn.commit()
+                
+                if not result:
+                    return None
+                
+                if result['created']:
+                    self.recent_writes.touch(user_id)
+                    logger.info(f"🆕 Usuário provisionado: {user_id}")
+                return {**self._row_to_user_data(result), 'created': result['created']}
+                
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"❌ Erro ao provisionar usuário {user_id}: {e}")
+            return None
+        finally:
+            self.return_db_connection(conn)
 
     def get_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
         """✅ CORREÇÃO: Ranking otimizado"""
@@ -599,42 +909,101 @@ class DatabaseManager:
             logger.warning("⚠️ Banco não inicializado - retornando ranking mock")
             return self.get_mock_ranking(limit)
         
-        conn = self.get_db_connection()
-        if not conn:
-            logger.error("❌ Falha ao conectar para obter ranking")
+        rows = self.get_ranking_rows(limit)
+        if rows is None:
             return self.get_mock_ranking(limit)
         
+        ranking = [self._ranking_entry(row, idx + 1) for idx, row in enumerate(rows)]
+        logger.debug("✅ Ranking carregado: %d jogadores", len(ranking), extra=SAMPLED)
+        return ranking
+
+    def get_ranking_rows(self, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Linhas do top N na ordem do ranking; None se o banco falhar"""
+        conn = self.get_read_connection()
+        if not conn:
+            logger.error(f"❌ Falha ao conectar para obter ranking ({self.name})")
+            return None
+        
         try:
-            with conn.cursor(cursor_factory=DictCursor) as cur:
-                cur.execute('''
-                    SELECT u.user_id, u.display_name, u.avatar_url,
-                           g.total_coins as total_score, g.prestige_level, g.level
-                    FROM user_game_states g
-                    JOIN users u ON g.user_id = u.user_id
-                    ORDER BY g.total_coins DESC, g.prestige_level DESC, g.level DESC
-                    LIMIT %s
-                ''', (limit,))
+            with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+                cur.execute(RANKING_QUERY, (limit,))
+                return [dict(row) for row in cur.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"❌ Erro ao obter ranking ({self.name}): {e}")
+            return None
+        finally:
+            self.return_db_connection(conn)
+
+    def count_ranked_ahead(self, total_coins: int, prestige_level: int, level: int) -> Optional[int]:
+        """Jogadores à frente da posição dada (mesma ordenação do ranking); None se o banco falhar"""
+        if not self.initialized:
+            return None
+        
+        conn = self.get_read_connection()
+        if not conn:
+            return None
+        
+        try:
+            with conn.cursor() as cur:
+                cur.execute(COUNT_AHEAD_QUERY, (total_coins, prestige_level, level))
+                return cur.fetchone()[0]
                 
-                results = cur.fetchall()
-                ranking = []
+        except Exception as e:
+            logger.error(f"❌ Erro ao contar posição no ranking ({self.name}): {e}")
+            return None
+        finally:
+            self.return_db_connection(conn)
+
+    def get_user_overview(self, user_id: str, limit: int = 10) -> Dict[str, Any]:
+        """Perfil, estado do jogo, top N e posição do usuário em uma única consulta"""
+        if not self.initialized:
+            return {
+                'profile': self.get_default_user_data(user_id),
+                'ranking': self.get_mock_ranking(limit),
+                'own_rank': None
+            }
+        
+        conn = self.get_read_connection(user_id)
+        if not conn:
+            logger.error("❌ Falha ao conectar para obter visão geral do usuário")
+            return {
+                'profile': self.get_default_user_data(user_id),
+                'ranking': self.get_mock_ranking(limit),
+                'own_rank': None
+            }
+        
+        try:
+            with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+                # ✅ Um round trip: linha do usuário + top N agregado em JSON + posição
+                # (a posição conta quem está à frente pela mesma ordenação do ranking)
+                cur.execute(USER_OVERVIEW_QUERY, (limit, user_id))
                 
-                for idx, row in enumerate(results):
-                    ranking.append({
-                        'uid': row['user_id'],
-                        'name': row['display_name'] or f'Jogador {idx + 1}',
-                        'avatar': row['avatar_url'] or '/static/images/default-avatar.png',
-                        'total_coins': row['total_score'],
-                        'prestige_level': row['prestige_level'],
-                        'level': row['level'],
-                        'rank': idx + 1
-                    })
+                result = cur.fetchone()
+                if not result:
+                    logger.warning(f"⚠️ Usuário não encontrado no banco: {user_id}")
+                    return {
+                        'profile': self.get_default_user_data(user_id),
+                        'ranking': self.get_ranking(limit),
+                        'own_rank': None
+                    }
                 
-                logger.info(f"✅ Ranking carregado: {len(ranking)} jogadores")
-                return ranking
+                return {
+                    'profile': self._row_to_user_data(result),
+                    'ranking': [
+                        self._ranking_entry(row, idx + 1)
+                        for idx, row in enumerate(result['top_ranking'] or [])
+                    ],
+                    'own_rank': result['own_rank']
+                }
                 
         except Exception as e:
-            logger.error(f"❌ Erro ao obter ranking: {e}")
-            return self.get_mock_ranking(limit)
+            logger.error(f"❌ Erro ao obter visão geral do usuário {user_id}: {e}")
+            return {
+                'profile': self.get_default_user_data(user_id),
+                'ranking': self.get_mock_ranking(limit),
+                'own_rank': None
+            }
         finally:
             self.return_db_connection(conn)
 
@@ -647,6 +1016,17 @@ class DatabaseManager:
         ]
         return mock_ranking[:limit]
 
+    def pool_stats(self) -> Dict[str, int]:
+        """Conexões do pool por estado (sem tocar no banco)"""
+        pool_ref = self.connection_pool
+        if not pool_ref:
+            return {'in_use': 0, 'idle': 0, 'max': 0}
+        return {
+            'in_use': len(pool_ref._used),
+            'idle': len(pool_ref._pool),
+            'max': pool_ref.maxconn
+        }
+
     def health_check(self) -> Dict[str, Any]:
         """✅ CORREÇÃO: Health check do banco"""
         try:
@@ -676,7 +1056,9 @@ class DatabaseManager:
                     'database_version': result[0] if result else 'Unknown',
                     'database_name': result[1] if result else 'Unknown',
                     'database_user': result[2] if result else 'Unknown',
-                    'pool_size': connection_pool._used if connection_pool else 0
+                    'pool_size': len(self.connection_pool._used) if self.connection_pool else 0,
+                    'dropped_saves': self.dropped_saves,
+                    'replicas': self.replicas.stats() if self.replicas else {}
                 }
             finally:
                 self.return_db_connection(conn)
@@ -691,16 +1073,43 @@ class DatabaseManager:
 # ✅ CORREÇÃO: Instância única com inicialização controlada
 db_manager = None
 
+def create_storage_backend(engine: Optional[str] = None) -> StorageBackend:
+    """Engine de armazenamento escolhida por STORAGE_BACKEND (postgres | sqlite | memory)
+
+    Sem STORAGE_BACKEND: Postgres se DATABASE_URL (ou DATABASE_SHARD_URLS)
+    existir, senão memória, para rodar os caminhos reais do código localmente.
+    Postgres com DATABASE_SHARD_URLS distribui os jogadores entre os shards.
+    """
+    engine = (engine or os.environ.get('STORAGE_BACKEND') or '').strip().lower()
+    if not engine:
+        has_postgres = os.environ.get('DATABASE_URL') or os.environ.get('DATABASE_SHARD_URLS')
+        engine = 'postgres' if has_postgres else 'memory'
+        if engine == 'memory':
+            logger.warning("⚠️ DATABASE_URL não configurada - usando armazenamento em memória")
+    
+    if engine == 'postgres':
+        if load_shard_urls():
+            from database.sharded_storage import ShardedDatabaseManager
+            return ShardedDatabaseManager()
+        return DatabaseManager()
+    if engine == 'sqlite':
+        from database.sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    if engine == 'memory':
+        from database.memory_storage import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"STORAGE_BACKEND desconhecido: '{engine}'")
+
 def get_database_manager():
-    """Singleton para DatabaseManager"""
+    """Singleton do armazenamento (DatabaseManager ou outra engine)"""
     global db_manager
     if db_manager is None:
         try:
             logger.info("🔄 Criando DatabaseManager...")
-            db_manager = DatabaseManager()
+            db_manager = create_storage_backend()
             
             if db_manager.initialized:
-                logger.info("🎉 DatabaseManager inicializado com sucesso!")
+                logger.info(f"🎉 DatabaseManager inicializado com sucesso! (engine: {db_manager.engine})")
                 
                 health = db_manager.health_check()
                 logger.info(f"📊 Health check do banco: {health['message']}")
@@ -714,6 +1123,5 @@ def get_database_manager():
     return db_manager
 
 # Inicialização controlada
-import time
 logger.info("📦 Inicializando db_models.py...")
 db_manager = get_database_manager()
\ No newline at end of file
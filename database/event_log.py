@@ -0,0 +1,375 @@
+# database/event_log.py - Log append-only das ações do jogo (buffer em memória + COPY em lote)
+import io
+import os
+import json
+import time
+import atexit
+import threading
+import logging
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import psycopg2
+
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+GAME_EVENTS = registry.counter(
+    'popcoin_game_events_total', 'Eventos do jogo por destino (recorded, written, dropped, failed)', ('result',)
+)
+
+DROP_POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+# Particionada por dia (UTC): retenção vira DROP TABLE da partição, sem DELETE nem VACUUM
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS game_events (
+    created_at TIMESTAMPTZ NOT NULL,
+    user_id VARCHAR(255) NOT NULL,
+    event_type VARCHAR(32) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_game_events_user ON game_events (user_id, created_at);
+
+-- Pontos de partida do replay (game/journal.py): snapshot periódico ou save completo do cliente
+CREATE INDEX IF NOT EXISTS idx_game_events_anchors ON game_events (user_id, created_at)
+    WHERE event_type IN ('snapshot', 'save');
+'''
+
+COPY_SQL = 'COPY game_events (created_at, user_id, event_type, payload) FROM STDIN'
+
+ANCHOR_EVENT_TYPES = ('snapshot', 'save')
+
+# Último estado completo do usuário até o instante pedido
+JOURNAL_ANCHOR_QUERY = '''
+SELECT created_at, event_type, payload FROM game_events
+WHERE user_id = %s AND event_type IN ('snapshot', 'save') AND created_at <= %s
+ORDER BY created_at DESC
+LIMIT 1
+'''
+
+# Eventos depois do ponto de partida (sem ponto de partida: desde o cadastro)
+JOURNAL_TAIL_QUERY = '''
+SELECT created_at, event_type, payload FROM game_events
+WHERE user_id = %s AND (%s::timestamptz IS NULL OR created_at > %s) AND created_at <= %s
+ORDER BY created_at
+'''
+
+Event = Tuple[float, str, str, Dict[str, Any]]
+
+
+def partition_name(day: date) -> str:
+    return f"game_events_{day:%Y%m%d}"
+
+
+def _copy_text(value: str) -> str:
+    """Escapa um campo para o formato texto do COPY"""
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def encode_events(events: List[Event]) -> io.StringIO:
+    lines = []
+    for created_at, user_id, event_type, payload in events:
+        timestamp = datetime.fromtimestamp(created_at, timezone.utc).isoformat()
+        lines.append('\t'.join((
+            timestamp,
+            _copy_text(user_id),
+            _copy_text(event_type),
+            _copy_text(json.dumps(payload, separators=(',', ':'), default=str)),
+        )))
+    return io.StringIO('\n'.join(lines) + '\n')
+
+
+class EventRecorder:
+    """Buffer limitado de eventos do jogo, gravado em lote por uma thread própria
+
+    `record` só enfileira (um lock e um append): a requisição nunca espera o
+    banco. A thread de flush grava com COPY quando o buffer junta `batch_size`
+    eventos ou a cada `flush_interval` segundos, usando uma conexão própria
+    (fora do pool do app).
+
+    Buffer cheio (`max_events`), conforme `drop_policy`:
+    - drop_newest: descarta o evento novo (padrão)
+    - drop_oldest: descarta o mais antigo do buffer
+    - block: espera até `block_timeout` segundos por espaço e então descarta o novo
+
+    Se o banco falhar, o lote volta para o buffer (enquanto couber) e a
+    gravação é retentada com backoff. No encerramento do processo (`close`,
+    registrado no atexit) o buffer é gravado antes de sair.
+    """
+
+    def __init__(self, database_url: Optional[str], sslmode: str = 'require', max_events: int = 50000,
+                 batch_size: int = 5000, flush_interval: float = 1.0, drop_policy: str = 'drop_newest',
+                 block_timeout: float = 0.05, partitions_ahead: int = 2, retention_days: int = 0):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"GAME_EVENTS_DROP_POLICY desconhecida: '{drop_policy}'")
+        self.database_url = database_url
+        self.sslmode = sslmode
+        self.enabled = bool(database_url)
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.partitions_ahead = partitions_ahead
+        self.retention_days = retention_days
+        self._buffer: "deque[Event]" = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._last_time = 0.0
+        self._conn = None
+        self._partitions: Set[str] = set()
+        self.last_error: Optional[str] = None
+
+    # ========== ENFILEIRAMENTO ==========
+
+    def record(self, user_id: str, event_type: str, payload: Optional[Dict[str, Any]] = None) -> bool:
+        """Enfileira um evento; False se foi descartado (buffer cheio ou gravação desligada)"""
+        if not self.enabled or self._stopping:
+            return False
+        self._ensure_started()
+        with self._lock:
+            # Instantes estritamente crescentes no processo: o replay ordena por created_at
+            self._last_time = max(time.time(), self._last_time + 1e-6)
+            event = (self._last_time, user_id, event_type, payload or {})
+            if len(self._buffer) >= self.max_events:
+                if self.drop_policy == 'drop_oldest':
+                    self._buffer.popleft()
+                    GAME_EVENTS.inc('dropped')
+                elif self.drop_policy != 'block' or not self._not_full.wait_for(
+                        lambda: len(self._buffer) < self.max_events, self.block_timeout):
+                    GAME_EVENTS.inc('dropped')
+                    return False
+            self._buffer.append(event)
+            if len(self._buffer) >= self.batch_size:
+                self._not_empty.notify()
+        GAME_EVENTS.inc('recorded')
+        return True
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    # ========== THREAD DE FLUSH ==========
+
+    def _ensure_started(self) -> None:
+        # Início preguiçoso: a thread nasce no worker (pós-fork), não no master do gunicorn
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._stopping or (self._thread and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name='event-recorder', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self) -> None:
+        backoff = self.flush_interval
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._stopping or len(self._buffer) >= self.batch_size,
+                                         backoff)
+                stopping = self._stopping
+            if self.flush() is False:
+                # Banco fora do ar: espaçar as tentativas (até 30s) em vez de insistir a cada intervalo
+                if stopping:
+                    return
+                backoff = min(backoff * 2, 30.0)
+                continue
+            backoff = self.flush_interval
+            if stopping:
+                return
+
+    def _take_batch(self) -> List[Event]:
+        with self._lock:
+            count = min(len(self._buffer), self.batch_size)
+            batch = [self._buffer.popleft() for _ in range(count)]
+            if batch:
+                self._not_full.notify_all()
+            return batch
+
+    def _requeue(self, batch: List[Event]) -> None:
+        """Devolve um lote que falhou à frente do buffer, até o limite; o excedente é perdido"""
+        with self._lock:
+            room = max(0, self.max_events - len(self._buffer))
+            kept = batch[len(batch) - room:] if room < len(batch) else batch
+            self._buffer.extendleft(reversed(kept))
+        lost = len(batch) - len(kept)
+        if lost:
+            GAME_EVENTS.inc('failed', amount=lost)
+
+    def flush(self) -> Optional[bool]:
+        """Grava o buffer em lotes; None se não havia nada, False se o banco falhou"""
+        written = None
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return written
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"⚠️ Falha ao gravar {len(batch)} eventos do jogo: {e}")
+                self._reset_connection()
+                self._requeue(batch)
+                return False
+            GAME_EVENTS.inc('written', amount=len(batch))
+            written = True
+
+    # ========== BANCO ==========
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(dsn=self.database_url, sslmode=self.sslmode, connect_timeout=10)
+            with self._conn.cursor() as cur:
+                cur.execute(SCHEMA)
+            self._conn.commit()
+            self._partitions = set()
+            self._maintain_partitions()
+        return self._conn
+
+    def _reset_connection(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _write(self, batch: List[Event]) -> None:
+        conn = self._connection()
+        days = {datetime.fromtimestamp(event[0], timezone.utc).date() for event in batch}
+        for day in days:
+            self._ensure_partition(day)
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(COPY_SQL, encode_events(batch))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if partition_name(datetime.now(timezone.utc).date() + timedelta(days=1)) not in self._partitions:
+            # Virada do dia: criar as próximas partições antes de precisar delas
+            self._maintain_partitions()
+
+    def _maintain_partitions(self) -> None:
+        today = datetime.now(timezone.utc).date()
+        for offset in range(self.partitions_ahead + 1):
+            self._ensure_partition(today + timedelta(days=offset))
+        if self.retention_days > 0:
+            self._drop_expired_partitions(today - timedelta(days=self.retention_days))
+
+    def _ensure_partition(self, day: date) -> None:
+        name = partition_name(day)
+        if name in self._partitions:
+            return
+        conn = self._conn
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {name} PARTITION OF game_events
+                    FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')
+                ''')
+            conn.commit()
+        except (psycopg2.errors.DuplicateTable, psycopg2.errors.UniqueViolation):
+            # Outro worker criou a mesma partição ao mesmo tempo
+            conn.rollback()
+        self._partitions.add(name)
+
+    def _drop_expired_partitions(self, cutoff: date) -> None:
+        conn = self._conn
+        with conn.cursor() as cur:
+            cur.execute('''
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                JOIN pg_class p ON p.oid = i.inhparent
+                WHERE p.relname = 'game_events'
+            ''')
+            expired = [name for (name,) in cur.fetchall() if name < partition_name(cutoff)]
+            for name in expired:
+                cur.execute(f'DROP TABLE IF EXISTS {name}')
+        conn.commit()
+        if expired:
+            logger.info(f"🧹 Partições de eventos removidas (retenção): {', '.join(expired)}")
+
+    # ========== ENCERRAMENTO E ESTADO ==========
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Para a thread e grava o que restou no buffer (chamado no atexit e no worker_exit)"""
+        with self._lock:
+            self._stopping = True
+            self._not_empty.notify_all()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+            if thread.is_alive():
+                # Flush preso no banco: não disputar a conexão com ele
+                logger.warning(f"⚠️ Gravação de eventos não terminou em {timeout:.0f}s")
+                return
+        if self._buffer and self.enabled:
+            self.flush()
+        remaining = len(self._buffer)
+        if remaining:
+            GAME_EVENTS.inc('failed', amount=remaining)
+            logger.warning(f"⚠️ {remaining} eventos do jogo perdidos no encerramento")
+            self._buffer.clear()
+        self._reset_connection()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'buffered': len(self._buffer),
+            'max_events': self.max_events,
+            'drop_policy': self.drop_policy,
+            'last_error': self.last_error,
+        }
+
+
+# ========== LEITURA (replay) ==========
+
+def load_anchor(conn, user_id: str, until: datetime) -> Optional[Tuple[datetime, str, Dict[str, Any]]]:
+    """(created_at, tipo, estado) do snapshot ou save mais recente até `until`"""
+    with conn.cursor() as cur:
+        cur.execute(JOURNAL_ANCHOR_QUERY, (user_id, until))
+        return cur.fetchone()
+
+
+def iter_journal(conn, user_id: str, after: Optional[datetime], until: datetime,
+                 chunk_size: int = 5000) -> Iterator[List[Tuple[datetime, str, Dict[str, Any]]]]:
+    """Eventos em (after, until] em blocos de `chunk_size` (cursor no servidor: memória constante)"""
+    with conn.cursor(name='journal_tail') as cur:
+        cur.itersize = chunk_size
+        cur.execute(JOURNAL_TAIL_QUERY, (user_id, after, after, until))
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def create_event_recorder() -> EventRecorder:
+    """GAME_EVENTS_DATABASE_URL (ou DATABASE_URL); GAME_EVENTS_ENABLED=0 desliga"""
+    database_url = os.environ.get('GAME_EVENTS_DATABASE_URL') or os.environ.get('DATABASE_URL')
+    if os.environ.get('GAME_EVENTS_ENABLED', '1') == '0':
+        database_url = None
+    if database_url and database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    return EventRecorder(
+        database_url,
+        sslmode=os.environ.get('DATABASE_SSLMODE', 'require'),
+        max_events=int(os.environ.get('GAME_EVENTS_BUFFER_MAX', 50000)),
+        batch_size=int(os.environ.get('GAME_EVENTS_BATCH_SIZE', 5000)),
+        flush_interval=float(os.environ.get('GAME_EVENTS_FLUSH_INTERVAL', 1.0)),
+        drop_policy=os.environ.get('GAME_EVENTS_DROP_POLICY', 'drop_newest'),
+        block_timeout=float(os.environ.get('GAME_EVENTS_BLOCK_TIMEOUT_MS', 50)) / 1000,
+        partitions_ahead=int(os.environ.get('GAME_EVENTS_PARTITIONS_AHEAD', 2)),
+        retention_days=int(os.environ.get('GAME_EVENTS_RETENTION_DAYS', 0)),
+    )
+
+
+# ✅ Instância única por processo
+event_recorder = create_event_recorder()
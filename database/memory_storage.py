@@ -0,0 +1,113 @@
+# database/memory_storage.py - Engine de armazenamento em memória (por processo)
+import json
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from database.storage import PATCH_JSONB_FIELDS, RecordStorage, dumps, ranking_key, top_by_ranking
+
+logger = logging.getLogger(__name__)
+
+USER_JSON_FIELDS = ('preferences',)
+
+
+class MemoryStorage(RecordStorage):
+    """Usuários e estados em dicionários, protegidos por um lock
+
+    Os campos JSON ficam serializados, como no banco: quem lê recebe cópias e
+    alterações no dict devolvido não vazam para o armazenamento. Os dados
+    somem com o processo (cada worker do gunicorn tem os seus).
+    """
+
+    engine = 'memory'
+
+    def __init__(self):
+        super().__init__()
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.states: Dict[str, Dict[str, Any]] = {}
+        # RLock: leituras feitas dentro de uma transação também pegam o lock
+        self._lock = threading.RLock()
+        self._undo: Optional[List] = None
+        self.initialized = True
+        logger.info("🧠 Armazenamento em memória pronto")
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Escritas vão direto para os dicts; se a transação falhar, os valores anteriores voltam"""
+        with self._lock:
+            if self._undo is not None:
+                yield
+                return
+            self._undo = []
+            try:
+                yield
+            except BaseException:
+                for table, key, previous in reversed(self._undo):
+                    if previous is None:
+                        table.pop(key, None)
+                    else:
+                        table[key] = previous
+                raise
+            finally:
+                self._undo = None
+
+    def _write(self, table: Dict[str, Dict[str, Any]], key: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._undo is not None:
+                self._undo.append((table, key, table.get(key)))
+            table[key] = record
+
+    def _get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            user = self.users.get(user_id)
+        return _decode(user, USER_JSON_FIELDS)
+
+    def _get_state(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            state = self.states.get(user_id)
+        return _decode(state, PATCH_JSONB_FIELDS)
+
+    def _put_user(self, user: Dict[str, Any]) -> None:
+        self._write(self.users, user['user_id'], _encode(user, USER_JSON_FIELDS))
+
+    def _put_state(self, user_id: str, state: Dict[str, Any]) -> None:
+        self._write(self.states, user_id, _encode(state, PATCH_JSONB_FIELDS))
+
+    def _top_rows(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            pairs = [(self.users[user_id], state) for user_id, state in self.states.items()
+                     if user_id in self.users]
+        return top_by_ranking(pairs, limit)
+
+    def _count_ahead(self, state: Dict[str, Any]) -> int:
+        key = ranking_key(state)
+        with self._lock:
+            return sum(1 for other in self.states.values() if ranking_key(other) > key)
+
+    def health_check(self) -> Dict[str, Any]:
+        with self._lock:
+            users = len(self.users)
+        return {
+            'healthy': True,
+            'message': 'Armazenamento em memória',
+            'engine': self.engine,
+            'users': users,
+            'dropped_saves': self.dropped_saves
+        }
+
+
+def _encode(record: Dict[str, Any], json_fields) -> Dict[str, Any]:
+    encoded = dict(record)
+    for field in json_fields:
+        encoded[field] = dumps(encoded.get(field))
+    return encoded
+
+
+def _decode(record: Optional[Dict[str, Any]], json_fields) -> Optional[Dict[str, Any]]:
+    if record is None:
+        return None
+    decoded = dict(record)
+    for field in json_fields:
+        decoded[field] = json.loads(decoded[field])
+    return decoded
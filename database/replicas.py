@@ -0,0 +1,196 @@
+# database/replicas.py - Réplicas de leitura do Postgres (round-robin com fallback) e janela read-your-writes
+import os
+import time
+import threading
+import logging
+import urllib.parse
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+from psycopg2 import pool
+
+from core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DB_READS = registry.counter(
+    'popcoin_db_reads_total', 'Leituras roteadas por destino (primary / replica)', ('target',)
+)
+
+
+class Replica:
+    """Uma réplica com pool próprio; fica fora da rotação por `retry_interval` após uma falha"""
+
+    def __init__(self, name: str, dsn: str, sslmode: str, pool_max: int, cursor_factory):
+        self.name = name
+        self.dsn = dsn
+        self.sslmode = sslmode
+        self.pool_max = pool_max
+        self.cursor_factory = cursor_factory
+        self.pool: Optional[pool.ThreadedConnectionPool] = None
+        self.down_until = 0.0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def checkout(self):
+        """Conexão validada com SELECT 1; None (e réplica marcada como fora) em caso de erro"""
+        try:
+            with self._lock:
+                if self.pool is None:
+                    # minconn=0 na criação: uma réplica fora do ar no boot não impede o app de subir.
+                    # Depois, minconn = máximo: o psycopg2 só mantém ociosas até minconn conexões
+                    self.pool = pool.ThreadedConnectionPool(
+                        0, self.pool_max, dsn=self.dsn, sslmode=self.sslmode,
+                        connect_timeout=5, cursor_factory=self.cursor_factory
+                    )
+                    self.pool.minconn = self.pool_max
+            conn = self.pool.getconn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT 1')
+            except psycopg2.Error:
+                self.pool.putconn(conn, close=True)
+                raise
+            return conn
+        except pool.PoolError:
+            # Pool esgotado não é falha da réplica: a leitura tenta a próxima ou o primário
+            return None
+        except Exception as e:
+            self.mark_failure(e)
+            return None
+
+    def release(self, conn) -> None:
+        if conn.closed:
+            # Conexão caiu durante a consulta: tirar a réplica da rotação
+            self.mark_failure('conexão encerrada durante a consulta')
+        try:
+            self.pool.putconn(conn, close=bool(conn.closed))
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao retornar conexão da réplica {self.name}: {e}")
+
+    def mark_failure(self, error: Any) -> None:
+        self.failures += 1
+        self.last_error = str(error)
+        self.down_until = time.monotonic() + ReplicaSet.retry_interval
+        logger.warning(f"⚠️ Réplica {self.name} fora da rotação por {ReplicaSet.retry_interval:.0f}s: {error}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'healthy': self.is_available(time.monotonic()),
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'in_use': len(self.pool._used) if self.pool else 0,
+            'idle': len(self.pool._pool) if self.pool else 0,
+            'max': self.pool_max
+        }
+
+
+class ReplicaSet:
+    """Distribui leituras entre as réplicas em round-robin, pulando as que falharam
+
+    Se nenhuma réplica responder, `checkout` devolve None e o chamador usa o primário.
+    """
+
+    retry_interval = float(os.environ.get('DATABASE_REPLICA_RETRY_SECONDS', 30))
+
+    def __init__(self, dsns: List[str], sslmode: str, pool_max: int, cursor_factory):
+        self.replicas: List[Replica] = []
+        for index, dsn in enumerate(dsns):
+            name = replica_name(dsn, index)
+            if any(replica.name == name for replica in self.replicas):
+                name = f'{name}#{index}'
+            self.replicas.append(Replica(name, dsn, sslmode, pool_max, cursor_factory))
+        self._next = 0
+        self._owners: Dict[int, Replica] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def checkout(self):
+        now = time.monotonic()
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if not replica.is_available(now):
+                continue
+            conn = replica.checkout()
+            if conn is not None:
+                with self._lock:
+                    self._owners[id(conn)] = replica
+                return conn
+        return None
+
+    def release(self, conn) -> bool:
+        """Devolve a conexão à réplica de origem; False se ela não veio de uma réplica"""
+        with self._lock:
+            replica = self._owners.pop(id(conn), None)
+        if replica is None:
+            return False
+        replica.release(conn)
+        return True
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {replica.name: replica.stats() for replica in self.replicas}
+
+
+class RecentWrites:
+    """Usuários que escreveram nos últimos `window` segundos (leem do primário)
+
+    Evita que o usuário veja, logo depois de salvar, um dado anterior ao save
+    vindo de uma réplica atrasada. A janela é por processo: com vários workers,
+    a leitura seguinte pode cair em outro worker e ir para a réplica.
+    """
+
+    def __init__(self, window: float, max_entries: int = 100000):
+        self.window = window
+        self.max_entries = max_entries
+        self._writes: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def touch(self, user_id: str) -> None:
+        with self._lock:
+            self._writes[user_id] = time.monotonic()
+            self._writes.move_to_end(user_id)
+            while len(self._writes) > self.max_entries:
+                self._writes.popitem(last=False)
+
+    def is_pinned(self, user_id: Optional[str]) -> bool:
+        if not user_id:
+            return False
+        with self._lock:
+            written_at = self._writes.get(user_id)
+            if written_at is None:
+                return False
+            if time.monotonic() - written_at > self.window:
+                del self._writes[user_id]
+                return False
+            return True
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+
+def replica_name(dsn: str, index: int) -> str:
+    """Nome para logs e métricas (host:porta, sem credenciais)"""
+    parsed = urllib.parse.urlparse(dsn)
+    if parsed.hostname:
+        return f'{parsed.hostname}:{parsed.port or 5432}'
+    return f'replica-{index}'
+
+
+def load_replica_urls() -> List[str]:
+    """DATABASE_REPLICA_URLS: DSNs separados por vírgula"""
+    urls = []
+    for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(','):
+        url = url.strip()
+        if url:
+            urls.append(url.replace('postgres://', 'postgresql://', 1) if url.startswith('postgres://') else url)
+    return urls
@@ -0,0 +1,166 @@
+# database/sharded_storage.py - Jogadores distribuídos entre vários Postgres (hash consistente)
+import heapq
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from core.logging_setup import SAMPLED
+from database.db_models import DatabaseManager
+from database.sharding import HashRing, load_shard_urls, load_vnodes
+from database.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+
+def _row_key(row: Dict[str, Any]):
+    return (row['total_score'], row['prestige_level'], row['level'])
+
+
+class ShardedDatabaseManager(StorageBackend):
+    """Um DatabaseManager (e um pool) por shard de DATABASE_SHARD_URLS
+
+    Cada usuário vive inteiro (users + user_game_states) no shard escolhido
+    pelo HashRing, então leitura, save, delta e provisionamento continuam sendo
+    uma transação em um único banco. Só o ranking e a posição do jogador
+    consultam todos os shards, em paralelo (scatter-gather).
+
+    O e-mail é único por shard, não globalmente.
+    """
+
+    engine = 'postgres-sharded'
+
+    def __init__(self, shard_urls: Optional[List] = None, vnodes: Optional[int] = None):
+        super().__init__()
+        shard_urls = shard_urls or load_shard_urls()
+        self.ring = HashRing([name for name, _ in shard_urls], vnodes or load_vnodes())
+        self.shards: Dict[str, DatabaseManager] = {
+            name: DatabaseManager(dsn, name=name, use_replicas=False)
+            for name, dsn in shard_urls
+        }
+        # ✅ Scatter-gather em paralelo: a consulta espera o shard mais lento, não a soma.
+        # Uma thread por conexão possível; mais que isso só esperaria pelo pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=sum(shard.pool_max for shard in self.shards.values()),
+            thread_name_prefix='shard'
+        )
+        self.replicas = None
+        self.initialized = all(shard.initialized for shard in self.shards.values())
+        logger.info(f"✅ {len(self.shards)} shard(s) com {self.ring.vnodes} nós virtuais: {', '.join(self.shards)}")
+
+    @property
+    def dropped_saves(self) -> int:
+        return sum(shard.dropped_saves for shard in self.shards.values())
+
+    @dropped_saves.setter
+    def dropped_saves(self, value: int) -> None:
+        # StorageBackend.__init__ zera o contador; aqui ele é a soma dos shards
+        pass
+
+    def shard_for(self, user_id: str) -> DatabaseManager:
+        return self.shards[self.ring.node_for(user_id)]
+
+    def _scatter(self, call: Callable[[DatabaseManager], Any]) -> Dict[str, Any]:
+        """Executa `call` em todos os shards em paralelo; resultado por nome de shard"""
+        futures = {name: self._executor.submit(call, shard) for name, shard in self.shards.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    # ========== OPERAÇÕES DE UM USUÁRIO (um shard) ==========
+
+    def get_user_data(self, user_id: str, read_replica: bool = False) -> Optional[Dict[str, Any]]:
+        return self.shard_for(user_id).get_user_data(user_id, read_replica)
+
+    def save_user_data(self, user_id: str, user_data: Dict[str, Any]) -> bool:
+        return self.shard_for(user_id).save_user_data(user_id, user_data)
+
+    def apply_game_state_patch(self, user_id: str, base_version: int,
+                               changes: Dict[str, Any]) -> Dict[str, Any]:
+        return self.shard_for(user_id).apply_game_state_patch(user_id, base_version, changes)
+
+    def provision_user(self, user_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.shard_for(user_info['uid']).provision_user(user_info)
+
+    def get_users_data(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Um lote por shard, consultados em paralelo"""
+        by_shard = defaultdict(list)
+        for user_id in user_ids:
+            by_shard[self.ring.node_for(user_id)].append(user_id)
+        futures = [
+            self._executor.submit(self.shards[name].get_users_data, ids)
+            for name, ids in by_shard.items()
+        ]
+        results = {}
+        for future in futures:
+            results.update(future.result())
+        return results
+
+    # ========== RANKING (todos os shards) ==========
+
+    def _merged_top_rows(self, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Top N global: top N de cada shard intercalados com heap (cada lista já vem ordenada)
+
+        Um shard fora do ar fica de fora do ranking em vez de derrubá-lo;
+        None só quando nenhum shard respondeu.
+        """
+        per_shard = self._scatter(lambda shard: shard.get_ranking_rows(limit))
+        failed = [name for name, rows in per_shard.items() if rows is None]
+        if failed:
+            logger.warning(f"⚠️ Ranking sem os shards: {', '.join(failed)}")
+        if len(failed) == len(per_shard):
+            return None
+        merged = heapq.merge(*(rows for rows in per_shard.values() if rows), key=_row_key, reverse=True)
+        return list(islice(merged, limit))
+
+    def get_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
+        rows = self._merged_top_rows(limit)
+        if rows is None:
+            return self.get_mock_ranking(limit)
+        ranking = [self._ranking_entry(row, idx + 1) for idx, row in enumerate(rows)]
+        logger.debug("✅ Ranking carregado de %d shards: %d jogadores", len(self.shards), len(ranking), extra=SAMPLED)
+        return ranking
+
+    def get_user_overview(self, user_id: str, limit: int = 10) -> Dict[str, Any]:
+        """Perfil e posição local no shard do usuário; top N e contagens dos demais em paralelo"""
+        owner_name = self.ring.node_for(user_id)
+        overview_future = self._executor.submit(self.shards[owner_name].get_user_overview, user_id, 1)
+        ranking = self.get_ranking(limit)
+        overview = overview_future.result()
+
+        own_rank = overview['own_rank']
+        if own_rank is not None:
+            game_data = overview['profile']['game_data']
+            key = (game_data['total_coins'], game_data['prestige_level'], game_data['level'])
+            futures = [
+                self._executor.submit(shard.count_ranked_ahead, *key)
+                for name, shard in self.shards.items() if name != owner_name
+            ]
+            counts = [future.result() for future in futures]
+            # Sem a contagem de algum shard a posição seria errada: melhor não mostrar
+            own_rank = None if None in counts else own_rank + sum(counts)
+
+        return {'profile': overview['profile'], 'ranking': ranking, 'own_rank': own_rank}
+
+    def get_mock_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return next(iter(self.shards.values())).get_mock_ranking(limit)
+
+    # ========== ESTADO ==========
+
+    def pool_stats(self) -> Dict[str, int]:
+        totals = {'in_use': 0, 'idle': 0, 'max': 0}
+        for shard in self.shards.values():
+            for state, count in shard.pool_stats().items():
+                totals[state] += count
+        return totals
+
+    def health_check(self) -> Dict[str, Any]:
+        shards = self._scatter(lambda shard: shard.health_check())
+        unhealthy = [name for name, health in shards.items() if not health['healthy']]
+        return {
+            'healthy': not unhealthy,
+            'message': f"Shards fora do ar: {', '.join(unhealthy)}" if unhealthy
+                       else f'{len(shards)} shards operacionais',
+            'engine': self.engine,
+            'dropped_saves': self.dropped_saves,
+            'shards': shards
+        }
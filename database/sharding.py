@@ -0,0 +1,89 @@
+# database/sharding.py - Anel de hash consistente (nós virtuais) para distribuir jogadores entre shards
+import os
+import bisect
+import hashlib
+import urllib.parse
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_VNODES = 128
+
+
+def _hash(key: str) -> int:
+    # md5 só pela distribuição uniforme e estável entre processos (hash() do Python é aleatório por processo)
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Mapeia uid -> shard por hash consistente
+
+    Cada shard ocupa `vnodes` pontos do anel; o uid pertence ao primeiro ponto
+    no sentido horário. Incluir ou remover um shard move só ~1/N dos usuários,
+    e os nós virtuais mantêm a carga equilibrada mesmo com poucos shards.
+    A posição no anel depende só do nome do shard (não da DSN), então trocar
+    host ou senha não remapeia ninguém.
+    """
+
+    def __init__(self, nodes: Sequence[str], vnodes: int = DEFAULT_VNODES):
+        if not nodes:
+            raise ValueError('o anel precisa de pelo menos um shard')
+        if len(set(nodes)) != len(nodes):
+            raise ValueError(f'nomes de shard repetidos: {", ".join(nodes)}')
+        self.nodes = list(nodes)
+        self.vnodes = vnodes
+        points = sorted(
+            (_hash(f'{node}#{index}'), node)
+            for node in self.nodes
+            for index in range(vnodes)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect_right(self._points, _hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def distribution(self) -> Dict[str, float]:
+        """Fração do espaço de hash de cada shard (0..1)"""
+        space = 1 << 64
+        shares = dict.fromkeys(self.nodes, 0)
+        previous = self._points[-1] - space
+        for point, node in zip(self._points, self._owners):
+            shares[node] += point - previous
+            previous = point
+        return {node: share / space for node, share in shares.items()}
+
+
+def shard_name(dsn: str, index: int) -> str:
+    """Nome padrão do shard: host:porta/banco, sem credenciais"""
+    parsed = urllib.parse.urlparse(dsn)
+    if parsed.hostname:
+        return f"{parsed.hostname}:{parsed.port or 5432}{parsed.path or ''}"
+    return f'shard-{index}'
+
+
+def parse_shard_urls(value: str) -> List[Tuple[str, str]]:
+    """Pares (nome, DSN) de uma lista separada por vírgula
+
+    Cada item é `nome=DSN` ou só a DSN (nome = host:porta/banco). Nomeie os
+    shards quando eles puderem mudar de endereço: o nome define a posição no anel.
+    """
+    shards = []
+    for entry in (item.strip() for item in value.split(',')):
+        if not entry:
+            continue
+        name, separator, dsn = entry.partition('=')
+        if not separator or '://' in name or '://' not in dsn:
+            name, dsn = '', entry
+        if dsn.startswith('postgres://'):
+            dsn = dsn.replace('postgres://', 'postgresql://', 1)
+        shards.append((name.strip() or shard_name(dsn, len(shards)), dsn))
+    return shards
+
+
+def load_shard_urls() -> List[Tuple[str, str]]:
+    """DATABASE_SHARD_URLS: shards do Postgres (vazio = banco único em DATABASE_URL)"""
+    return parse_shard_urls(os.environ.get('DATABASE_SHARD_URLS', ''))
+
+
+def load_vnodes() -> int:
+    return int(os.environ.get('DATABASE_SHARD_VNODES', DEFAULT_VNODES))
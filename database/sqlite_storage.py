@@ -0,0 +1,217 @@
+# database/sqlite_storage.py - Engine de armazenamento SQLite (arquivo local, modo WAL)
+import os
+import json
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from database.storage import PATCH_JSONB_FIELDS, RecordStorage, STATE_FIELDS, dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = 'popcoin.sqlite3'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    display_name TEXT,
+    avatar_url TEXT,
+    email_verified INTEGER DEFAULT 0,
+    created_at REAL,
+    last_login REAL,
+    last_activity REAL,
+    preferences TEXT DEFAULT '{}'
+);
+
+CREATE TABLE IF NOT EXISTS user_game_states (
+    user_id TEXT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    coins INTEGER DEFAULT 0,
+    coins_per_click REAL DEFAULT 1,
+    coins_per_second REAL DEFAULT 0,
+    total_coins INTEGER DEFAULT 0,
+    prestige_level INTEGER DEFAULT 0,
+    click_count INTEGER DEFAULT 0,
+    level INTEGER DEFAULT 1,
+    experience INTEGER DEFAULT 0,
+    upgrades TEXT,
+    achievements TEXT,
+    inventory TEXT,
+    last_update REAL,
+    state_version INTEGER NOT NULL DEFAULT 0,
+    save_seq INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_game_states_ranking
+    ON user_game_states (total_coins DESC, prestige_level DESC, level DESC);
+'''
+
+USER_COLUMNS = ('user_id', 'email', 'display_name', 'avatar_url', 'email_verified',
+                'created_at', 'last_login', 'last_activity', 'preferences')
+USER_TIME_FIELDS = ('created_at', 'last_login', 'last_activity')
+
+UPSERT_USER_QUERY = f'''
+INSERT INTO users ({', '.join(USER_COLUMNS)})
+VALUES ({', '.join('?' for _ in USER_COLUMNS)})
+ON CONFLICT (user_id) DO UPDATE SET
+{', '.join(f'{column} = excluded.{column}' for column in USER_COLUMNS[1:])}
+'''
+
+UPSERT_STATE_QUERY = f'''
+INSERT INTO user_game_states (user_id, {', '.join(STATE_FIELDS)})
+VALUES (?, {', '.join('?' for _ in STATE_FIELDS)})
+ON CONFLICT (user_id) DO UPDATE SET
+{', '.join(f'{column} = excluded.{column}' for column in STATE_FIELDS)}
+'''
+
+# Mesma ordenação (e índice) do RANKING_QUERY do Postgres
+RANKING_QUERY = '''
+SELECT u.user_id, u.display_name, u.avatar_url,
+       g.total_coins as total_score, g.prestige_level, g.level
+FROM user_game_states g
+JOIN users u ON g.user_id = u.user_id
+ORDER BY g.total_coins DESC, g.prestige_level DESC, g.level DESC
+LIMIT ?
+'''
+
+COUNT_AHEAD_QUERY = '''
+SELECT COUNT(*) FROM user_game_states
+WHERE (total_coins, prestige_level, level) > (?, ?, ?)
+'''
+
+
+class SQLiteStorage(RecordStorage):
+    """Usuários e estados em um arquivo SQLite
+
+    Uma conexão por thread; o arquivo fica em modo WAL, então leituras não
+    esperam as escritas, e as escritas são serializadas com BEGIN IMMEDIATE.
+    JSON vai como TEXT e datas como epoch (REAL). Vários workers do gunicorn
+    podem abrir o mesmo arquivo.
+    """
+
+    engine = 'sqlite'
+
+    def __init__(self, path: Optional[str] = None):
+        super().__init__()
+        self.path = path or os.environ.get('STORAGE_SQLITE_PATH', DEFAULT_SQLITE_PATH)
+        self.busy_timeout_ms = int(os.environ.get('STORAGE_SQLITE_BUSY_TIMEOUT_MS', 5000))
+        self._local = threading.local()
+        self.init_db()
+
+    def init_db(self) -> None:
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        self.initialized = True
+        logger.info(f"🗄️ SQLite pronto em {self.path} (journal_mode=WAL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: as transações são abertas explicitamente em transaction()
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                                   isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={self.busy_timeout_ms}')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        conn = self._connection()
+        if self._local.depth:
+            yield
+            return
+        # IMMEDIATE pega o lock de escrita já no início: sem deadlock de upgrade leitura -> escrita
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        try:
+            yield
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+        finally:
+            self._local.depth = 0
+
+    def _get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+        user['email_verified'] = bool(user['email_verified'])
+        user['preferences'] = json.loads(user['preferences'] or '{}')
+        for field in USER_TIME_FIELDS:
+            user[field] = _from_epoch(user[field])
+        user['last_activity'] = user['last_activity'] or user['last_login']
+        return user
+
+    def _get_state(self, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            f"SELECT {', '.join(STATE_FIELDS)} FROM user_game_states WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        state = dict(row)
+        for field in PATCH_JSONB_FIELDS:
+            state[field] = json.loads(state[field]) if state[field] is not None else None
+        state['last_update'] = _from_epoch(state['last_update'])
+        return state
+
+    def _put_user(self, user: Dict[str, Any]) -> None:
+        values = dict(user)
+        values['email_verified'] = int(bool(values['email_verified']))
+        values['preferences'] = dumps(values['preferences'])
+        for field in USER_TIME_FIELDS:
+            values[field] = _to_epoch(values[field])
+        self._connection().execute(UPSERT_USER_QUERY, [values[column] for column in USER_COLUMNS])
+
+    def _put_state(self, user_id: str, state: Dict[str, Any]) -> None:
+        values = dict(state)
+        for field in PATCH_JSONB_FIELDS:
+            values[field] = dumps(values[field]) if values[field] is not None else None
+        values['last_update'] = _to_epoch(values['last_update'])
+        self._connection().execute(UPSERT_STATE_QUERY, [user_id, *(values[column] for column in STATE_FIELDS)])
+
+    def _top_rows(self, limit: int) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._connection().execute(RANKING_QUERY, (limit,))]
+
+    def _count_ahead(self, state: Dict[str, Any]) -> int:
+        return self._connection().execute(
+            COUNT_AHEAD_QUERY, (state['total_coins'], state['prestige_level'], state['level'])
+        ).fetchone()[0]
+
+    def health_check(self) -> Dict[str, Any]:
+        try:
+            conn = self._connection()
+            users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+            journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+            return {
+                'healthy': True,
+                'message': 'SQLite operacional',
+                'engine': self.engine,
+                'path': self.path,
+                'journal_mode': journal_mode,
+                'sqlite_version': sqlite3.sqlite_version,
+                'users': users,
+                'dropped_saves': self.dropped_saves
+            }
+        except Exception as e:
+            return {'healthy': False, 'message': f'Erro no health check: {e}', 'engine': self.engine}
+
+
+def _to_epoch(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def _from_epoch(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value is not None else None
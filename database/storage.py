@@ -0,0 +1,559 @@
+# database/storage.py - Interface de armazenamento e lógica comum às engines
+import json
+import math
+import time
+import heapq
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.assets import avatar_url, default_avatar_url, stored_avatar
+
+logger = logging.getLogger(__name__)
+
+# ✅ Campos aceitos pelo salvamento incremental (delta)
+PATCH_NUMERIC_FIELDS = ('coins', 'coins_per_click', 'coins_per_second', 'total_coins',
+                        'prestige_level', 'click_count', 'level', 'experience')
+PATCH_JSONB_FIELDS = ('upgrades', 'achievements', 'inventory')
+PATCH_MERGE_FIELDS = ('upgrades',)
+PATCH_APPEND_FIELDS = ('achievements', 'inventory')
+
+# Colunas de user_game_states com o tipo do Postgres, para as engines em Python arredondarem igual
+STATE_INTEGER_FIELDS = ('coins', 'total_coins', 'prestige_level', 'click_count', 'level', 'experience')
+STATE_DECIMAL_FIELDS = ('coins_per_click', 'coins_per_second')
+# Limites dos tipos das colunas (BIGINT, INTEGER e NUMERIC(10,2)): fora deles o Postgres recusa o UPDATE
+STATE_BIGINT_FIELDS = ('coins', 'total_coins')
+BIGINT_MAX = 2 ** 63 - 1
+INTEGER_MAX = 2 ** 31 - 1
+DECIMAL_MAX = 99999999.99
+# Tipo JSON exigido em `set` para cada campo JSONB
+PATCH_JSONB_TYPES = {'upgrades': dict, 'achievements': list, 'inventory': list}
+STATE_FIELDS = (*STATE_INTEGER_FIELDS, *STATE_DECIMAL_FIELDS, *PATCH_JSONB_FIELDS,
+                'last_update', 'state_version', 'save_seq')
+
+DEFAULT_UPGRADES = {'click_power': 1, 'auto_clickers': 0, 'click_bots': 0}
+
+
+class StorageBackend:
+    """Interface de armazenamento usada pelo app e pelo GameManager
+
+    Engines: Postgres (DatabaseManager; ShardedDatabaseManager com vários
+    bancos), SQLite e memória. Todas devolvem os mesmos formatos (perfil com
+    'game_data', ranking com 'rank') e seguem as mesmas regras de
+    versão/sequência dos saves.
+    """
+
+    engine = 'base'
+
+    def __init__(self):
+        self.initialized = False
+        self.dropped_saves = 0
+        self._stats_lock = threading.Lock()
+
+    # ========== OPERAÇÕES ==========
+
+    def get_user_data(self, user_id: str, read_replica: bool = False) -> Optional[Dict[str, Any]]:
+        """`read_replica`: leitura só de exibição, pode vir de réplica (engines sem réplica ignoram)"""
+        raise NotImplementedError
+
+    def save_user_data(self, user_id: str, user_data: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def apply_game_state_patch(self, user_id: str, base_version: int,
+                               changes: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def provision_user(self, user_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_user_overview(self, user_id: str, limit: int = 10) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def get_users_data(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Vários usuários de uma vez (usuários inexistentes ficam de fora)"""
+        results = {}
+        for user_id in user_ids:
+            user_data = self.get_user_data(user_id)
+            if user_data:
+                results[user_id] = user_data
+        return results
+
+    def save_users_data(self, items: Dict[str, Dict[str, Any]]) -> int:
+        """Salva vários usuários; devolve quantos foram salvos"""
+        return sum(1 for user_id, user_data in items.items() if self.save_user_data(user_id, user_data))
+
+    def pool_stats(self) -> Dict[str, int]:
+        return {'in_use': 0, 'idle': 0, 'max': 0}
+
+    def health_check(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    # ========== AUXILIARES COMUNS ==========
+
+    def _align_game_data_structure(self, game_data: Dict[str, Any]) -> Dict[str, Any]:
+        """✅ CORREÇÃO: Converte estrutura de game_data para formato alinhado"""
+        aligned_data = game_data.copy()
+
+        # ✅ CORREÇÃO: Converter popcoins para coins
+        if 'popcoins' in aligned_data and 'coins' not in aligned_data:
+            aligned_data['coins'] = aligned_data.pop('popcoins', 0)
+
+        # ✅ CORREÇÃO: Converter clicks para click_count
+        if 'clicks' in aligned_data and 'click_count' not in aligned_data:
+            aligned_data['click_count'] = aligned_data.pop('clicks', 0)
+
+        # ✅ CORREÇÃO: Garantir estrutura de upgrades alinhada
+        upgrades = aligned_data.get('upgrades', {})
+        if 'auto_clicker' in upgrades:
+            # Migrar auto_clicker para auto_clickers
+            auto_clicker_value = upgrades.pop('auto_clicker', 0)
+            if 'auto_clickers' not in upgrades:
+                upgrades['auto_clickers'] = auto_clicker_value
+            elif upgrades['auto_clickers'] < auto_clicker_value:
+                upgrades['auto_clickers'] = auto_clicker_value
+
+        # ✅ CORREÇÃO: Garantir todos os upgrades necessários existem
+        required_upgrades = ['click_power', 'auto_clickers', 'click_bots']
+        for upgrade in required_upgrades:
+            if upgrade not in upgrades:
+                upgrades[upgrade] = 1 if upgrade == 'click_power' else 0
+
+        aligned_data['upgrades'] = upgrades
+
+        return aligned_data
+
+    def _parse_save_seq(self, value: Any) -> Optional[int]:
+        """Normaliza a sequência de save enviada pelo cliente (None = sem ordenação)"""
+        if value is None or isinstance(value, bool):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _record_dropped_save(self, user_id: str, save_seq: Optional[int]) -> None:
+        """Contabiliza um save descartado por ser antigo ou duplicado"""
+        with self._stats_lock:
+            self.dropped_saves += 1
+        logger.debug(f"⏭️ Save descartado para {user_id} (seq {save_seq})")
+
+    def _normalize_patch(self, changes: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Dict], Dict[str, List]]:
+        """Valida as seções set/merge/append do delta; ValueError para campos não suportados"""
+        set_fields = {}
+        for field, value in (changes.get('set') or {}).items():
+            if field in PATCH_NUMERIC_FIELDS:
+                set_fields[field] = self._parse_patch_number(field, value)
+            elif field in PATCH_JSONB_FIELDS:
+                if not isinstance(value, PATCH_JSONB_TYPES[field]):
+                    raise ValueError(f"Valor inválido para '{field}'")
+                set_fields[field] = value
+            else:
+                raise ValueError(f"Campo não suportado no delta: '{field}'")
+
+        merge_fields = {}
+        for field, value in (changes.get('merge') or {}).items():
+            if field not in PATCH_MERGE_FIELDS or not isinstance(value, dict):
+                raise ValueError(f"Merge não suportado para '{field}'")
+            if field == 'upgrades' and 'auto_clicker' in value:
+                value = dict(value)
+                value.setdefault('auto_clickers', value.pop('auto_clicker'))
+            merge_fields[field] = value
+
+        append_fields = {}
+        for field, value in (changes.get('append') or {}).items():
+            if field not in PATCH_APPEND_FIELDS or not isinstance(value, list):
+                raise ValueError(f"Append não suportado para '{field}'")
+            if value:
+                append_fields[field] = value
+
+        return set_fields, merge_fields, append_fields
+
+    def _parse_patch_number(self, field: str, value: Any):
+        """int para as colunas inteiras (sem passar por float: BIGINT vai além de 2^53), float para as decimais
+
+        Recusa NaN/infinito, booleanos e valores fora do tipo da coluna.
+        """
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"Valor inválido para '{field}'")
+        try:
+            number = Decimal(value.strip()) if isinstance(value, str) else Decimal(value)
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"Valor inválido para '{field}'")
+        if not number.is_finite():
+            raise ValueError(f"Valor inválido para '{field}'")
+
+        if field in STATE_INTEGER_FIELDS:
+            parsed = int(number.to_integral_value(ROUND_HALF_EVEN))
+            limit = BIGINT_MAX if field in STATE_BIGINT_FIELDS else INTEGER_MAX
+        else:
+            parsed = float(number)
+            limit = DECIMAL_MAX
+        if not math.isfinite(parsed) or abs(parsed) > limit:
+            raise ValueError(f"Valor fora do limite para '{field}'")
+        return parsed
+
+    def _apply_patch(self, state: Dict[str, Any], set_fields: Dict[str, Any],
+                     merge_fields: Dict[str, Dict], append_fields: Dict[str, List]) -> Dict[str, Any]:
+        """Novo estado com as seções já normalizadas aplicadas (as mesmas regras do UPDATE do Postgres)"""
+        state = dict(state)
+        state.update(self._coerce_state(set_fields))
+        for field, value in merge_fields.items():
+            state[field] = {**(state.get(field) or {}), **value}
+        for field, value in append_fields.items():
+            state[field] = [*(state.get(field) or []), *value]
+        return state
+
+    def _coerce_state(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Arredonda como as colunas BIGINT/INTEGER e NUMERIC(10,2) do Postgres"""
+        coerced = dict(values)
+        for field in STATE_INTEGER_FIELDS:
+            if field in coerced and coerced[field] is not None:
+                value = coerced[field]
+                coerced[field] = value if isinstance(value, int) else int(round(float(value)))
+        for field in STATE_DECIMAL_FIELDS:
+            if field in coerced and coerced[field] is not None:
+                coerced[field] = round(float(coerced[field]), 2)
+        return coerced
+
+    def _row_to_user_data(self, result) -> Dict[str, Any]:
+        """✅ CORREÇÃO: Estrutura ALINHADA de dados a partir de uma linha users + user_game_states"""
+        return {
+            'uid': result['user_id'],
+            'email': result['email'],
+            'name': result['display_name'] or result['email'].split('@')[0],
+            'picture': avatar_url(result['avatar_url']),
+            'email_verified': result['email_verified'],
+            'created_at': result['created_at'].isoformat() if result['created_at'] else datetime.now().isoformat(),
+            'last_login': result['last_login'].isoformat() if result['last_login'] else datetime.now().isoformat(),
+            'last_activity': result['last_activity'].isoformat() if result['last_activity'] else datetime.now().isoformat(),
+            'preferences': result['preferences'] or {},
+            'game_data': {
+                'coins': result['coins'] or 0,
+                'click_count': result['click_count'] or 0,
+                'level': result['level'] or 1,
+                'experience': result['experience'] or 0,
+                'coins_per_click': float(result['coins_per_click'] or 1),
+                'coins_per_second': float(result['coins_per_second'] or 0),
+                'total_coins': result['total_coins'] or 0,
+                'prestige_level': result['prestige_level'] or 0,
+                'upgrades': result['upgrades'] or {
+                    'click_power': 1,
+                    'auto_clickers': 0,
+                    'click_bots': 0
+                },
+                'achievements': result['achievements'] or [],
+                'inventory': result['inventory'] or [],
+                'last_update': result['last_update'].timestamp() if result['last_update'] else time.time(),
+                'state_version': result['state_version'] or 0,
+                'save_seq': result['save_seq'] or 0
+            }
+        }
+
+    def _ranking_entry(self, row, rank: int) -> Dict[str, Any]:
+        return {
+            'uid': row['user_id'],
+            'name': row['display_name'] or f'Jogador {rank}',
+            'avatar': avatar_url(row['avatar_url']),
+            'total_coins': row['total_score'],
+            'prestige_level': row['prestige_level'],
+            'level': row['level'],
+            'rank': rank
+        }
+
+    def get_default_user_data(self, user_id: str) -> Dict[str, Any]:
+        """✅ CORREÇÃO: Dados padrão ALINHADOS"""
+        current_time = datetime.now().isoformat()
+        return {
+            'uid': user_id,
+            'email': 'unknown@example.com',
+            'name': 'Jogador',
+            'picture': default_avatar_url(),
+            'email_verified': False,
+            'created_at': current_time,
+            'last_login': current_time,
+            'last_activity': current_time,
+            'preferences': {
+                'notifications': True,
+                'sound_effects': True,
+                'music': True,
+                'autosave': True
+            },
+            'game_data': self.get_default_game_state()
+        }
+
+    def get_default_game_state(self) -> Dict[str, Any]:
+        """✅ CORREÇÃO: Estado padrão do jogo ALINHADO"""
+        return {
+            'coins': 0,
+            'click_count': 0,
+            'level': 1,
+            'experience': 0,
+            'coins_per_click': 1,
+            'coins_per_second': 0,
+            'total_coins': 0,
+            'prestige_level': 0,
+            'upgrades': {
+                'click_power': 1,
+                'auto_clickers': 0,
+                'click_bots': 0
+            },
+            'achievements': [],
+            'inventory': [],
+            'last_update': time.time(),
+            'state_version': 0,
+            'save_seq': 0
+        }
+
+
+class RecordStorage(StorageBackend):
+    """Regras de save/delta/ranking em Python sobre registros de usuário e de estado
+
+    Base das engines SQLite e memória. Cada engine implementa só o acesso aos
+    registros (`_get_user`, `_put_state`...) e `transaction()`, que serializa
+    as escritas; o comportamento replica o SQL do DatabaseManager (upsert com
+    `save_seq`, versão incrementada a cada save, tipos das colunas).
+    """
+
+    # ========== PRIMITIVAS DA ENGINE ==========
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        raise NotImplementedError
+        yield
+
+    def _get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _get_state(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _put_user(self, user: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def _put_state(self, user_id: str, state: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def _top_rows(self, limit: int) -> List[Dict[str, Any]]:
+        """Linhas do ranking (user_id, display_name, avatar_url, total_score, prestige_level, level)"""
+        raise NotImplementedError
+
+    def _count_ahead(self, state: Dict[str, Any]) -> int:
+        """Quantos estados estão à frente na ordenação do ranking"""
+        raise NotImplementedError
+
+    # ========== REGRAS COMUNS ==========
+
+    def _new_state(self, now: datetime) -> Dict[str, Any]:
+        """Estado com os DEFAULTs da tabela user_game_states"""
+        return {
+            'coins': 0, 'coins_per_click': 1.0, 'coins_per_second': 0.0, 'total_coins': 0,
+            'prestige_level': 0, 'click_count': 0, 'level': 1, 'experience': 0,
+            'upgrades': dict(DEFAULT_UPGRADES), 'achievements': [], 'inventory': [],
+            'last_update': now, 'state_version': 0, 'save_seq': 0
+        }
+
+    def _joined_row(self, user: Dict[str, Any], state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        row = dict(user)
+        row.update(state if state is not None else dict.fromkeys(STATE_FIELDS))
+        return row
+
+    def _load_user_data(self, user_id: str) -> Optional[Dict[str, Any]]:
+        user = self._get_user(user_id)
+        if user is None:
+            return None
+        return self._row_to_user_data(self._joined_row(user, self._get_state(user_id)))
+
+    def get_user_data(self, user_id: str, read_replica: bool = False) -> Optional[Dict[str, Any]]:
+        user_data = self._load_user_data(user_id)
+        if user_data is None:
+            logger.warning(f"⚠️ Usuário não encontrado no banco: {user_id}")
+            return self.get_default_user_data(user_id)
+        return user_data
+
+    def get_users_data(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        results = {}
+        for user_id in user_ids:
+            user_data = self._load_user_data(user_id)
+            if user_data is not None:
+                results[user_id] = user_data
+        return results
+
+    def _save_one(self, user_id: str, user_data: Dict[str, Any], now: datetime) -> bool:
+        """Upsert de usuário + estado dentro da transação; False se o save foi descartado"""
+        existing = self._get_user(user_id)
+        user = {
+            'user_id': user_id,
+            'email': user_data.get('email', ''),
+            'display_name': user_data.get('name', ''),
+            'avatar_url': stored_avatar(user_data.get('picture')),
+            'email_verified': user_data.get('email_verified', False),
+            'created_at': existing['created_at'] if existing else now,
+            'last_login': now,
+            'last_activity': now,
+            'preferences': user_data.get('preferences', {}),
+        }
+
+        game_data = user_data.get('game_data')
+        if not game_data:
+            self._put_user(user)
+            return True
+
+        aligned_game_data = self._align_game_data_structure(game_data)
+        save_seq = self._parse_save_seq(aligned_game_data.get('save_seq'))
+        current = self._get_state(user_id)
+
+        # Mesma condição do ON CONFLICT ... WHERE do Postgres
+        if current is not None and save_seq is not None and current['save_seq'] >= save_seq:
+            self._record_dropped_save(user_id, save_seq)
+            game_data['save_applied'] = False
+            return False
+
+        state = self._coerce_state({
+            'coins': aligned_game_data.get('coins', 0),
+            'coins_per_click': aligned_game_data.get('coins_per_click', 1),
+            'coins_per_second': aligned_game_data.get('coins_per_second', 0),
+            'total_coins': aligned_game_data.get('total_coins', 0),
+            'prestige_level': aligned_game_data.get('prestige_level', 0),
+            'click_count': aligned_game_data.get('click_count', 0),
+            'level': aligned_game_data.get('level', 1),
+            'experience': aligned_game_data.get('experience', 0),
+        })
+        state.update({
+            'upgrades': aligned_game_data.get('upgrades', dict(DEFAULT_UPGRADES)),
+            'achievements': aligned_game_data.get('achievements', []),
+            'inventory': aligned_game_data.get('inventory', []),
+            'last_update': now,
+            'state_version': current['state_version'] + 1 if current else 0,
+            'save_seq': max(current['save_seq'] if current else 0, save_seq or 0),
+        })
+
+        self._put_user(user)
+        self._put_state(user_id, state)
+        game_data['state_version'] = state['state_version']
+        game_data['save_applied'] = True
+        return True
+
+    def save_user_data(self, user_id: str, user_data: Dict[str, Any]) -> bool:
+        try:
+            with self.transaction():
+                self._save_one(user_id, user_data, datetime.now())
+            return True
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar dados do usuário {user_id}: {e}")
+            return False
+
+    def save_users_data(self, items: Dict[str, Dict[str, Any]]) -> int:
+        """Todos os saves em uma transação (saves descartados por save_seq não contam)"""
+        now = datetime.now()
+        with self.transaction():
+            return sum(1 for user_id, user_data in items.items() if self._save_one(user_id, user_data, now))
+
+    def apply_game_state_patch(self, user_id: str, base_version: int,
+                               changes: Dict[str, Any]) -> Dict[str, Any]:
+        set_fields, merge_fields, append_fields = self._normalize_patch(changes)
+        if not (set_fields or merge_fields or append_fields):
+            return {'status': 'applied', 'state_version': base_version}
+
+        save_seq = self._parse_save_seq(changes.get('save_seq'))
+
+        try:
+            with self.transaction():
+                current = self._get_state(user_id)
+                if current is None:
+                    return {'status': 'not_found', 'state_version': 0}
+                if save_seq is not None and save_seq <= current['save_seq']:
+                    self._record_dropped_save(user_id, save_seq)
+                    return {'status': 'dropped', 'state_version': current['state_version']}
+                if current['state_version'] != base_version:
+                    return {'status': 'conflict', 'state_version': current['state_version']}
+
+                state = self._apply_patch(current, set_fields, merge_fields, append_fields)
+                state['state_version'] = current['state_version'] + 1
+                if save_seq is not None:
+                    state['save_seq'] = save_seq
+                state['last_update'] = datetime.now()
+
+                self._put_state(user_id, state)
+                return {'status': 'applied', 'state_version': state['state_version']}
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao aplicar delta para {user_id}: {e}")
+            return {'status': 'error', 'state_version': base_version}
+
+    def provision_user(self, user_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        user_id = user_info['uid']
+        try:
+            with self.transaction():
+                user = self._get_user(user_id)
+                created = user is None
+                if created:
+                    now = datetime.now()
+                    user = {
+                        'user_id': user_id,
+                        'email': user_info.get('email', ''),
+                        'display_name': user_info.get('name', ''),
+                        'avatar_url': stored_avatar(user_info.get('picture')),
+                        'email_verified': user_info.get('email_verified', False),
+                        'created_at': now,
+                        'last_login': now,
+                        'last_activity': now,
+                        'preferences': {},
+                    }
+                    self._put_user(user)
+                    self._put_state(user_id, self._new_state(now))
+                    logger.info(f"🆕 Usuário provisionado: {user_id}")
+
+                row = self._joined_row(user, self._get_state(user_id))
+            return {**self._row_to_user_data(row), 'created': created}
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao provisionar usuário {user_id}: {e}")
+            return None
+
+    def get_ranking(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return [self._ranking_entry(row, idx + 1) for idx, row in enumerate(self._top_rows(limit))]
+
+    def get_user_overview(self, user_id: str, limit: int = 10) -> Dict[str, Any]:
+        user = self._get_user(user_id)
+        if user is None:
+            logger.warning(f"⚠️ Usuário não encontrado no banco: {user_id}")
+            return {
+                'profile': self.get_default_user_data(user_id),
+                'ranking': self.get_ranking(limit),
+                'own_rank': None
+            }
+
+        state = self._get_state(user_id)
+        return {
+            'profile': self._row_to_user_data(self._joined_row(user, state)),
+            'ranking': self.get_ranking(limit),
+            'own_rank': self._count_ahead(state) + 1 if state is not None else None
+        }
+
+
+def ranking_key(state: Dict[str, Any]) -> Tuple[int, int, int]:
+    """Ordenação do ranking: total_coins, prestige_level, level (todos decrescentes)"""
+    return (state['total_coins'], state['prestige_level'], state['level'])
+
+
+def top_by_ranking(items: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """Top N de pares (usuário, estado) sem ordenar tudo"""
+    top = heapq.nlargest(limit, items, key=lambda pair: ranking_key(pair[1]))
+    return [{
+        'user_id': user['user_id'],
+        'display_name': user['display_name'],
+        'avatar_url': user['avatar_url'],
+        'total_score': state['total_coins'],
+        'prestige_level': state['prestige_level'],
+        'level': state['level'],
+    } for user, state in top]
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'))
@@ -3,11 +3,20 @@ import json
 import time
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+
+from core.logging_setup import SAMPLED
+from game.journal import action_journal
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# ✅ Limites do endpoint de lote (/api/game/batch)
+MAX_BATCH_ACTIONS = 100
+MAX_BATCH_CLICKS = 1000
+# Ação aplicada em memória mas não gravada: nada vai para o diário e o cliente recebe o erro
+SAVE_FAILED_ERROR = "Falha ao salvar o estado"
+
 class GameManager:
     def __init__(self):
         # ✅ VERIFICADO: Estado padrão alinhado com frontend
@@ -56,11 +65,16 @@ class GameManager:
 
     def get_user_game_state(self, user_id: str) -> Dict[str, Any]:
         """✅ VERIFICADO: Sistema robusto de carregamento"""
+        return self._load_game_state(user_id)[0]
+
+    def _load_game_state(self, user_id: str) -> Tuple[Dict[str, Any], int]:
+        """Estado com os ganhos offline aplicados e quantas moedas eles renderam"""
         try:
             from database.db_models import get_database_manager
             db_manager = get_database_manager()
             
             game_state = None
+            offline_earnings = 0
             
             if db_manager and db_manager.initialized:
                 try:
@@ -68,8 +82,10 @@ class GameManager:
                     if user_data and user_data.get('game_data'):
                         game_state = user_data['game_data']
                         game_state = self._ensure_game_state_structure(game_state)
+                        coins_before = game_state['coins']
                         game_state = self.calculate_offline_earnings(game_state)
-                        logger.info(f"✅ Estado carregado do banco: {user_id}")
+                        offline_earnings = int(game_state['coins'] - coins_before)
+                        logger.debug("✅ Estado carregado do banco: %s", user_id, extra=SAMPLED)
                 except Exception as db_error:
                     logger.warning(f"⚠️ Erro no banco: {db_error}")
 
@@ -77,34 +93,103 @@ class GameManager:
                 logger.info(f"🆕 Criando estado inicial para: {user_id}")
                 game_state = self.create_initial_game_state(user_id)
             
+            return game_state, offline_earnings
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao carregar estado: {e}")
+            return self.default_game_state.copy(), 0
+
+    def _load_state_for_action(self, user_id: str) -> Tuple[Dict[str, Any], int]:
+        """Carrega o estado para uma ação do servidor (sem a sequência de save do cliente)"""
+        game_state, offline_earnings = self._load_game_state(user_id)
+        # ✅ Saves originados no servidor não participam da ordenação do cliente
+        game_state.pop('save_seq', None)
+        return game_state, offline_earnings
+
+    def save_game_state(self, user_id: str, game_state: Dict[str, Any], storage=None) -> bool:
+        """✅ VERIFICADO: Sistema robusto de salvamento
+
+        True só quando o armazenamento processou o save: gravado, ou descartado
+        por ser antigo/duplicado (`save_applied` False). Falha do banco, ou banco
+        ausente, devolve False; nada é gravado em outro lugar. `storage` troca o
+        armazenamento do processo por outro (ex.: tools/replay.py --apply).
+        """
+        try:
+            game_state = self._ensure_game_state_structure(game_state)
+            game_state['last_update'] = time.time()
+            # ✅ Quem define save_applied é o armazenamento, nunca o corpo do cliente
+            game_state.pop('save_applied', None)
+
+            if storage is None:
+                from database.db_models import get_database_manager
+                storage = get_database_manager()
+            db_manager = storage
+            
+            if not db_manager or not db_manager.initialized:
+                logger.warning(f"⚠️ Estado não salvo (sem banco): {user_id}")
+                return False
+
+            try:
+                user_data = db_manager.get_user_data(user_id) or {}
+                user_data['game_data'] = game_state
+                
+                if db_manager.save_user_data(user_id, user_data) or game_state.get('save_applied') is False:
+                    logger.debug("💾 Estado salvo no banco: %s", user_id, extra=SAMPLED)
+                    return True
+            except Exception as db_error:
+                logger.warning(f"⚠️ Erro ao salvar no banco: {db_error}")
+
+            logger.warning(f"⚠️ Estado não salvo: {user_id}")
+            return False
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar estado: {e}")
+            return False
+
+    # ========== VARIANTES ASSÍNCRONAS (asgi.py) ==========
+
+    async def get_user_game_state_async(self, user_id: str, storage) -> Dict[str, Any]:
+        """get_user_game_state sobre um AsyncStorage, sem bloquear o event loop"""
+        try:
+            game_state = None
+
+            try:
+                user_data = await storage.get_user_data(user_id)
+                if user_data and user_data.get('game_data'):
+                    game_state = self._ensure_game_state_structure(user_data['game_data'])
+                    game_state = self.calculate_offline_earnings(game_state)
+            except Exception as db_error:
+                logger.warning(f"⚠️ Erro no banco: {db_error}")
+
+            if not game_state:
+                logger.info(f"🆕 Criando estado inicial para: {user_id}")
+                game_state = self.default_game_state.copy()
+                await self.save_game_state_async(user_id, game_state, storage)
+
             return game_state
 
         except Exception as e:
             logger.error(f"❌ Erro ao carregar estado: {e}")
             return self.default_game_state.copy()
 
-    def save_game_state(self, user_id: str, game_state: Dict[str, Any]) -> bool:
-        """✅ VERIFICADO: Sistema robusto de salvamento"""
+    async def save_game_state_async(self, user_id: str, game_state: Dict[str, Any], storage) -> bool:
+        """save_game_state sobre um AsyncStorage (mesmas regras de estrutura e last_update)"""
         try:
             game_state = self._ensure_game_state_structure(game_state)
             game_state['last_update'] = time.time()
+            game_state.pop('save_applied', None)
 
-            from database.db_models import get_database_manager
-            db_manager = get_database_manager()
-            
-            if db_manager and db_manager.initialized:
-                try:
-                    user_data = db_manager.get_user_data(user_id) or {}
-                    user_data['game_data'] = game_state
-                    
-                    if db_manager.save_user_data(user_id, user_data):
-                        logger.debug(f"💾 Estado salvo no banco: {user_id}")
-                        return True
-                except Exception as db_error:
-                    logger.warning(f"⚠️ Erro ao salvar no banco: {db_error}")
+            try:
+                user_data = await storage.get_user_data(user_id) or {}
+                user_data['game_data'] = game_state
+                if await storage.save_user_data(user_id, user_data) or game_state.get('save_applied') is False:
+                    logger.debug("💾 Estado salvo no banco: %s", user_id, extra=SAMPLED)
+                    return True
+            except Exception as db_error:
+                logger.warning(f"⚠️ Erro ao salvar no banco: {db_error}")
 
-            logger.info(f"💾 Estado salvo localmente: {user_id}")
-            return True
+            logger.warning(f"⚠️ Estado não salvo: {user_id}")
+            return False
 
         except Exception as e:
             logger.error(f"❌ Erro ao salvar estado: {e}")
@@ -179,50 +264,56 @@ class GameManager:
     def process_click(self, user_id: str) -> Dict[str, Any]:
         """✅ CORREÇÃO: Sistema de clique balanceado"""
         try:
-            game_state = self.get_user_game_state(user_id)
-            
-            # ✅ CORREÇÃO: Calcular moedas por clique com bônus
-            base_coins = 1
-            click_power = game_state['upgrades'].get('click_power', 1)
-            prestige_bonus = game_state.get('prestige_level', 0) * 0.1
-            level_bonus = (game_state.get('level', 1) - 1) * 0.05
-            
-            coins_earned = base_coins + (click_power - 1) + prestige_bonus + level_bonus
-            coins_earned = max(1, int(coins_earned))
-            
-            # ✅ CORREÇÃO: Aplicar ganhos
-            game_state['coins'] += coins_earned
-            game_state['total_coins'] += coins_earned
-            game_state['click_count'] += 1
-            
-            # ✅ CORREÇÃO: Sistema de experiência
-            exp_gained = max(1, coins_earned)
-            game_state['experience'] += exp_gained
-            
-            # ✅ CORREÇÃO: Verificar evoluções
-            level_up = self._check_level_up(game_state)
-            new_achievements = self._check_achievements(game_state)
-            
-            # ✅ CORREÇÃO: Atualizar estatísticas
-            self._update_game_stats(game_state)
+            game_state, offline_earnings = self._load_state_for_action(user_id)
+            result = self.apply_click(game_state)
             
             # Salvar
-            self.save_game_state(user_id, game_state)
+            if not self._save_action_state(user_id, game_state):
+                return {"success": False, "error": SAVE_FAILED_ERROR}
+            self._journal(user_id, game_state, [("click", result)], offline_earnings)
             
-            logger.debug(f"👆 Clique: +{coins_earned} moedas (total: {game_state['coins']})")
-            
-            return {
-                "success": True, 
-                "coins_earned": coins_earned,
-                "level_up": level_up,
-                "new_achievements": new_achievements,
-                "game_state": game_state
-            }
+            return {**result, "game_state": game_state}
             
         except Exception as e:
             logger.error(f"❌ Erro no clique: {e}")
             return {"success": False, "error": str(e)}
 
+    def apply_click(self, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """Aplica um clique ao estado em memória (sem carregar nem salvar)"""
+        # ✅ CORREÇÃO: Calcular moedas por clique com bônus
+        base_coins = 1
+        click_power = game_state['upgrades'].get('click_power', 1)
+        prestige_bonus = game_state.get('prestige_level', 0) * 0.1
+        level_bonus = (game_state.get('level', 1) - 1) * 0.05
+        
+        coins_earned = base_coins + (click_power - 1) + prestige_bonus + level_bonus
+        coins_earned = max(1, int(coins_earned))
+        
+        # ✅ CORREÇÃO: Aplicar ganhos
+        game_state['coins'] += coins_earned
+        game_state['total_coins'] += coins_earned
+        game_state['click_count'] += 1
+        
+        # ✅ CORREÇÃO: Sistema de experiência
+        exp_gained = max(1, coins_earned)
+        game_state['experience'] += exp_gained
+        
+        # ✅ CORREÇÃO: Verificar evoluções
+        level_up = self._check_level_up(game_state)
+        new_achievements = self._check_achievements(game_state)
+        
+        # ✅ CORREÇÃO: Atualizar estatísticas
+        self._update_game_stats(game_state)
+        
+        logger.debug("👆 Clique: +%s moedas (total: %s)", coins_earned, game_state['coins'])
+        
+        return {
+            "success": True, 
+            "coins_earned": coins_earned,
+            "level_up": level_up,
+            "new_achievements": new_achievements
+        }
+
     def buy_upgrade(self, user_id: str, upgrade_type: str) -> Dict[str, Any]:
         """✅ CORREÇÃO: Sistema de compra balanceado"""
         try:
@@ -230,52 +321,64 @@ class GameManager:
             if upgrade_type not in self.upgrade_config:
                 return {"success": False, "error": "Upgrade inválido"}
             
-            game_state = self.get_user_game_state(user_id)
-            current_level = game_state['upgrades'].get(upgrade_type, 0)
+            game_state, offline_earnings = self._load_state_for_action(user_id)
+            result = self.apply_upgrade(game_state, upgrade_type)
+            if not result["success"]:
+                return result
             
-            # ✅ CORREÇÃO: Calcular custo usando configuração
-            config = self.upgrade_config[upgrade_type]
-            cost = self._calculate_upgrade_cost(config['base_cost'], config['cost_multiplier'], current_level)
+            # Salvar
+            if not self._save_action_state(user_id, game_state):
+                return {"success": False, "error": SAVE_FAILED_ERROR}
+            self._journal(user_id, game_state, [("upgrade", result)], offline_earnings)
             
-            # ✅ CORREÇÃO: Verificar se pode comprar
-            if game_state['coins'] >= cost:
-                # Debitar custo
-                game_state['coins'] -= cost
-                
-                # Aplicar upgrade
-                game_state['upgrades'][upgrade_type] = current_level + 1
-                
-                # ✅ CORREÇÃO: Atualizar estatísticas do jogo
-                self._update_game_stats(game_state)
-                
-                # Verificar conquistas
-                new_achievements = self._check_achievements(game_state)
-                
-                # Salvar
-                self.save_game_state(user_id, game_state)
-                
-                logger.info(f"🛒 Upgrade comprado: {upgrade_type} nível {current_level + 1} por {cost} moedas")
-                
-                return {
-                    "success": True,
-                    "upgrade_type": upgrade_type,
-                    "new_level": current_level + 1,
-                    "cost": cost,
-                    "new_achievements": new_achievements,
-                    "game_state": game_state
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": "Moedas insuficientes",
-                    "required": cost,
-                    "current": game_state['coins']
-                }
+            return {**result, "game_state": game_state}
                 
         except Exception as e:
             logger.error(f"❌ Erro na compra: {e}")
             return {"success": False, "error": str(e)}
 
+    def apply_upgrade(self, game_state: Dict[str, Any], upgrade_type: str) -> Dict[str, Any]:
+        """Compra um upgrade no estado em memória (sem carregar nem salvar)"""
+        if not isinstance(upgrade_type, str) or upgrade_type not in self.upgrade_config:
+            return {"success": False, "error": "Upgrade inválido"}
+        
+        current_level = game_state['upgrades'].get(upgrade_type, 0)
+        
+        # ✅ CORREÇÃO: Calcular custo usando configuração
+        config = self.upgrade_config[upgrade_type]
+        cost = self._calculate_upgrade_cost(config['base_cost'], config['cost_multiplier'], current_level)
+        
+        # ✅ CORREÇÃO: Verificar se pode comprar
+        if game_state['coins'] < cost:
+            return {
+                "success": False,
+                "error": "Moedas insuficientes",
+                "required": cost,
+                "current": game_state['coins']
+            }
+        
+        # Debitar custo
+        game_state['coins'] -= cost
+        
+        # Aplicar upgrade
+        game_state['upgrades'][upgrade_type] = current_level + 1
+        
+        # ✅ CORREÇÃO: Atualizar estatísticas do jogo
+        self._update_game_stats(game_state)
+        
+        # Verificar conquistas
+        new_achievements = self._check_achievements(game_state)
+        
+        logger.info(f"🛒 Upgrade comprado: {upgrade_type} nível {current_level + 1} por {cost} moedas")
+        
+        return {
+            "success": True,
+            "upgrade_type": upgrade_type,
+            "new_level": current_level + 1,
+            "cost": cost,
+            "new_achievements": new_achievements
+        }
+
     def _calculate_upgrade_cost(self, base_cost: float, multiplier: float, current_level: int) -> int:
         """✅ CORREÇÃO: Cálculo de custo balanceado"""
         return int(base_cost * (multiplier ** current_level))
@@ -301,7 +404,8 @@ class GameManager:
             
             game_state['coins_per_second'] = auto_clickers_rate + click_bots_rate
             
-            logger.debug(f"📊 Stats atualizados: {game_state['coins_per_click']}/clique, {game_state['coins_per_second']}/segundo")
+            logger.debug("📊 Stats atualizados: %s/clique, %s/segundo",
+                         game_state['coins_per_click'], game_state['coins_per_second'])
             
         except Exception as e:
             logger.error(f"❌ Erro ao atualizar stats: {e}")
@@ -391,57 +495,147 @@ class GameManager:
     def prestige(self, user_id: str) -> Dict[str, Any]:
         """✅ CORREÇÃO: Sistema de prestígio balanceado"""
         try:
-            game_state = self.get_user_game_state(user_id)
+            game_state, offline_earnings = self._load_state_for_action(user_id)
+            result = self.apply_prestige(game_state)
+            if not result["success"]:
+                return result
             
-            # ✅ CORREÇÃO: Requisito de prestígio aumentado
-            required_coins = 25000
+            # Salvar
+            if not self._save_action_state(user_id, game_state):
+                return {"success": False, "error": SAVE_FAILED_ERROR}
+            self._journal(user_id, game_state, [("prestige", result)], offline_earnings)
             
-            if game_state['total_coins'] >= required_coins:
-                current_prestige = game_state.get('prestige_level', 0)
-                prestige_bonus = max(1, int(game_state['total_coins'] / 10000))
-                
-                # ✅ CORREÇÃO: Aplicar prestígio
-                game_state['prestige_level'] = current_prestige + 1
-                game_state['coins'] = 0
-                game_state['coins_per_click'] = 1 + prestige_bonus
-                game_state['coins_per_second'] = 0
-                game_state['click_count'] = 0
-                game_state['level'] = 1
-                game_state['experience'] = 0
-                
-                # ✅ CORREÇÃO: Manter apenas conquistas, resetar upgrades
-                game_state['upgrades'] = {
-                    "click_power": 1,
-                    "auto_clickers": 0,
-                    "click_bots": 0
-                }
-                
-                # Atualizar stats
-                self._update_game_stats(game_state)
-                
-                # Salvar
-                self.save_game_state(user_id, game_state)
-                
-                logger.info(f"⭐ Prestígio {current_prestige + 1}! Bônus: {prestige_bonus}x")
-                
-                return {
-                    "success": True,
-                    "prestige_level": game_state['prestige_level'],
-                    "prestige_bonus": prestige_bonus,
-                    "game_state": game_state
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": f"Requer {required_coins} moedas totais",
-                    "required": required_coins,
-                    "current": game_state['total_coins']
-                }
+            return {**result, "game_state": game_state}
                 
         except Exception as e:
             logger.error(f"❌ Erro no prestígio: {e}")
             return {"success": False, "error": str(e)}
 
+    def apply_prestige(self, game_state: Dict[str, Any]) -> Dict[str, Any]:
+        """Aplica o prestígio ao estado em memória (sem carregar nem salvar)"""
+        # ✅ CORREÇÃO: Requisito de prestígio aumentado
+        required_coins = 25000
+        
+        if game_state['total_coins'] < required_coins:
+            return {
+                "success": False,
+                "error": f"Requer {required_coins} moedas totais",
+                "required": required_coins,
+                "current": game_state['total_coins']
+            }
+        
+        current_prestige = game_state.get('prestige_level', 0)
+        prestige_bonus = max(1, int(game_state['total_coins'] / 10000))
+        
+        # ✅ CORREÇÃO: Aplicar prestígio
+        game_state['prestige_level'] = current_prestige + 1
+        game_state['coins'] = 0
+        game_state['coins_per_click'] = 1 + prestige_bonus
+        game_state['coins_per_second'] = 0
+        game_state['click_count'] = 0
+        game_state['level'] = 1
+        game_state['experience'] = 0
+        
+        # ✅ CORREÇÃO: Manter apenas conquistas, resetar upgrades
+        game_state['upgrades'] = {
+            "click_power": 1,
+            "auto_clickers": 0,
+            "click_bots": 0
+        }
+        
+        # Atualizar stats
+        self._update_game_stats(game_state)
+        
+        logger.info(f"⭐ Prestígio {current_prestige + 1}! Bônus: {prestige_bonus}x")
+        
+        return {
+            "success": True,
+            "prestige_level": game_state['prestige_level'],
+            "prestige_bonus": prestige_bonus
+        }
+
+    def process_batch(self, user_id: str, actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Aplica uma lista ordenada de ações com uma leitura e um save
+
+        Cada ação é {"type": "click" | "upgrade" | "prestige", ...}; cliques
+        aceitam "count" e upgrades exigem "upgrade_type". Ações recusadas (ex.:
+        moedas insuficientes) não interrompem as seguintes.
+        """
+        try:
+            game_state, offline_earnings = self._load_state_for_action(user_id)
+            results = []
+            applied = 0
+            
+            for action in actions:
+                result = self._apply_action(game_state, action)
+                if result.get("success"):
+                    applied += 1
+                results.append(result)
+            
+            # ✅ Um único save para o lote inteiro (nada a salvar se tudo falhou)
+            if applied:
+                if not self._save_action_state(user_id, game_state):
+                    return {"success": False, "error": SAVE_FAILED_ERROR}
+                self._journal(user_id, game_state,
+                              [(result["type"], result) for result in results if result.get("success")],
+                              offline_earnings)
+            
+            return {
+                "success": True,
+                "applied": applied,
+                "results": results,
+                "game_state": game_state
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Erro no lote de ações: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _save_action_state(self, user_id: str, game_state: Dict[str, Any]) -> bool:
+        """Salva o estado de uma ação do servidor; True só se o armazenamento gravou o save"""
+        return self.save_game_state(user_id, game_state) and game_state.get('save_applied', False)
+
+    def _journal(self, user_id: str, game_state: Dict[str, Any],
+                 results: List[Tuple[str, Dict[str, Any]]], offline_earnings: int) -> None:
+        """Registra as ações aplicadas e salvas no diário (só enfileira; o COPY roda em segundo plano)"""
+        actions = [
+            (event_type, {key: value for key, value in result.items() if key not in ("success", "type")})
+            for event_type, result in results
+        ]
+        action_journal.record_actions(user_id, game_state, actions, offline_earnings)
+
+    def _apply_action(self, game_state: Dict[str, Any], action: Dict[str, Any]) -> Dict[str, Any]:
+        action_type = action.get("type") if isinstance(action, dict) else None
+        
+        if action_type == "click":
+            count = action.get("count", 1)
+            if not isinstance(count, int) or not 1 <= count <= MAX_BATCH_CLICKS:
+                return {"type": "click", "success": False, "error": "Quantidade de cliques inválida"}
+            coins_earned = 0
+            level_up = False
+            new_achievements = []
+            for _ in range(count):
+                click = self.apply_click(game_state)
+                coins_earned += click["coins_earned"]
+                level_up = level_up or click["level_up"]
+                new_achievements.extend(click["new_achievements"])
+            return {
+                "type": "click",
+                "success": True,
+                "count": count,
+                "coins_earned": coins_earned,
+                "level_up": level_up,
+                "new_achievements": new_achievements
+            }
+        
+        if action_type == "upgrade":
+            return {"type": "upgrade", **self.apply_upgrade(game_state, action.get("upgrade_type"))}
+        
+        if action_type == "prestige":
+            return {"type": "prestige", **self.apply_prestige(game_state)}
+        
+        return {"type": action_type, "success": False, "error": "Ação desconhecida"}
+
 # ✅ VERIFICADO: Singleton
 _game_manager_instance = None
 
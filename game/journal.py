@@ -0,0 +1,120 @@
+# game/journal.py - Diário de ações por usuário com snapshots periódicos (sobre o log de eventos)
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from database.event_log import EventRecorder, event_recorder
+
+# Campos do estado guardados nos snapshots e saves (sem save_seq/state_version, que são do banco)
+SNAPSHOT_FIELDS = ('coins', 'coins_per_click', 'coins_per_second', 'total_coins', 'prestige_level',
+                   'click_count', 'level', 'experience', 'upgrades', 'achievements', 'inventory',
+                   'last_update')
+
+
+def compact_state(game_state: Dict[str, Any]) -> Dict[str, Any]:
+    """Só os campos do estado, com números inteiros sem casa decimal (JSON menor)"""
+    state = {}
+    for field in SNAPSHOT_FIELDS:
+        if field not in game_state:
+            continue
+        value = game_state[field]
+        if isinstance(value, float) and value.is_integer() and field != 'last_update':
+            value = int(value)
+        state[field] = value
+    return state
+
+
+class ActionJournal:
+    """Eventos que permitem reconstruir o estado de um jogador em qualquer instante
+
+    Tipos gravados no game_events:
+    - click / upgrade / prestige: ações do servidor, reaplicadas com as regras do GameManager
+    - offline: ganhos offline creditados antes de uma ação do servidor
+    - patch: delta aplicado pelo cliente (set / merge / append)
+    - save: estado completo enviado pelo cliente
+    - snapshot: estado completo a cada `snapshot_every` ações (ou deltas) e no cadastro
+
+    save e snapshot são pontos de partida: o replay (game/replay.py) começa
+    no mais recente antes do instante pedido e reaplica só a cauda. O
+    contador de ações é por processo, então com vários workers a cauda fica
+    limitada a workers x `snapshot_every` ações.
+    """
+
+    def __init__(self, recorder: EventRecorder, snapshot_every: int = 100, max_users: int = 100000):
+        self.recorder = recorder
+        self.snapshot_every = snapshot_every
+        self.max_users = max_users
+        self._pending: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.recorder.enabled
+
+    def record_actions(self, user_id: str, game_state: Dict[str, Any],
+                       actions: List[Tuple[str, Dict[str, Any]]], offline_earnings: int = 0) -> None:
+        """Ações já aplicadas e salvas; `game_state` é o estado depois delas"""
+        if not self.enabled:
+            return
+        if offline_earnings:
+            self.recorder.record(user_id, 'offline', {'coins': offline_earnings})
+        for event_type, payload in actions:
+            self.recorder.record(user_id, event_type, payload)
+        # Cliques em lote contam um a um: o custo do replay é por clique
+        weight = sum(payload.get('count', 1) for _, payload in actions)
+        if self._count(user_id, weight) >= self.snapshot_every:
+            self.record_snapshot(user_id, game_state)
+
+    def record_snapshot(self, user_id: str, game_state: Dict[str, Any]) -> None:
+        """Estado completo já salvo como ponto de partida; zera o contador"""
+        if not self.enabled:
+            return
+        self.recorder.record(user_id, 'snapshot', compact_state(game_state))
+        self._reset(user_id)
+
+    def record_state(self, user_id: str, game_state: Dict[str, Any]) -> None:
+        """Save completo do cliente: vira ponto de partida e zera o contador"""
+        if not self.enabled:
+            return
+        self.recorder.record(user_id, 'save', compact_state(game_state))
+        self._reset(user_id)
+
+    def record_patch(self, user_id: str, changes: Dict[str, Any], state_version: Optional[int] = None,
+                     load_state: Optional[Callable[[], Optional[Dict[str, Any]]]] = None) -> None:
+        """Delta aplicado pelo cliente (só as seções; base_version e save_seq são do banco)
+
+        O autosave do cliente é só de deltas, então a cada `snapshot_every`
+        deltas `load_state` relê o estado salvo e ele vira snapshot. Só se o
+        estado ainda estiver em `state_version` (a versão gerada por este
+        delta): se outro delta entrou no meio, o snapshot fica para o próximo.
+        """
+        if not self.enabled:
+            return
+        self.recorder.record(user_id, 'patch', {
+            section: changes[section] for section in ('set', 'merge', 'append') if changes.get(section)
+        })
+        if self._count(user_id, 1) < self.snapshot_every or load_state is None:
+            return
+        game_state = load_state()
+        if game_state and game_state.get('state_version') == state_version:
+            self.record_snapshot(user_id, game_state)
+
+    def _count(self, user_id: str, actions: int) -> int:
+        with self._lock:
+            pending = self._pending.pop(user_id, 0) + actions
+            self._pending[user_id] = pending
+            while len(self._pending) > self.max_users:
+                self._pending.popitem(last=False)
+            return pending
+
+    def _reset(self, user_id: str) -> None:
+        with self._lock:
+            self._pending.pop(user_id, None)
+
+
+# ✅ Instância única por processo
+action_journal = ActionJournal(
+    event_recorder,
+    snapshot_every=int(os.environ.get('GAME_JOURNAL_SNAPSHOT_EVERY', 100))
+)
@@ -0,0 +1,112 @@
+# game/replay.py - Reconstrução do estado de um jogador a partir do diário (ponto de partida + cauda)
+import copy
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from database.event_log import ANCHOR_EVENT_TYPES, iter_journal, load_anchor
+from database.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+JournalEntry = Tuple[datetime, str, Dict[str, Any]]
+
+
+class ReplayEngine:
+    """Reaplica eventos do diário (game/journal.py) com as regras do GameManager
+
+    Cliques, upgrades e prestígios passam pelos mesmos apply_* usados pelas
+    rotas; deltas do cliente, pelas regras de patch do armazenamento. Snapshots
+    e saves substituem o estado inteiro.
+    """
+
+    def __init__(self, game_manager):
+        self.game_manager = game_manager
+        # Só as regras de patch (_normalize_patch / _apply_patch), sem banco
+        self.patch_rules = StorageBackend()
+
+    def initial_state(self) -> Dict[str, Any]:
+        """Estado de um jogador recém-cadastrado (cópia profunda: o replay altera upgrades e listas)"""
+        return copy.deepcopy(self.game_manager.default_game_state)
+
+    def restore(self, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        state = self.initial_state()
+        state.update(copy.deepcopy(snapshot))
+        return self.game_manager._ensure_game_state_structure(state)
+
+    def apply(self, state: Dict[str, Any], event_type: str,
+              payload: Dict[str, Any]) -> Tuple[Dict[str, Any], int, bool]:
+        """Aplica um evento; devolve (estado, ações aplicadas, aceito pelas regras)"""
+        game_manager = self.game_manager
+
+        if event_type == 'click':
+            count = payload.get('count', 1)
+            for _ in range(count):
+                game_manager.apply_click(state)
+            return state, count, True
+
+        if event_type == 'upgrade':
+            return state, 1, game_manager.apply_upgrade(state, payload.get('upgrade_type'))['success']
+
+        if event_type == 'prestige':
+            return state, 1, game_manager.apply_prestige(state)['success']
+
+        if event_type == 'offline':
+            state['coins'] += payload['coins']
+            state['total_coins'] += payload['coins']
+            return state, 1, True
+
+        if event_type == 'patch':
+            set_fields, merge_fields, append_fields = self.patch_rules._normalize_patch(payload)
+            return self.patch_rules._apply_patch(state, set_fields, merge_fields, append_fields), 1, True
+
+        if event_type in ANCHOR_EVENT_TYPES:
+            return self.restore(payload), 1, True
+
+        return state, 0, True
+
+    def replay(self, chunks: Iterable[List[JournalEntry]],
+               state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Reaplica os blocos em ordem a partir de `state` (padrão: estado inicial)
+
+        Ações recusadas pelas regras (ex.: upgrade sem moedas) indicam que o
+        diário e as regras divergiram; são contadas em 'rejected'.
+        """
+        state = state if state is not None else self.initial_state()
+        entries = actions = rejected = 0
+        last_event_at = None
+        started = time.perf_counter()
+
+        for chunk in chunks:
+            for created_at, event_type, payload in chunk:
+                state, applied, accepted = self.apply(state, event_type, payload)
+                entries += 1
+                actions += applied
+                rejected += not accepted
+                last_event_at = created_at
+
+        seconds = time.perf_counter() - started
+        return {
+            'state': state,
+            'entries': entries,
+            'actions': actions,
+            'rejected': rejected,
+            'last_event_at': last_event_at,
+            'seconds': seconds,
+            'entries_per_second': entries / seconds if seconds else 0.0,
+            'actions_per_second': actions / seconds if seconds else 0.0,
+        }
+
+    def restore_user(self, conn, user_id: str, until: datetime, chunk_size: int = 5000) -> Dict[str, Any]:
+        """Estado do jogador em `until`: snapshot ou save mais recente + eventos seguintes
+
+        Sem ponto de partida, reaplica desde o cadastro (estado inicial).
+        """
+        anchor = load_anchor(conn, user_id, until)
+        anchor_at = anchor[0] if anchor else None
+        state = self.restore(anchor[2]) if anchor else self.initial_state()
+
+        result = self.replay(iter_journal(conn, user_id, anchor_at, until, chunk_size), state)
+        result['anchor'] = {'type': anchor[1], 'created_at': anchor_at} if anchor else None
+        return result
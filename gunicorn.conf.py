@@ -0,0 +1,54 @@
+# gunicorn.conf.py - Configuração do gunicorn (carregada automaticamente pelo `gunicorn app:app`)
+import os
+import sys
+import secrets
+
+
+def _default_worker_class():
+    """gevent quando instalado: cada conexão SSE é uma greenlet, não uma thread do SO"""
+    try:
+        import gevent  # noqa: F401
+    except ImportError:  # pragma: no cover - depende do ambiente
+        return 'gthread'
+    return 'gevent'
+
+
+# ✅ Conexões SSE (/api/events/stream) ficam abertas por até
+# SSE_MAX_CONNECTION_SECONDS. Com gevent (padrão, requer `gevent` e `psycogreen`)
+# cada uma é uma greenlet e o worker aceita até SSE_MAX_CONNECTIONS.
+# Com WEB_WORKER_CLASS=gthread cada conexão prende uma das WEB_THREADS: o
+# worker aceita no máximo SSE_MAX_THREAD_CONNECTIONS (padrão WEB_THREADS / 4)
+# e responde 503 com Retry-After acima disso, para a API não ficar sem thread.
+# A entrada ASGI (`gunicorn asgi:application` com
+# WEB_WORKER_CLASS=uvicorn.workers.UvicornWorker) serve o SSE como corrotina.
+# O teto da admissão (core/admission.py) segue a mesma capacidade: WEB_WORKER_CONNECTIONS
+# com gevent, WEB_THREADS com gthread; ADMISSION_MAX_IN_FLIGHT sobrescreve.
+worker_class = os.environ.get('WEB_WORKER_CLASS') or _default_worker_class()
+threads = int(os.environ.get('WEB_THREADS', 8))
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+
+# Tickets do stream SSE são assinados com a SECRET_KEY: sem ela definida, cada
+# worker sortearia a sua e recusaria os tickets emitidos pelos outros. Com mais
+# de uma instância, defina SECRET_KEY no ambiente.
+os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+
+
+def post_fork(server, worker):
+    """Torna o psycopg2 cooperativo quando o worker é gevent"""
+    if worker_class != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        server.log.info("✅ psycopg2 em modo cooperativo (psycogreen)")
+    except ImportError:
+        server.log.warning("⚠️ psycogreen não instalado - consultas ao banco bloqueiam o worker gevent")
+
+
+def worker_exit(server, worker):
+    """Grava os eventos do jogo que ainda estão no buffer antes de o worker sair"""
+    event_log = sys.modules.get('database.event_log')
+    if event_log is not None:
+        event_log.event_recorder.close()
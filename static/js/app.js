@@ -0,0 +1,166 @@
+// static/js/app.js - Utilidades globais das páginas (menu, loading, erros, avatares)
+
+// Menu Mobile e funcionalidades globais
+document.addEventListener('DOMContentLoaded', function() {
+    const mobileMenuBtn = document.getElementById('mobileMenuBtn');
+    const authSection = document.getElementById('auth-section');
+    const navLinks = document.getElementById('nav-links');
+
+    // Menu Mobile
+    if (mobileMenuBtn && authSection) {
+        mobileMenuBtn.addEventListener('click', function() {
+            authSection.classList.toggle('mobile-open');
+            navLinks.classList.toggle('mobile-open');
+            this.classList.toggle('active');
+        });
+    }
+
+    // Fechar menu ao clicar fora
+    document.addEventListener('click', function(event) {
+        if (!event.target.closest('#auth-section') && !event.target.closest('#mobileMenuBtn')) {
+            authSection.classList.remove('mobile-open');
+            navLinks.classList.remove('mobile-open');
+            mobileMenuBtn.classList.remove('active');
+        }
+    });
+
+    // Configuração global de loading
+    window.showGlobalLoading = function(message = 'Processando...') {
+        const overlay = document.getElementById('global-loading-overlay');
+        if (overlay) {
+            overlay.querySelector('h3').textContent = message;
+            overlay.style.display = 'flex';
+        }
+    };
+
+    window.hideGlobalLoading = function() {
+        const overlay = document.getElementById('global-loading-overlay');
+        if (overlay) {
+            overlay.style.display = 'none';
+        }
+    };
+
+    // ✅ CORREÇÃO: Atualizar navegação baseada no estado de autenticação
+    function updateNavigation(isAuthenticated) {
+        const profileLink = document.getElementById('profile-link');
+        const gameLink = document.getElementById('game-link');
+        const headerProfileLink = document.getElementById('header-profile-link');
+
+        if (isAuthenticated) {
+            // Mostrar links para perfil e jogo
+            if (profileLink) profileLink.classList.remove('hidden');
+            if (gameLink) gameLink.classList.remove('hidden');
+            if (headerProfileLink) headerProfileLink.style.display = 'block';
+        } else {
+            // Ocultar links para perfil e jogo
+            if (profileLink) profileLink.classList.add('hidden');
+            if (gameLink) gameLink.classList.add('hidden');
+            if (headerProfileLink) headerProfileLink.style.display = 'none';
+        }
+    }
+
+    // Prevenir envio de formulários com Enter
+    document.addEventListener('keydown', function(event) {
+        if (event.key === 'Enter' && event.target.tagName === 'INPUT') {
+            const form = event.target.closest('form');
+            if (form && !form.querySelector('button[type="submit"]')) {
+                event.preventDefault();
+            }
+        }
+    });
+});
+
+// Função global de login
+function handleGlobalLogin() {
+    if (window.authManager && window.authManager.loginWithGoogle) {
+        window.authManager.loginWithGoogle();
+    } else {
+        showGlobalLoading('Carregando...');
+        setTimeout(() => {
+            if (window.authManager && window.authManager.loginWithGoogle) {
+                window.authManager.loginWithGoogle();
+            } else {
+                hideGlobalLoading();
+                alert('Sistema de autenticação não carregado. Recarregue a página.');
+            }
+        }, 1000);
+    }
+}
+
+// Expor função globalmente
+window.handleGlobalLogin = handleGlobalLogin;
+
+// Web Vitals e métricas de performance
+if ('visibilityState' in document) {
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            // Salvar estado quando a página for ocultada
+            if (window.game && window.game.saveGameState) {
+                window.game.saveGameState(true);
+            }
+        }
+    });
+}
+
+// Tratamento de erros global
+window.addEventListener('error', function(event) {
+    console.error('Erro global capturado:', event.error);
+
+    // Não mostrar alertas para erros de rede ou recursos não críticos
+    if (event.error && !event.error.message.includes('Loading') && 
+        !event.error.message.includes('Network') &&
+        !event.error.message.includes('timeout')) {
+
+        if (window.authManager && window.authManager.showMessage) {
+            window.authManager.showMessage('Ocorreu um erro inesperado. A página será recarregada.', 'error');
+        }
+
+        setTimeout(() => {
+            window.location.reload();
+        }, 3000);
+    }
+});
+
+// Prevenir ações duplas
+function preventMultipleActions(element, timeout = 1000) {
+    if (element.disabled) return false;
+    element.disabled = true;
+    setTimeout(() => {
+        element.disabled = false;
+    }, timeout);
+    return true;
+}
+
+// Expor utilitários globalmente
+window.preventMultipleActions = preventMultipleActions;
+
+// Fallback para avatar padrão
+document.addEventListener('DOMContentLoaded', function() {
+    console.log('🔄 Configurando fallback para avatares...');
+
+    const setDefaultAvatar = function(img) {
+        console.log('🖼️ Aplicando fallback para avatar:', img.id || img.className);
+        img.onerror = null;
+        // SVG de avatar padrão em base64
+        img.src = 'data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMTIwIiBoZWlnaHQ9IjEyMCIgdmlld0JveD0iMCAwIDEyMCAxMjAiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+CjxjaXJjbGUgY3g9IjYwIiBjeT0iNjAiIHI9IjYwIiBmaWxsPSIjRjBGMEYwIi8+CjxjaXJjbGUgY3g9IjYwIiBjeT0iNDUiIHI9IjI1IiBmaWxsPSIjQ0NDIi8+CjxyZWN0IHg9IjMwIiB5PSI3MCIgd2lkdGg9IjYwIiBoZWlnaHQ9IjUwIiByeD0iMjAiIGZpbGw9IiNDQ0MiLz4KPC9zdmc+';
+    };
+
+    // Aplicar a todos os avatares
+    const avatars = document.querySelectorAll('#user-pic, #profile-avatar-img, .user-avatar');
+    console.log(`👤 Encontrados ${avatars.length} avatares na página`);
+
+    avatars.forEach(avatar => {
+        if (!avatar.src || avatar.src.includes('default-avatar')) {
+            setDefaultAvatar(avatar);
+        }
+        avatar.addEventListener('error', function() {
+            console.log('❌ Erro ao carregar avatar, aplicando fallback');
+            setDefaultAvatar(this);
+        });
+
+        // Verificar se o avatar já carregou com sucesso
+        avatar.addEventListener('load', function() {
+            console.log('✅ Avatar carregado com sucesso:', this.src);
+        });
+    });
+});
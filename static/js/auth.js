@@ -5,6 +5,10 @@ class AuthManager {
         this.isAuthenticated = false;
         this.initialized = false;
         this.currentToken = null;
+        this.eventSource = null;
+        this.eventStreamGeneration = 0;
+        this.eventStreamDelay = 5000;
+        this.eventStreamTimer = null;
         
         console.log('🔄 AuthManager inicializando...');
     }
@@ -71,7 +75,7 @@ class AuthManager {
                     if (data.success && data.user) {
                         console.log("✅ Token válido, restaurando sessão:", data.user.email);
                         this.currentToken = storedToken;
-                        this.user = data.user;
+                        this.user = data.profile ? { ...data.user, ...data.profile } : data.user;
                         this.isAuthenticated = true;
                         this.updateUI(this.user);
                         return true;
@@ -140,16 +144,19 @@ class AuthManager {
                 uid: user.uid,
                 email: user.email,
                 name: user.displayName || user.email.split('@')[0],
-                picture: user.photoURL || '/static/images/default-avatar.png',
+                picture: user.photoURL || window.DEFAULT_AVATAR_URL,
                 email_verified: user.emailVerified
             };
             
             this.isAuthenticated = true;
             
-            // 🔥 VERIFICAR SE PRECISA CRIAR USUÁRIO NO BANCO
+            // 🔥 VERIFICAR TOKEN: o servidor cria usuário + estado inicial se ainda
+            // não existirem e devolve perfil e estado na mesma resposta
             try {
-                const response = await this.authFetch('/api/user/profile', {
-                    method: 'GET'
+                const response = await fetch('/api/auth/verify', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ token })
                 });
                 
                 if (response.ok) {
@@ -157,7 +164,7 @@ class AuthManager {
                     if (data.success && data.profile) {
                         // Mesclar dados do banco
                         this.user = { ...this.user, ...data.profile };
-                        console.log('✅ Dados do usuário carregados do banco');
+                        console.log(data.created ? '🆕 Conta criada no banco' : '✅ Dados do usuário carregados do banco');
                     }
                 }
             } catch (error) {
@@ -186,6 +193,7 @@ class AuthManager {
     handleUserLogout() {
         console.log('👋 Processando logout no frontend');
         
+        this.closeEventStream();
         this.user = null;
         this.isAuthenticated = false;
         this.currentToken = null;
@@ -278,6 +286,86 @@ class AuthManager {
         }
     }
 
+    // 🔥 STREAM SSE - estado, conquistas e ranking empurrados pelo servidor
+    async openEventStream(handlers = {}) {
+        if (typeof EventSource === 'undefined') {
+            return null;
+        }
+        
+        this.closeEventStream();
+        const generation = this.eventStreamGeneration;
+        
+        // EventSource não envia headers: um ticket curto vai na query string
+        // (o ID token do Firebase na URL ficaria nos logs de acesso)
+        let ticket = null;
+        try {
+            const response = await this.authFetch('/api/events/ticket', { method: 'POST' });
+            if (response.ok) {
+                ticket = (await response.json()).ticket;
+            }
+        } catch (error) {
+            console.warn('⚠️ Não foi possível obter o ticket do stream:', error);
+        }
+        
+        // Fechado ou reaberto enquanto o ticket era emitido
+        if (generation !== this.eventStreamGeneration) {
+            return null;
+        }
+        if (!ticket) {
+            this.scheduleEventStream(handlers, generation);
+            return null;
+        }
+        
+        const source = new EventSource(`/api/events/stream?ticket=${encodeURIComponent(ticket)}`);
+        this.eventSource = source;
+        
+        Object.entries(handlers).forEach(([eventName, handler]) => {
+            source.addEventListener(eventName, (event) => {
+                try {
+                    handler(JSON.parse(event.data));
+                } catch (error) {
+                    console.error(`❌ Erro ao processar evento ${eventName}:`, error);
+                }
+            });
+        });
+        
+        source.onopen = () => {
+            this.eventStreamDelay = 5000;
+        };
+        
+        source.onerror = () => {
+            // Fim da conexão, ticket vencido ou worker cheio (503): reabrir com
+            // ticket novo, esperando cada vez mais enquanto o servidor recusar
+            if (this.eventSource !== source) {
+                return;
+            }
+            source.close();
+            this.eventSource = null;
+            this.scheduleEventStream(handlers, generation);
+        };
+        
+        return source;
+    }
+
+    scheduleEventStream(handlers, generation) {
+        const delay = this.eventStreamDelay;
+        this.eventStreamDelay = Math.min(delay * 2, 60000);
+        this.eventStreamTimer = setTimeout(() => {
+            if (generation === this.eventStreamGeneration) {
+                this.openEventStream(handlers);
+            }
+        }, delay);
+    }
+
+    closeEventStream() {
+        this.eventStreamGeneration++;
+        clearTimeout(this.eventStreamTimer);
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+    }
+
     updateUI(user) {
         console.log('🎨 Atualizando UI para:', user ? user.email : 'null');
         
@@ -299,11 +387,11 @@ class AuthManager {
         if (user) {
             // Avatar com fallback robusto
             if (userPic) {
-                const avatarUrl = user.picture || user.photoURL || '/static/images/default-avatar.png';
+                const avatarUrl = user.picture || user.photoURL || window.DEFAULT_AVATAR_URL;
                 userPic.src = avatarUrl;
                 userPic.onerror = function() {
                     console.log('❌ Erro ao carregar avatar, usando fallback');
-                    this.src = '/static/images/default-avatar.png';
+                    this.src = window.DEFAULT_AVATAR_URL;
                     this.onerror = null;
                 };
             }
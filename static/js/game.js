@@ -24,6 +24,17 @@ class PopCoinGame {
         this.lastSaveTime = 0;
         this.saveCooldown = 5000;
         
+        // ✅ Salvamento incremental: versão do servidor + último estado salvo
+        this.stateVersion = null;
+        this.lastSavedState = null;
+        
+        // ✅ Sequência monotônica: o servidor descarta saves antigos ou duplicados
+        this.saveSeq = 0;
+        
+        // ✅ Sequências enviadas por esta aba: o eco delas no stream SSE é ignorado
+        this.sentSaveSeqs = new Set();
+        this.refreshingState = false;
+        
         console.log("🎮 PopCoinGame inicializado");
     }
 
@@ -42,6 +53,7 @@ class PopCoinGame {
         this.setupEventListeners();
         this.startGameLoop();
         this.startAutoSave();
+        this.connectEventStream();
         this.hideLoading();
         
         this.addProfileLink();
@@ -68,11 +80,7 @@ class PopCoinGame {
             
             // ✅ CORREÇÃO: Tratamento mais simples de estado vazio
             if (data && Object.keys(data).length > 0) {
-                this.gameState = { 
-                    ...this.gameState, 
-                    ...data,
-                    upgrades: { ...this.gameState.upgrades, ...(data.upgrades || {}) }
-                };
+                this.applyServerState(data);
                 
                 this.calculateOfflineEarnings();
                 console.log("✅ Estado do jogo carregado:", this.gameState);
@@ -88,6 +96,73 @@ class PopCoinGame {
         }
     }
 
+    applyServerState(data) {
+        const { state_version, save_seq, ...serverState } = data;
+        this.gameState = { 
+            ...this.gameState, 
+            ...serverState,
+            upgrades: { ...this.gameState.upgrades, ...(serverState.upgrades || {}) }
+        };
+        this.stateVersion = state_version ?? null;
+        this.saveSeq = Math.max(this.saveSeq, save_seq || 0);
+        this.lastSavedState = this.snapshotState();
+    }
+
+    async refreshGameState() {
+        if (this.refreshingState) {
+            return;
+        }
+        
+        this.refreshingState = true;
+        try {
+            const response = await window.authFetch('/api/game/state');
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            
+            this.applyServerState(await response.json());
+            this.updateUI();
+            console.log(`🔄 Estado atualizado por outra sessão (v${this.stateVersion})`);
+        } catch (error) {
+            console.warn('⚠️ Não foi possível atualizar o estado:', error);
+        } finally {
+            this.refreshingState = false;
+        }
+    }
+
+    applyServerPush(data) {
+        // Eco dos saves desta aba: o estado local já os contém
+        if (data.save_seq && this.sentSaveSeqs.has(data.save_seq)) {
+            return;
+        }
+        if (this.stateVersion === null || data.state_version <= this.stateVersion) {
+            return;
+        }
+        
+        // Delta logo após a versão conhecida: aplicar no estado e na base do próximo delta
+        if (!data.full && data.state_version === this.stateVersion + 1 && this.lastSavedState) {
+            this.applyDelta(this.gameState, data);
+            this.applyDelta(this.lastSavedState, data);
+            this.stateVersion = data.state_version;
+            this.updateUI();
+            console.log(`🔄 Delta de outra sessão aplicado (v${data.state_version})`);
+            return;
+        }
+        
+        // Save completo ou versões puladas: buscar o estado atual
+        this.refreshGameState();
+    }
+
+    applyDelta(target, delta) {
+        Object.assign(target, delta.set || {});
+        Object.entries(delta.merge || {}).forEach(([field, values]) => {
+            target[field] = { ...(target[field] || {}), ...values };
+        });
+        Object.entries(delta.append || {}).forEach(([field, items]) => {
+            target[field] = [...(target[field] || []), ...items];
+        });
+    }
+
     async saveGameState(force = false) {
         const now = Date.now();
         if (!force && now - this.lastSaveTime < this.saveCooldown) {
@@ -98,34 +173,151 @@ class PopCoinGame {
             this.gameState.last_update = Date.now() / 1000;
             this.lastSaveTime = now;
             
-            // ✅ CORREÇÃO: Usar authFetch em vez de fetch normal
-            const response = await window.authFetch('/api/game/state', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(this.gameState)
-            });
-            
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
+            // ✅ Enviar apenas o delta quando o servidor já conhece uma versão base
+            const delta = this.buildDelta();
+            if (delta) {
+                if (this.isDeltaEmpty(delta)) {
+                    return;
+                }
+                
+                const saved = await this.sendDeltaSave(delta);
+                if (saved) {
+                    return;
+                }
             }
             
-            const result = await response.json();
-            
-            if (result.success) {
-                console.log('💾 Estado do jogo salvo');
-                this.updateSaveStatus('✅ Jogo salvo');
-            } else {
-                console.error('❌ Erro ao salvar:', result.error);
-                this.updateSaveStatus('❌ Erro ao salvar');
-            }
+            await this.sendFullSave();
         } catch (error) {
             console.error('❌ Erro ao salvar jogo:', error);
             this.updateSaveStatus('❌ Erro ao salvar');
         }
     }
 
+    async sendDeltaSave(delta) {
+        const snapshot = this.snapshotState();
+        const response = await window.authFetch('/api/game/state', {
+            method: 'PATCH',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ base_version: this.stateVersion, save_seq: this.nextSaveSeq(), ...delta })
+        });
+        
+        // 409 (base desatualizada) ou 404 (sem estado): cair para o salvamento completo
+        if (response.status === 409 || response.status === 404) {
+            console.log('🔄 Delta rejeitado, enviando estado completo');
+            return false;
+        }
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const result = await response.json();
+        if (result.applied === false) {
+            console.log('⏭️ Delta antigo descartado pelo servidor');
+            return true;
+        }
+        
+        this.stateVersion = result.state_version;
+        this.lastSavedState = snapshot;
+        console.log('💾 Delta do jogo salvo');
+        this.updateSaveStatus('✅ Jogo salvo');
+        return true;
+    }
+
+    async sendFullSave() {
+        const snapshot = this.snapshotState();
+        const response = await window.authFetch('/api/game/save', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ ...this.gameState, save_seq: this.nextSaveSeq() })
+        });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const result = await response.json();
+        
+        if (result.success && result.applied === false) {
+            console.log('⏭️ Save antigo descartado pelo servidor');
+        } else if (result.success) {
+            this.stateVersion = result.state_version ?? null;
+            this.lastSavedState = snapshot;
+            console.log('💾 Estado do jogo salvo');
+            this.updateSaveStatus('✅ Jogo salvo');
+        } else {
+            console.error('❌ Erro ao salvar:', result.error);
+            this.updateSaveStatus('❌ Erro ao salvar');
+        }
+    }
+
+    nextSaveSeq() {
+        // Baseada no relógio para continuar crescente entre recarregamentos e abas
+        this.saveSeq = Math.max(this.saveSeq + 1, Date.now());
+        this.sentSaveSeqs.add(this.saveSeq);
+        if (this.sentSaveSeqs.size > 50) {
+            this.sentSaveSeqs.delete(this.sentSaveSeqs.values().next().value);
+        }
+        return this.saveSeq;
+    }
+
+    snapshotState() {
+        return JSON.parse(JSON.stringify(this.gameState));
+    }
+
+    buildDelta() {
+        const previous = this.lastSavedState;
+        if (!previous || this.stateVersion === null) {
+            return null;
+        }
+        
+        const delta = { set: {}, merge: {}, append: {} };
+        const numericFields = ['coins', 'coins_per_click', 'coins_per_second', 'total_coins',
+                               'prestige_level', 'click_count', 'level', 'experience'];
+        
+        numericFields.forEach(field => {
+            if (field in this.gameState && this.gameState[field] !== previous[field]) {
+                delta.set[field] = this.gameState[field];
+            }
+        });
+        
+        const changedUpgrades = {};
+        Object.entries(this.gameState.upgrades || {}).forEach(([upgrade, level]) => {
+            if ((previous.upgrades || {})[upgrade] !== level) {
+                changedUpgrades[upgrade] = level;
+            }
+        });
+        if (Object.keys(changedUpgrades).length > 0) {
+            delta.merge.upgrades = changedUpgrades;
+        }
+        
+        // Arrays que só cresceram viram append; qualquer outra mudança substitui o array
+        ['achievements', 'inventory'].forEach(field => {
+            const current = this.gameState[field] || [];
+            const saved = previous[field] || [];
+            const onlyGrew = saved.length <= current.length &&
+                saved.every((item, index) => JSON.stringify(item) === JSON.stringify(current[index]));
+            
+            if (!onlyGrew) {
+                delta.set[field] = current;
+            } else if (current.length > saved.length) {
+                delta.append[field] = current.slice(saved.length);
+            }
+        });
+        
+        return delta;
+    }
+
+    isDeltaEmpty(delta) {
+        return Object.keys(delta.set).length === 0 &&
+               Object.keys(delta.merge).length === 0 &&
+               Object.keys(delta.append).length === 0;
+    }
+
     calculateOfflineEarnings() {
         const now = Date.now() / 1000;
         const timeDiff = now - this.gameState.last_update;
@@ -551,6 +743,21 @@ class PopCoinGame {
         }, 100);
     }
 
+    connectEventStream() {
+        if (!window.authManager || !window.authManager.openEventStream) {
+            return;
+        }
+        
+        window.authManager.openEventStream({
+            state: (data) => this.applyServerPush(data),
+            achievement: (data) => {
+                if (!this.gameState.achievements.includes(data.id)) {
+                    this.showMessage(`🏆 Conquista desbloqueada em outra sessão: ${data.id}`, 'achievement');
+                }
+            }
+        });
+    }
+
     startAutoSave() {
         this.autoSaveInterval = setInterval(() => {
             this.saveGameState();
@@ -574,6 +781,9 @@ class PopCoinGame {
         if (this.autoSaveInterval) {
             clearInterval(this.autoSaveInterval);
         }
+        if (window.authManager && window.authManager.closeEventStream) {
+            window.authManager.closeEventStream();
+        }
         
         this.saveGameState(true);
         console.log('🎮 Jogo finalizado');
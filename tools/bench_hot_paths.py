@@ -0,0 +1,346 @@
+# tools/bench_hot_paths.py
+"""
+Microbenchmarks das funções quentes do GameManager e do DatabaseManager
+
+Mede, com estados pequenos e grandes (inventário grande, muitas conquistas):
+- GameManager: _ensure_game_state_structure, calculate_offline_earnings,
+  _update_game_stats, _check_achievements, apply_click
+- DatabaseManager: _align_game_data_structure e a conversão linha -> dict de
+  get_user_data (_row_to_user_data)
+
+Como no pyperf, as medições rodam em vários processos (--processes), cada um
+com um PYTHONHASHSEED fixo diferente: funções de poucos µs variam bastante de
+processo para processo (layout de memória, hash de strings). Em cada processo
+o número de chamadas por amostra é calibrado para que cada amostra dure pelo
+menos MIN_SAMPLE_SECONDS (100 ms); depois de uma rodada de aquecimento vale a
+melhor de REPEAT amostras.
+
+Cada amostra de um caso é intercalada com uma amostra de uma carga de
+referência fixa (reference_workload) e guardada também como tempo relativo a
+ela: em VMs compartilhadas a velocidade da máquina inteira oscila ~2x entre
+rodadas, e a razão entre duas amostras vizinhas cancela essa oscilação. O
+resultado de cada caso é, por processo, o melhor tempo absoluto (só para a
+tabela) e o menor tempo relativo (usado no portão).
+
+A comparação com o baseline (tools/bench_hot_paths_baseline.json) é um teste
+de intervalo sobre os tempos relativos: um bootstrap das duas listas dá o
+intervalo de 95% da razão entre as medianas, e o caso só é regressão se até o
+limite inferior desse intervalo passar do limite (--threshold, padrão 50%,
+acima da faixa de ruído entre processos observada nesta máquina, em que o
+limite inferior chegou a 1.17 sem mudança de código). O baseline só é comparado na mesma
+versão do Python e na mesma máquina em que foi gravado; fora dela, regrave
+com --save-baseline.
+
+O pyperf não é usado: este harness já segue o modelo dele (processos com seeds
+diferentes, calibração do número de chamadas, aquecimento), e o portão de
+regressão precisa de "mais lento que X% com confiança" contra um baseline
+versionado, o que o `pyperf compare_to` não oferece (ele só diz se a diferença
+é significativa). Assim a ferramenta roda sem dependências extras.
+
+O comando sai com código 1 se algum caso regredir.
+
+O banco não é usado (DATABASE_URL é ignorada) e os logs ficam desligados para
+medir só a CPU das funções.
+
+Uso:
+    python -m tools.bench_hot_paths [--filter achievements] [--threshold 0.5]
+    python -m tools.bench_hot_paths --save-baseline
+"""
+import argparse
+import json
+import logging
+import os
+import pathlib
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+# ✅ Sem banco e sem logs: o benchmark mede só a CPU das funções
+os.environ.pop('DATABASE_URL', None)
+logging.disable(logging.CRITICAL)
+
+from database.db_models import DatabaseManager  # noqa: E402
+from game.game_logic import GameManager  # noqa: E402
+
+BASELINE_PATH = ROOT_DIR / 'tools' / 'bench_hot_paths_baseline.json'
+DEFAULT_THRESHOLD = 0.5
+REPEAT = 3
+MIN_SAMPLE_SECONDS = 0.1
+DEFAULT_PROCESSES = 5
+BOOTSTRAP_ROUNDS = 2000
+CONFIDENCE = 0.95
+
+ACHIEVEMENT_IDS = ('first_coins', 'clicker_beginner', 'clicker_pro', 'upgrade_collector',
+                   'idle_master', 'wealthy', 'prestige_beginner')
+
+# Tamanhos representativos: jogador novo e jogador veterano
+SIZES = {
+    'small': {'inventory_size': 5, 'achievements': 3},
+    'large': {'inventory_size': 2000, 'achievements': 200},
+}
+
+
+def build_game_state(inventory_size: int, achievements: int) -> dict:
+    """Estado como sai do banco: upgrades/inventário/conquistas já decodificados do JSONB"""
+    return {
+        'coins': 123456,
+        'coins_per_click': 12.5,
+        'coins_per_second': 48.0,
+        'total_coins': 987654321,
+        'prestige_level': 3,
+        'upgrades': {'click_power': 25, 'auto_clickers': 40, 'click_bots': 12},
+        'click_count': 45210,
+        'level': 37,
+        'experience': 1520,
+        'last_update': time.time() - 3600,
+        'state_version': 1024,
+        'save_seq': 1792389058955,
+        'inventory': [
+            {'id': f'item_{i}', 'type': 'booster', 'qty': i % 7, 'acquired_at': 1700000000 + i}
+            for i in range(inventory_size)
+        ],
+        # Conquistas extras (eventos, temporadas) antes das sete verificadas a cada clique
+        'achievements': [f'achievement_{i}' for i in range(max(0, achievements - len(ACHIEVEMENT_IDS)))]
+                        + list(ACHIEVEMENT_IDS[:min(achievements, len(ACHIEVEMENT_IDS))]),
+    }
+
+
+def build_legacy_game_data(inventory_size: int, achievements: int) -> dict:
+    """game_data no formato antigo (popcoins/clicks/auto_clicker) que o alinhamento migra"""
+    state = build_game_state(inventory_size, achievements)
+    state['popcoins'] = state.pop('coins')
+    state['clicks'] = state.pop('click_count')
+    state['upgrades'] = {'click_power': 25, 'auto_clicker': 40}
+    return state
+
+
+def build_db_row(inventory_size: int, achievements: int) -> dict:
+    """Linha de users + user_game_states como o DictCursor devolve em get_user_data"""
+    state = build_game_state(inventory_size, achievements)
+    now = datetime(2026, 10, 19, 12, 0, 0)
+    return {
+        'user_id': 'bench-user-0001',
+        'email': 'jogador@example.com',
+        'display_name': 'Jogador Benchmark',
+        'avatar_url': None,
+        'email_verified': True,
+        'created_at': now - timedelta(days=400),
+        'last_login': now,
+        'last_activity': now,
+        'preferences': {'notifications': True, 'sound_effects': True, 'music': True, 'autosave': True},
+        'last_update': now - timedelta(hours=1),
+        **{key: state[key] for key in ('coins', 'coins_per_click', 'coins_per_second', 'total_coins',
+                                       'prestige_level', 'click_count', 'level', 'experience',
+                                       'upgrades', 'achievements', 'inventory', 'state_version',
+                                       'save_seq')},
+    }
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object]]]:
+    game_manager = GameManager()
+    db_manager = DatabaseManager()
+
+    cases = []
+    for size, params in SIZES.items():
+        state = game_manager._ensure_game_state_structure(build_game_state(**params))
+        legacy = build_legacy_game_data(**params)
+        row = build_db_row(**params)
+
+        def offline_earnings(state=state):
+            # Uma hora offline a cada chamada, senão o caminho de ganhos nunca é exercitado
+            state['last_update'] = time.time() - 3600
+            return game_manager.calculate_offline_earnings(state)
+
+        def align(legacy=legacy):
+            # O alinhamento migra o dict de upgrades no lugar: cópia rasa para repetir a migração
+            return db_manager._align_game_data_structure({**legacy, 'upgrades': dict(legacy['upgrades'])})
+
+        cases += [
+            (f'game.ensure_structure[{size}]', lambda state=state: game_manager._ensure_game_state_structure(state)),
+            (f'game.offline_earnings[{size}]', offline_earnings),
+            (f'game.update_stats[{size}]', lambda state=state: game_manager._update_game_stats(state)),
+            (f'game.check_achievements[{size}]', lambda state=state: game_manager._check_achievements(state)),
+            (f'game.apply_click[{size}]', lambda state=state: game_manager.apply_click(state)),
+            (f'db.align_game_data[{size}]', align),
+            (f'db.row_to_user_data[{size}]', lambda row=row: db_manager._row_to_user_data(row)),
+        ]
+    return cases
+
+
+def reference_workload() -> int:
+    """Carga de referência com o mesmo tipo de operação das funções medidas (dicts, listas, floats)"""
+    state = {'coins': 0.0, 'upgrades': {'click_power': 1}, 'achievements': []}
+    for i in range(50):
+        state['coins'] += float(i) * 1.5
+        state['upgrades']['click_power'] = state['upgrades'].get('click_power', 1) + 1
+        if i % 10 == 0 and f'a{i}' not in state['achievements']:
+            state['achievements'].append(f'a{i}')
+    return len(state['achievements'])
+
+
+def calibrate(timer: timeit.Timer) -> int:
+    """Chamadas por amostra para que cada amostra dure pelo menos MIN_SAMPLE_SECONDS"""
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= MIN_SAMPLE_SECONDS:
+            return number
+        # Estimativa pelo tempo já medido, com folga de 20% (mínimo: dobrar)
+        number = max(number * 2, int(number * MIN_SAMPLE_SECONDS * 1.2 / max(elapsed, 1e-9)))
+
+
+def measure(func: Callable[[], object], reference: timeit.Timer, reference_number: int) -> Tuple[float, float]:
+    """(µs por chamada, tempo relativo à referência) da melhor de REPEAT amostras
+
+    Cada amostra do caso é seguida de uma amostra da carga de referência: as
+    duas veem a mesma velocidade da máquina (CPU compartilhada, frequência),
+    e a razão entre elas não muda quando a máquina inteira fica mais lenta.
+    """
+    timer = timeit.Timer(func)
+    number = calibrate(timer)
+    pairs = []
+    for _ in range(REPEAT):
+        case = timer.timeit(number) / number
+        pairs.append((case, case / (reference.timeit(reference_number) / reference_number)))
+    best = min(pairs)
+    return best[0] * 1e6, min(ratio for _, ratio in pairs)
+
+
+def run_worker(name_filter: str) -> None:
+    """Processo filho: mede os casos e imprime {caso: [µs, relativo]} em JSON"""
+    reference = timeit.Timer(reference_workload)
+    reference_number = calibrate(reference)
+    results = {}
+    for name, func in build_cases():
+        if name_filter in name:
+            results[name] = measure(func, reference, reference_number)
+    print(json.dumps(results))
+
+
+def run_processes(name_filter: str, processes: int) -> Dict[str, Dict[str, List[float]]]:
+    """Roda os processos filhos; por caso, o melhor tempo (µs e relativo) de cada processo"""
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    for seed in range(processes):
+        output = subprocess.run(
+            [sys.executable, '-m', 'tools.bench_hot_paths', '--worker', '--filter', name_filter],
+            cwd=ROOT_DIR, env={**os.environ, 'PYTHONHASHSEED': str(seed)},
+            check=True, capture_output=True, text=True
+        ).stdout
+        for name, (micros, relative) in json.loads(output.strip().splitlines()[-1]).items():
+            case = samples.setdefault(name, {'us': [], 'relative': []})
+            case['us'].append(micros)
+            case['relative'].append(relative)
+    return samples
+
+
+def environment() -> Dict[str, str]:
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'platform': platform.platform()}
+
+
+def load_baseline(path: pathlib.Path) -> Tuple[Dict[str, str], Dict[str, Dict[str, List[float]]]]:
+    """(ambiente, {caso: tempos por processo}) do baseline gravado"""
+    try:
+        with open(path, 'r', encoding='utf-8') as baseline_file:
+            payload = json.load(baseline_file)
+    except FileNotFoundError:
+        return {}, {}
+    recorded = {key: payload.get(key) for key in ('python', 'machine', 'platform')}
+    results = {name: {'us': result['samples_us'], 'relative': result['samples_relative']}
+               for name, result in payload.get('results', {}).items() if 'samples_relative' in result}
+    return recorded, results
+
+
+def ratio_interval(current: List[float], reference: List[float]) -> Tuple[float, float, float]:
+    """Razão entre as medianas e o intervalo de CONFIDENCE por bootstrap (determinístico)"""
+    rng = random.Random(0)
+    ratios = sorted(
+        statistics.median(rng.choices(current, k=len(current)))
+        / statistics.median(rng.choices(reference, k=len(reference)))
+        for _ in range(BOOTSTRAP_ROUNDS)
+    )
+    tail = (1 - CONFIDENCE) / 2
+    return (statistics.median(current) / statistics.median(reference),
+            ratios[int(tail * BOOTSTRAP_ROUNDS)], ratios[int((1 - tail) * BOOTSTRAP_ROUNDS) - 1])
+
+
+def save_baseline(path: pathlib.Path, results: Dict[str, Dict[str, List[float]]]) -> None:
+    payload = {
+        **environment(),
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'results': {name: {'median_us': round(statistics.median(samples['us']), 3),
+                           'samples_us': [round(value, 3) for value in samples['us']],
+                           'samples_relative': [round(value, 5) for value in samples['relative']]}
+                    for name, samples in results.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as baseline_file:
+        json.dump(payload, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Microbenchmarks das funções quentes do jogo e do banco')
+    parser.add_argument('--filter', default='', help='Roda só os casos cujo nome contém este texto')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Fração de piora aceita sobre o baseline (0.5 = 50%%)')
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help='Processos de medição (cada um com um PYTHONHASHSEED)')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Arquivo de baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='Grava os resultados como novo baseline')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.filter)
+        return
+
+    baseline_path = pathlib.Path(args.baseline)
+    recorded, baseline = load_baseline(baseline_path)
+    if baseline and (recorded['python'] != platform.python_version() or recorded['machine'] != platform.machine()):
+        print(f"⚠️ Baseline gravado em outro ambiente (Python {recorded['python']}, {recorded['machine']}): "
+              f"só os tempos serão mostrados")
+        baseline = {}
+    results = run_processes(args.filter, args.processes)
+
+    print(f"{'caso':<36}{'mediana µs':>12}{'faixa µs':>18}{'baseline µs':>13}{'razão':>8}{'IC 95%':>16}")
+    regressions = []
+    for name, samples in results.items():
+        spread = f"{min(samples['us']):.2f}-{max(samples['us']):.2f}"
+        reference = baseline.get(name)
+        line = f"{name:<36}{statistics.median(samples['us']):>12.2f}{spread:>18}"
+        if reference:
+            ratio, low, high = ratio_interval(samples['relative'], reference['relative'])
+            # Regressão só se até o limite inferior do intervalo passar do limite
+            flag = ' ❌' if low > 1 + args.threshold else ''
+            if flag:
+                regressions.append(name)
+            print(f"{line}{statistics.median(reference['us']):>13.2f}{ratio:>8.2f}{f'{low:.2f}-{high:.2f}':>16}{flag}")
+        else:
+            print(f"{line}{'-':>13}{'-':>8}{'-':>16}")
+
+    if args.save_baseline:
+        # Mantém no baseline os casos que o --filter deixou de fora
+        save_baseline(baseline_path, {**baseline, **results})
+        print(f"\n✅ Baseline gravado em {baseline_path}")
+        return
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} caso(s) mais de {args.threshold:.0%} mais lentos (IC 95%): "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+    if baseline:
+        print(f"\n✅ Nenhuma regressão acima de {args.threshold:.0%}")
+    else:
+        print(f"\n⚠️ Sem baseline comparável em {baseline_path} - rode com --save-baseline")
+
+
+if __name__ == '__main__':
+    main()
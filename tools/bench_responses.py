@@ -0,0 +1,136 @@
+# tools/bench_responses.py
+"""
+Benchmark de respostas HTTP: bytes trafegados e CPU por resposta
+
+Mede, para payloads representativos do PopCoin IDLE (estado do jogo pequeno e
+grande, perfil, páginas HTML e style.css):
+- serialização JSON com o encoder padrão vs. o provider rápido (orjson)
+- tamanho bruto vs. gzip vs. brotli
+- tempo de CPU por resposta em cada combinação
+
+Uso:
+    python -m tools.bench_responses [--iterations 500]
+"""
+import argparse
+import json
+import pathlib
+import sys
+import time
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from core.compression import compress_body, supported_encodings
+from core.json_provider import FastJSONProvider, orjson
+
+
+def build_game_state(inventory_size: int, achievements: int) -> dict:
+    return {
+        'coins': 123456,
+        'coins_per_click': 12.5,
+        'coins_per_second': 48.0,
+        'total_coins': 987654321,
+        'prestige_level': 3,
+        'upgrades': {'click_power': 25, 'auto_clickers': 40, 'click_bots': 12},
+        'click_count': 45210,
+        'level': 37,
+        'experience': 1520,
+        'last_update': time.time(),
+        'state_version': 1024,
+        'save_seq': 1792389058955,
+        'inventory': [
+            {'id': f'item_{i}', 'type': 'booster', 'qty': i % 7, 'acquired_at': 1700000000 + i}
+            for i in range(inventory_size)
+        ],
+        'achievements': [f'achievement_{i}' for i in range(achievements)],
+    }
+
+
+def build_profile(game_state: dict) -> dict:
+    return {
+        'success': True,
+        'profile': {
+            'uid': 'bench-user-0001',
+            'email': 'jogador@example.com',
+            'name': 'Jogador Benchmark',
+            'picture': '/static/images/default-avatar.png',
+            'email_verified': True,
+            'created_at': '2025-01-01T00:00:00',
+            'last_login': '2026-10-19T12:00:00',
+            'last_activity': '2026-10-19T12:00:00',
+            'preferences': {'notifications': True, 'sound_effects': True, 'music': True, 'autosave': True},
+            'game_data': game_state,
+        }
+    }
+
+
+def measure_cpu(func, iterations: int) -> float:
+    """Tempo médio de CPU (µs) por chamada"""
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def render_pages() -> dict:
+    """Renderiza as páginas públicas uma vez, sem inicializar Firebase/banco"""
+    app = Flask('bench', template_folder=str(ROOT_DIR / 'templates'),
+                static_folder=str(ROOT_DIR / 'static'))
+    for endpoint in ('index', 'game', 'profile'):
+        app.add_url_rule(f'/{endpoint}', endpoint, lambda: '')
+
+    pages = {}
+    with app.test_request_context('/'):
+        from flask import render_template
+        for name in ('index', 'game', 'profile'):
+            pages[f'{name}.html'] = render_template(f'{name}.html', firebase_config={}).encode('utf-8')
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de serialização e compressão de respostas')
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    app = Flask('bench')
+    providers = {
+        'stdlib': DefaultJSONProvider(app),
+        'fast': FastJSONProvider(app),
+    }
+
+    json_payloads = {
+        'game_state_small': build_game_state(inventory_size=5, achievements=3),
+        'game_state_large': build_game_state(inventory_size=2000, achievements=200),
+    }
+    json_payloads['profile'] = build_profile(json_payloads['game_state_small'])
+
+    print(f"{'payload':<22}{'encoder':<10}{'serialize µs':>14}")
+    bodies = {}
+    for name, payload in json_payloads.items():
+        for provider_name, provider in providers.items():
+            cpu = measure_cpu(lambda: provider.dumps(payload), args.iterations)
+            print(f"{name:<22}{provider_name:<10}{cpu:>14.1f}")
+        bodies[name] = providers['fast'].dumps(payload).encode('utf-8')
+
+    bodies.update(render_pages())
+    bodies['style.css'] = (ROOT_DIR / 'static' / 'css' / 'style.css').read_bytes()
+
+    print()
+    print(f"{'payload':<22}{'encoding':<10}{'bytes':>10}{'ratio':>8}{'compress µs':>14}")
+    for name, body in bodies.items():
+        print(f"{name:<22}{'identity':<10}{len(body):>10}{1.0:>8.2f}{0.0:>14.1f}")
+        for encoding in supported_encodings():
+            compressed = compress_body(body, encoding)
+            cpu = measure_cpu(lambda: compress_body(body, encoding), max(1, args.iterations // 10))
+            ratio = len(compressed) / len(body) if body else 1.0
+            print(f"{name:<22}{encoding:<10}{len(compressed):>10}{ratio:>8.2f}{cpu:>14.1f}")
+
+    print()
+    print(json.dumps({'encodings': list(supported_encodings()), 'orjson': orjson is not None}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# tools/build_assets.py
+"""
+Build dos assets estáticos: minificação, hash de conteúdo e variantes .gz/.br
+
+Gera em static/dist/:
+- <nome>.<hash>.<ext> para cada asset (JS/CSS minificados quando rjsmin/rcssmin
+  estão instalados; imagens copiadas como estão)
+- <arquivo>.gz e <arquivo>.br para os tipos texto, quando compensam
+- manifest.json: caminho original -> arquivo com hash e variantes disponíveis
+
+O app lê o manifest no boot (core/assets.py) e o helper `asset_url` passa a
+apontar para /assets/<arquivo com hash>, servido com cache imutável de 1 ano.
+
+O Procfile roda o build antes do gunicorn: o manifest é gerado no próprio
+filesystem do processo web (uma fase de release separada não o levaria até
+lá). No Render o app não sobe sem o manifest (ASSETS_REQUIRE_MANIFEST).
+
+Uso:
+    python -m tools.build_assets [--no-minify]
+"""
+import argparse
+import hashlib
+import json
+import pathlib
+import shutil
+import sys
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from core.assets import DIST_DIR, PRECOMPRESSED_SUFFIXES
+from core.compression import compress_body, supported_encodings
+
+# ✅ Dependências opcionais: sem elas, JS/CSS vão sem minificação
+try:
+    import rjsmin
+except ImportError:  # pragma: no cover - depende do ambiente
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:  # pragma: no cover - depende do ambiente
+    rcssmin = None
+
+STATIC_DIR = ROOT_DIR / 'static'
+
+ASSETS = (
+    'js/auth.js',
+    'js/app.js',
+    'js/game.js',
+    'js/profile.js',
+    'css/style.css',
+    'css/profile.css',
+    'images/default-avatar.png',
+)
+
+TEXT_SUFFIXES = {'.js', '.css', '.svg'}
+
+# Variante comprimida só é gravada se ficar abaixo desta fração do original
+MIN_COMPRESSION_RATIO = 0.9
+
+
+def minify(path: str, data: bytes) -> bytes:
+    if path.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(data.decode('utf-8')).encode('utf-8')
+    if path.endswith('.css') and rcssmin is not None:
+        return rcssmin.cssmin(data.decode('utf-8')).encode('utf-8')
+    return data
+
+
+def hashed_name(path: str, data: bytes) -> str:
+    source = pathlib.PurePosixPath(path)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return str(source.with_name(f"{source.stem}.{digest}{source.suffix}"))
+
+
+def build(dist_dir: pathlib.Path, use_minify: bool = True) -> dict:
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+    dist_dir.mkdir(parents=True)
+
+    manifest = {}
+    for path in ASSETS:
+        original = (STATIC_DIR / path).read_bytes()
+        data = minify(path, original) if use_minify else original
+        file_name = hashed_name(path, data)
+        target = dist_dir / file_name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+
+        encodings = []
+        sizes = {'original': len(original), 'minified': len(data)}
+        if pathlib.PurePosixPath(path).suffix in TEXT_SUFFIXES:
+            for encoding in supported_encodings():
+                compressed = compress_body(data, encoding, gzip_level=9, brotli_quality=11)
+                if len(compressed) < len(data) * MIN_COMPRESSION_RATIO:
+                    (dist_dir / (file_name + PRECOMPRESSED_SUFFIXES[encoding])).write_bytes(compressed)
+                    encodings.append(encoding)
+                    sizes[encoding] = len(compressed)
+
+        manifest[path] = {'file': file_name, 'encodings': encodings, 'sizes': sizes}
+
+    with open(dist_dir / 'manifest.json', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build dos assets estáticos do PopCoin IDLE')
+    parser.add_argument('--no-minify', action='store_true', help='Apenas hash e compressão')
+    parser.add_argument('--output', default=DIST_DIR, help='Diretório de saída (padrão: static/dist)')
+    args = parser.parse_args()
+
+    if not args.no_minify and (rjsmin is None or rcssmin is None):
+        print("⚠️ rjsmin/rcssmin não instalados - JS/CSS sem minificação")
+
+    manifest = build(pathlib.Path(args.output), use_minify=not args.no_minify)
+
+    print(f"{'asset':<28} {'arquivo':<38} {'original':>10} {'minif.':>10} {'gzip':>8} {'br':>8}")
+    for path, entry in manifest.items():
+        sizes = entry['sizes']
+        print(f"{path:<28} {entry['file']:<38} {sizes['original']:>10} {sizes['minified']:>10} "
+              f"{sizes.get('gzip', '-'):>8} {sizes.get('br', '-'):>8}")
+    print(f"✅ {len(manifest)} assets em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
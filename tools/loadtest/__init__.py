@@ -0,0 +1,11 @@
+# tools/loadtest/__init__.py
+"""
+Teste de carga local do PopCoin IDLE
+
+Sobe o app com gunicorn em cada modelo de worker, autentica usuários virtuais
+com um emissor local de JWT (no lugar do Firebase) e reproduz o tráfego dos
+clientes: autosave do game.js, lotes de cliques/upgrades e visitas ao perfil.
+
+Uso:
+    python -m tools.loadtest --help
+"""
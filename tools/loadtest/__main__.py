@@ -0,0 +1,284 @@
+# tools/loadtest/__main__.py
+"""
+Teste de carga local: vazão, percentis de latência e comandos SQL por cenário
+
+Para cada modelo de worker do gunicorn (--worker-classes), sobe `gunicorn app:app`
+(ou `asgi:application` em workers uvicorn, com --worker-classes asgi)
+com o AuthManager apontado para o emissor local de tokens e roda cada cenário
+(autosave, clicker, profile, mixed) com N usuários virtuais. Os comandos SQL vêm
+do contador `popcoin_db_statements_total` do /metrics (lido antes e depois).
+
+Banco:
+- --postgres: cluster Postgres descartável (initdb/pg_ctl precisam estar instalados)
+- --database-url: Postgres local já rodando (ex.: container)
+- nenhum dos dois: engine offline do app (--storage memory | sqlite), sem
+  comandos SQL no Postgres; com sqlite os workers compartilham o arquivo
+
+As cadências do frontend (autosave a cada 30s etc.) são divididas por
+--time-scale. Como isso multiplica a taxa por usuário, o rate limit fica
+desligado por padrão (--rate-limit liga). As métricas são por processo: com
+--workers > 1 a contagem de comandos SQL cobre só o worker que respondeu o /metrics.
+
+Uso:
+    python -m tools.loadtest --postgres --users 50 --duration 30
+    python -m tools.loadtest --scenarios autosave,profile --worker-classes gthread,sync --json resultado.json
+    python -m tools.loadtest --storage sqlite --workers 2
+"""
+import argparse
+import json
+import os
+import pathlib
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+
+import requests
+
+from tools.loadtest.issuer import LocalTokenIssuer
+from tools.loadtest.postgres import TemporaryPostgres
+from tools.loadtest.scenarios import MIXED_WEIGHTS, SCENARIOS, LoadClient, Recorder, scenario_for_user
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent.parent
+
+STATEMENTS_METRIC = 'popcoin_db_statements_total'
+ASGI_WORKER_CLASS = 'uvicorn.workers.UvicornWorker'
+
+
+# ========== SERVIDOR ==========
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(worker_class: str, port: int, workers: int, threads: int, env: Dict[str, str],
+                 log_path: pathlib.Path) -> subprocess.Popen:
+    """gunicorn com o gunicorn.conf.py do repo; o modelo de worker vem de WEB_WORKER_CLASS
+
+    A saída vai para `log_path` (um PIPE não lido travaria o servidor quando enchesse).
+    """
+    # 'asgi': entrada asgi.py (rotas quentes assíncronas) em workers uvicorn
+    target = 'asgi:application' if worker_class == 'asgi' else 'app:app'
+    server_env = {
+        **os.environ,
+        **env,
+        'WEB_WORKER_CLASS': ASGI_WORKER_CLASS if worker_class == 'asgi' else worker_class,
+        # sync com threads > 1 vira gthread no gunicorn; gevent não usa threads;
+        # no asgi são as threads das rotas que ficam no Flask
+        'WEB_THREADS': str(threads if worker_class in ('gthread', 'asgi') else 1),
+    }
+    with open(log_path, 'wb') as log_file:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', target, '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+            cwd=ROOT_DIR, env=server_env, stdout=log_file, stderr=subprocess.STDOUT
+        )
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            log_tail = log_path.read_text(errors='replace')[-2000:]
+            raise RuntimeError(f'gunicorn ({worker_class}) encerrou no boot:\n{log_tail}')
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/healthz', timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+
+    stop_server(process)
+    raise RuntimeError(f'gunicorn ({worker_class}) não respondeu /healthz em 60s')
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def scrape_statements(base_url: str) -> float:
+    """Soma de popcoin_db_statements_total em todas as rotas"""
+    response = requests.get(f'{base_url}/metrics', timeout=10)
+    total = 0.0
+    for line in response.text.splitlines():
+        if line.startswith(STATEMENTS_METRIC + '{') or line.startswith(STATEMENTS_METRIC + ' '):
+            total += float(line.rsplit(' ', 1)[1])
+    return total
+
+
+# ========== EXECUÇÃO ==========
+
+def run_user(scenario_cls, client: LoadClient, time_scale: float, seed: int, deadline: float) -> None:
+    scenario = scenario_cls(client, time_scale, random.Random(seed))
+    scenario.start()
+    # Primeira ação espalhada no primeiro intervalo, como usuários chegando em momentos diferentes
+    time.sleep(min(scenario.wait(1.0) * scenario.rng.random(), max(0.0, deadline - time.time())))
+    while time.time() < deadline:
+        pause = scenario.tick()
+        time.sleep(max(0.0, min(pause, deadline - time.time())))
+
+
+def run_scenario(name: str, base_url: str, issuer: LocalTokenIssuer, users: int,
+                 duration: float, time_scale: float, seed: int) -> Dict:
+    recorder = Recorder()
+    rng = random.Random(seed)
+    statements_before = scrape_statements(base_url)
+
+    deadline = time.time() + duration
+    started = time.perf_counter()
+    threads = []
+    for index in range(users):
+        uid = f'loadtest-{name}-{index:05d}'
+        client = LoadClient(base_url, issuer.mint(uid), recorder)
+        thread = threading.Thread(
+            target=run_user,
+            args=(scenario_for_user(name, rng), client, time_scale, seed + index, deadline),
+            daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    statements = scrape_statements(base_url) - statements_before
+    return summarize(name, recorder.samples, elapsed, statements)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(name: str, samples, elapsed: float, statements: float) -> Dict:
+    latencies = sorted(latency for _, _, latency in samples)
+    statuses: Dict[str, int] = {}
+    operations: Dict[str, int] = {}
+    for operation, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        operations[operation] = operations.get(operation, 0) + 1
+
+    requests_total = len(samples)
+    # 429 (rate limit) e 503 (admissão) são descarte de carga, contados à parte dos erros
+    errors = sum(count for status, count in statuses.items()
+                 if status == '0' or (int(status) >= 400 and status not in ('429', '503')))
+    return {
+        'scenario': name,
+        'requests': requests_total,
+        'throughput_rps': requests_total / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+        'errors': errors,
+        'rate_limited': statuses.get('429', 0),
+        'shed': statuses.get('503', 0),
+        'db_statements': int(statements),
+        'statements_per_request': statements / requests_total if requests_total else 0.0,
+        'statuses': statuses,
+        'operations': operations,
+    }
+
+
+def print_table(worker_class: str, results: List[Dict]) -> None:
+    print(f"\n=== worker: {worker_class} ===")
+    print(f"{'cenário':<10} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'erros':>6} {'429':>5} {'503':>5} {'SQL':>7} {'SQL/req':>8}")
+    for result in results:
+        print(f"{result['scenario']:<10} {result['requests']:>7} {result['throughput_rps']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['max_ms']:>8.1f} {result['errors']:>6} {result['rate_limited']:>5} "
+              f"{result['shed']:>5} {result['db_statements']:>7} {result['statements_per_request']:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Teste de carga local do PopCoin IDLE')
+    parser.add_argument('--scenarios', default=','.join([*SCENARIOS, 'mixed']),
+                        help=f"Cenários separados por vírgula ({', '.join(SCENARIOS)}, mixed)")
+    parser.add_argument('--worker-classes', default='gthread,sync',
+                        help='Modelos de worker do gunicorn (gthread, sync, gevent, asgi)')
+    parser.add_argument('--users', type=int, default=50, help='Usuários virtuais por cenário')
+    parser.add_argument('--duration', type=float, default=30.0, help='Segundos por cenário')
+    parser.add_argument('--time-scale', type=float, default=10.0,
+                        help='Divide as cadências do frontend (10 = autosave a cada 3s)')
+    parser.add_argument('--workers', type=int, default=1, help='Processos do gunicorn')
+    parser.add_argument('--threads', type=int, default=8, help='Threads por worker gthread (e do Flask no asgi)')
+    parser.add_argument('--postgres', action='store_true', help='Sobe um Postgres descartável')
+    parser.add_argument('--database-url', help='Postgres local já rodando')
+    parser.add_argument('--storage', choices=('memory', 'sqlite'), default='memory',
+                        help='Engine usada sem Postgres (STORAGE_BACKEND)')
+    parser.add_argument('--rate-limit', action='store_true', help='Mantém o rate limit ligado')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Grava os resultados completos neste arquivo')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS and name != 'mixed']
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(unknown)}")
+
+    with ExitStack() as stack:
+        workdir = pathlib.Path(stack.enter_context(tempfile.TemporaryDirectory(prefix='popcoin-loadtest-')))
+        issuer = LocalTokenIssuer()
+        env = issuer.environment(issuer.write_public_key(workdir / 'issuer.pem'))
+        env.update({
+            'LOG_LEVEL': 'WARNING',
+            'RATE_LIMIT_ENABLED': 'true' if args.rate_limit else 'false',
+        })
+
+        database_url: Optional[str] = args.database_url
+        if args.postgres:
+            database_url = stack.enter_context(TemporaryPostgres())
+        if database_url:
+            env.update({'DATABASE_URL': database_url, 'DATABASE_SSLMODE': 'disable'})
+        else:
+            env.update({
+                'DATABASE_URL': '',
+                'STORAGE_BACKEND': args.storage,
+                'STORAGE_SQLITE_PATH': str(workdir / 'loadtest.sqlite3'),
+            })
+            print(f"⚠️ Sem Postgres: armazenamento {args.storage}, comandos SQL ficam em 0")
+
+        print(f"👥 {args.users} usuários/cenário, {args.duration:.0f}s, time-scale {args.time_scale:g}, "
+              f"mixed = {MIXED_WEIGHTS}")
+
+        report = []
+        for worker_class in [name.strip() for name in args.worker_classes.split(',') if name.strip()]:
+            port = free_port()
+            try:
+                process = start_server(worker_class, port, args.workers, args.threads, env,
+                                       workdir / f'gunicorn-{worker_class}.log')
+            except RuntimeError as e:
+                print(f"❌ {e}")
+                continue
+
+            base_url = f'http://127.0.0.1:{port}'
+            try:
+                results = [
+                    run_scenario(name, base_url, issuer, args.users, args.duration, args.time_scale, args.seed)
+                    for name in scenarios
+                ]
+            finally:
+                stop_server(process)
+
+            print_table(worker_class, results)
+            report.append({'worker_class': worker_class, 'workers': args.workers, 'results': results})
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump({'config': vars(args), 'runs': report}, output, indent=2)
+        print(f"\n✅ Resultados em {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# tools/loadtest/issuer.py - Emissor local de tokens no formato dos ID tokens do Firebase
+import time
+import pathlib
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+DEFAULT_ISSUER = 'popcoin-loadtest'
+DEFAULT_AUDIENCE = 'popcoin-loadtest'
+
+
+class LocalTokenIssuer:
+    """Par RSA efêmero que assina JWTs RS256 aceitos pelo AuthManager em modo local
+
+    O app valida os tokens com a chave pública apontada por
+    AUTH_LOCAL_ISSUER_PUBLIC_KEY (ver `environment()`), com o mesmo custo de
+    verificação de assinatura de um ID token real do Firebase.
+    """
+
+    def __init__(self, issuer: str = DEFAULT_ISSUER, audience: str = DEFAULT_AUDIENCE):
+        self.issuer = issuer
+        self.audience = audience
+        self._private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def public_key_pem(self) -> bytes:
+        return self._private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+    def write_public_key(self, path: pathlib.Path) -> pathlib.Path:
+        path.write_bytes(self.public_key_pem())
+        return path
+
+    def environment(self, public_key_path: pathlib.Path) -> dict:
+        """Variáveis de ambiente que colocam o AuthManager em modo de emissor local"""
+        return {
+            'AUTH_LOCAL_ISSUER_PUBLIC_KEY': str(public_key_path),
+            'AUTH_LOCAL_ISSUER': self.issuer,
+            'AUTH_LOCAL_ISSUER_AUDIENCE': self.audience,
+        }
+
+    def mint(self, uid: str, ttl: int = 3600) -> str:
+        now = int(time.time())
+        claims = {
+            'iss': self.issuer,
+            'aud': self.audience,
+            'sub': uid,
+            'uid': uid,
+            'iat': now,
+            'exp': now + ttl,
+            'email': f'{uid}@loadtest.local',
+            'name': uid,
+            'email_verified': True,
+            'firebase': {'sign_in_provider': 'loadtest'},
+        }
+        return jwt.encode(claims, self._private_key, algorithm='RS256')
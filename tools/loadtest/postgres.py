@@ -0,0 +1,59 @@
+# tools/loadtest/postgres.py - Cluster Postgres descartável para o teste de carga
+import glob
+import shutil
+import subprocess
+import tempfile
+from typing import Optional
+
+
+def find_pg_binary(name: str) -> Optional[str]:
+    """Procura no PATH e nos diretórios versionados do Debian/Ubuntu (/usr/lib/postgresql/<v>/bin)"""
+    found = shutil.which(name)
+    if found:
+        return found
+    candidates = sorted(glob.glob(f'/usr/lib/postgresql/*/bin/{name}'))
+    return candidates[-1] if candidates else None
+
+
+class TemporaryPostgres:
+    """initdb + pg_ctl em um diretório temporário, acessível só por socket Unix
+
+    Uso:
+        with TemporaryPostgres() as database_url:
+            ...  # DATABASE_URL=database_url, DATABASE_SSLMODE=disable
+    """
+
+    def __init__(self, port: int = 55432, user: str = 'popcoin'):
+        self.port = port
+        self.user = user
+        self.directory = None
+        self.initdb = find_pg_binary('initdb')
+        self.pg_ctl = find_pg_binary('pg_ctl')
+
+    @property
+    def data_dir(self) -> str:
+        return f'{self.directory}/data'
+
+    def __enter__(self) -> str:
+        if not self.initdb or not self.pg_ctl:
+            raise RuntimeError('initdb/pg_ctl não encontrados - instale o PostgreSQL ou use --database-url')
+
+        self.directory = tempfile.mkdtemp(prefix='popcoin-pg-')
+        subprocess.run(
+            [self.initdb, '-D', self.data_dir, '-U', self.user, '-A', 'trust', '--no-sync'],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        # fsync desligado: o cluster é descartável e o teste mede o app, não o disco
+        options = f"-p {self.port} -k {self.directory} -c listen_addresses='' -c fsync=off -c max_connections=200"
+        subprocess.run(
+            [self.pg_ctl, '-D', self.data_dir, '-o', options, '-l', f'{self.directory}/postgres.log', '-w', 'start'],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        return f'postgresql://{self.user}@/postgres?host={self.directory}&port={self.port}'
+
+    def __exit__(self, *exc_info) -> None:
+        try:
+            subprocess.run([self.pg_ctl, '-D', self.data_dir, '-m', 'fast', '-w', 'stop'],
+                           check=False, stdout=subprocess.DEVNULL)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,164 @@
+# tools/loadtest/scenarios.py - Comportamento dos usuários virtuais (espelha o frontend)
+import time
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+# Cadências do frontend em segundos "reais" (divididas por --time-scale)
+AUTOSAVE_INTERVAL = 30.0       # game.js: startAutoSave
+CLICK_FLUSH_INTERVAL = 5.0     # cliente que acumula cliques e envia em lote
+PROFILE_THINK_TIME = 15.0      # tempo na página de perfil antes de recarregar
+
+UPGRADE_TYPES = ('click_power', 'auto_clickers', 'click_bots')
+
+
+class Recorder:
+    """Coleta (operação, status, latência) de todas as threads"""
+
+    def __init__(self):
+        self.samples: List[Tuple[str, int, float]] = []
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, status: int, latency: float) -> None:
+        with self._lock:
+            self.samples.append((operation, status, latency))
+
+
+class LoadClient:
+    """Sessão HTTP de um usuário virtual, com o token no header como o authFetch"""
+
+    def __init__(self, base_url: str, token: str, recorder: Recorder):
+        self.base_url = base_url
+        self.token = token
+        self.recorder = recorder
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {token}'
+        self.session.headers['Accept-Encoding'] = 'br, gzip'
+
+    def call(self, operation: str, method: str, path: str, **kwargs) -> Optional[requests.Response]:
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+        except requests.RequestException:
+            self.recorder.record(operation, 0, time.perf_counter() - started)
+            return None
+        self.recorder.record(operation, response.status_code, time.perf_counter() - started)
+        return response
+
+
+class Scenario:
+    """Um usuário virtual: `start` faz o carregamento da página, `tick` devolve a espera até a próxima ação"""
+
+    name = 'base'
+
+    def __init__(self, client: LoadClient, time_scale: float, rng: random.Random):
+        self.client = client
+        self.time_scale = time_scale
+        self.rng = rng
+
+    def wait(self, seconds: float) -> float:
+        # ±20% de jitter para os usuários não sincronizarem
+        return seconds * self.rng.uniform(0.8, 1.2) / self.time_scale
+
+    def start(self) -> None:
+        self.client.call('auth_verify', 'POST', '/api/auth/verify', json={'token': self.client.token})
+
+    def tick(self) -> float:
+        raise NotImplementedError
+
+
+class AutosaveScenario(Scenario):
+    """game.js: carrega o estado e salva delta (PATCH) a cada 30s, com save completo em 409/404"""
+
+    name = 'autosave'
+
+    def start(self) -> None:
+        super().start()
+        self.state_version = None
+        self.state = {'coins': 0, 'total_coins': 0, 'click_count': 0, 'coins_per_click': 1,
+                      'coins_per_second': 0, 'prestige_level': 0, 'level': 1, 'experience': 0,
+                      'upgrades': {'click_power': 1, 'auto_clickers': 0, 'click_bots': 0},
+                      'achievements': [], 'inventory': []}
+        response = self.client.call('game_state', 'GET', '/api/game/state')
+        if response is not None and response.ok:
+            data = response.json()
+            self.state_version = data.pop('state_version', None)
+            data.pop('save_seq', None)
+            self.state.update(data)
+
+    def save_seq(self) -> int:
+        return int(time.time() * 1000)
+
+    def tick(self) -> float:
+        clicks = self.rng.randint(20, 150)
+        self.state['click_count'] += clicks
+        self.state['coins'] += clicks
+        self.state['total_coins'] += clicks
+
+        if self.state_version is not None and self.patch():
+            return self.wait(AUTOSAVE_INTERVAL)
+        self.full_save()
+        return self.wait(AUTOSAVE_INTERVAL)
+
+    def patch(self) -> bool:
+        delta = {key: self.state[key] for key in ('coins', 'total_coins', 'click_count')}
+        response = self.client.call('save_delta', 'PATCH', '/api/game/state', json={
+            'base_version': self.state_version, 'save_seq': self.save_seq(), 'set': delta
+        })
+        if response is None or response.status_code in (404, 409) or not response.ok:
+            return False
+        self.state_version = response.json().get('state_version', self.state_version)
+        return True
+
+    def full_save(self) -> None:
+        response = self.client.call('save_full', 'POST', '/api/game/save',
+                                    json={**self.state, 'save_seq': self.save_seq()})
+        if response is not None and response.ok:
+            self.state_version = response.json().get('state_version')
+
+
+class ClickerScenario(Scenario):
+    """Cliente que acumula cliques e envia em lote pelo /api/game/batch, com upgrades ocasionais"""
+
+    name = 'clicker'
+
+    def tick(self) -> float:
+        actions = [{'type': 'click', 'count': self.rng.randint(10, 60)}]
+        if self.rng.random() < 0.3:
+            actions.append({'type': 'upgrade', 'upgrade_type': self.rng.choice(UPGRADE_TYPES)})
+        self.client.call('game_batch', 'POST', '/api/game/batch', json={'actions': actions})
+        return self.wait(CLICK_FLUSH_INTERVAL)
+
+
+class ProfileScenario(Scenario):
+    """profile.html: página + /api/user/overview (com ETag, como o navegador faria)"""
+
+    name = 'profile'
+
+    def start(self) -> None:
+        super().start()
+        self.overview_etag = None
+
+    def tick(self) -> float:
+        self.client.call('profile_page', 'GET', '/profile')
+        headers = {'If-None-Match': self.overview_etag} if self.overview_etag else {}
+        response = self.client.call('user_overview', 'GET', '/api/user/overview', headers=headers)
+        if response is not None and response.headers.get('ETag'):
+            self.overview_etag = response.headers['ETag']
+        return self.wait(PROFILE_THINK_TIME)
+
+
+SCENARIOS = {cls.name: cls for cls in (AutosaveScenario, ClickerScenario, ProfileScenario)}
+
+# 'mixed': fração de usuários em cada comportamento
+MIXED_WEIGHTS: Dict[str, float] = {'autosave': 0.6, 'clicker': 0.25, 'profile': 0.15}
+
+
+def scenario_for_user(name: str, rng: random.Random):
+    """Classe do cenário de um usuário; no 'mixed' o sorteio segue MIXED_WEIGHTS"""
+    if name != 'mixed':
+        return SCENARIOS[name]
+    names = list(MIXED_WEIGHTS)
+    return SCENARIOS[rng.choices(names, weights=[MIXED_WEIGHTS[n] for n in names])[0]]
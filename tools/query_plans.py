@@ -0,0 +1,307 @@
+# tools/query_plans.py
+"""
+Regressão de planos das consultas quentes no Postgres
+
+Popula um Postgres local com dados sintéticos em escala (padrão: 1M usuários),
+roda `EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)` de cada consulta quente do
+DatabaseManager (as mesmas constantes SQL usadas pelo app) e falha se:
+- houver Seq Scan em users/user_game_states
+- algum Sort ou Hash transbordar para disco
+- os buffers lidos (shared hit + read) passarem do baseline além do limite
+
+Escritas (save_user, save_game_state) rodam dentro de uma transação desfeita
+com ROLLBACK. O schema e os índices vêm do próprio create_tables/ensure_indexes.
+
+O usuário consultado é o da posição --target-rank do ranking (padrão 1000): a
+contagem de own_rank em /api/user/overview cresce com a posição, então
+usuários no meio da tabela custam mais e podem preferir Seq Scan.
+
+Banco:
+- --postgres: cluster descartável (tools/loadtest/postgres.py)
+- --database-url: Postgres local; só é populado se estiver vazio ou tiver
+  apenas usuários sintéticos (prefixo qp-user-), nunca em um banco com dados reais
+
+Uso:
+    python -m tools.query_plans --postgres [--users 1000000] [--save-baseline]
+    python -m tools.query_plans --database-url postgresql://localhost/popcoin --output /tmp/plans
+"""
+import argparse
+import json
+import os
+import pathlib
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import psycopg2  # noqa: E402
+
+from tools.loadtest.postgres import TemporaryPostgres  # noqa: E402
+
+BASELINE_PATH = ROOT_DIR / 'tools' / 'query_plans_baseline.json'
+DEFAULT_USERS = 1_000_000
+DEFAULT_THRESHOLD = 0.25
+# Diferenças pequenas em valor absoluto (páginas de índice, visibilidade) não contam como regressão
+MIN_BUFFER_DELTA = 16
+
+USER_PREFIX = 'qp-user-'
+WATCHED_TABLES = {'users', 'user_game_states'}
+
+SEED_USERS_SQL = '''
+INSERT INTO users (user_id, email, display_name, email_verified, created_at, last_login, last_activity)
+SELECT %(prefix)s || i, %(prefix)s || i || '@example.com', 'Jogador ' || i, i %% 3 = 0,
+       now() - (i %% 365) * interval '1 day',
+       now() - (i %% 48) * interval '1 hour',
+       now() - (i %% 48) * interval '1 hour'
+FROM generate_series(1, %(users)s) AS i
+'''
+
+# Distribuição de cauda longa em total_coins (poucos jogadores muito ricos), como no ranking real
+SEED_GAME_STATES_SQL = '''
+INSERT INTO user_game_states
+    (user_id, coins, coins_per_click, coins_per_second, total_coins, prestige_level,
+     click_count, level, experience, upgrades, achievements, inventory, state_version, save_seq)
+SELECT %(prefix)s || i,
+       (random() * 1e6)::bigint,
+       1 + (random() * 50)::int,
+       (random() * 100)::numeric(10, 2),
+       (power(random(), 4) * 1e9)::bigint,
+       (power(random(), 2) * 5)::int,
+       (random() * 1e5)::int,
+       1 + (random() * 80)::int,
+       (random() * 1000)::int,
+       jsonb_build_object('click_power', 1 + (random() * 40)::int,
+                          'auto_clickers', (random() * 40)::int,
+                          'click_bots', (random() * 20)::int),
+       '["first_coins", "clicker_beginner"]'::jsonb,
+       '[]'::jsonb,
+       (random() * 1000)::bigint,
+       0
+FROM generate_series(1, %(users)s) AS i
+'''
+
+
+# ========== DADOS ==========
+
+def connect(database_url: str, sslmode: str):
+    return psycopg2.connect(dsn=database_url, sslmode=sslmode, connect_timeout=10)
+
+
+def seed(conn, users: int) -> None:
+    """Popula os usuários sintéticos, a menos que já existam na quantidade pedida"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT count(*) FROM users WHERE user_id NOT LIKE %s', (USER_PREFIX + '%',))
+        real_users = cur.fetchone()[0]
+        if real_users:
+            raise RuntimeError(f'o banco tem {real_users} usuários reais - use um Postgres local vazio')
+
+        cur.execute('SELECT count(*) FROM users')
+        if cur.fetchone()[0] == users:
+            print(f"♻️ Reaproveitando {users} usuários sintéticos")
+            return
+
+        print(f"🌱 Populando {users} usuários sintéticos...")
+        started = time.perf_counter()
+        cur.execute('DELETE FROM users WHERE user_id LIKE %s', (USER_PREFIX + '%',))
+        cur.execute('SELECT setseed(0.42)')
+        params = {'prefix': USER_PREFIX, 'users': users}
+        cur.execute(SEED_USERS_SQL, params)
+        cur.execute(SEED_GAME_STATES_SQL, params)
+        conn.commit()
+        print(f"✅ Dados gerados em {time.perf_counter() - started:.1f}s")
+
+    # VACUUM fora de transação: estatísticas + visibility map (index-only scans)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('VACUUM ANALYZE users')
+            cur.execute('VACUUM ANALYZE user_game_states')
+    finally:
+        conn.autocommit = False
+
+
+def target_user(conn, rank: int) -> str:
+    with conn.cursor() as cur:
+        cur.execute('''
+            SELECT user_id FROM user_game_states
+            ORDER BY total_coins DESC, prestige_level DESC, level DESC
+            OFFSET %s LIMIT 1
+        ''', (max(0, rank - 1),))
+        row = cur.fetchone()
+    if not row:
+        raise RuntimeError(f'sem usuário na posição {rank}')
+    return row[0]
+
+
+def hot_queries(db_models, user_id: str) -> List[Tuple[str, str, tuple]]:
+    """(nome, SQL do app, parâmetros) de cada consulta quente"""
+    now = datetime.now()
+    save_seq = int(time.time() * 1000)
+    return [
+        ('get_user_data', db_models.USER_DATA_QUERY, (user_id,)),
+        ('get_ranking', db_models.RANKING_QUERY, (10,)),
+        ('get_user_overview', db_models.USER_OVERVIEW_QUERY, (10, user_id)),
+        ('count_ranked_ahead', db_models.COUNT_AHEAD_QUERY, (50000, 1, 12)),
+        ('save_user', db_models.SAVE_USER_QUERY, (
+            user_id, f'{user_id}@example.com', 'Jogador', None, True, now, now, '{}'
+        )),
+        ('save_game_state', db_models.SAVE_GAME_STATE_QUERY, (
+            user_id, 1000, 2.5, 4.0, 50000, 1, 1200, 12, 300,
+            json.dumps({'click_power': 5, 'auto_clickers': 3, 'click_bots': 1}),
+            json.dumps(['first_coins']), json.dumps([]), now, save_seq, save_seq, save_seq
+        )),
+    ]
+
+
+# ========== PLANOS ==========
+
+def explain(conn, sql: str, params: tuple) -> Dict[str, Any]:
+    """EXPLAIN ANALYZE em transação desfeita (escritas não persistem)"""
+    try:
+        with conn.cursor() as cur:
+            # Primeira execução aquece o cache: o que se compara é o total de buffers tocados
+            cur.execute(sql, params)
+            cur.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params)
+            return cur.fetchone()[0][0]
+    finally:
+        conn.rollback()
+
+
+def walk(node: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk(child)
+
+
+def plan_issues(plan: Dict[str, Any]) -> List[str]:
+    issues = []
+    for node in walk(plan['Plan']):
+        node_type = node['Node Type']
+        if node_type == 'Seq Scan' and node.get('Relation Name') in WATCHED_TABLES:
+            issues.append(f"Seq Scan em {node['Relation Name']} ({node.get('Actual Rows', '?')} linhas)")
+        if node_type == 'Sort' and (node.get('Sort Space Type') == 'Disk'
+                                    or 'external' in node.get('Sort Method', '')):
+            issues.append(f"Sort em disco ({node.get('Sort Method')}, {node.get('Sort Space Used')} kB)")
+        if node_type == 'Hash' and node.get('Hash Batches', 1) > 1:
+            issues.append(f"Hash em {node['Hash Batches']} lotes (transbordou work_mem)")
+    return issues
+
+
+def plan_summary(plan: Dict[str, Any]) -> Dict[str, Any]:
+    root = plan['Plan']
+    return {
+        'buffers': root.get('Shared Hit Blocks', 0) + root.get('Shared Read Blocks', 0),
+        'execution_ms': round(plan.get('Execution Time', 0.0), 3),
+        'shape': [
+            f"{node['Node Type']}:{node.get('Index Name') or node.get('Relation Name') or ''}".rstrip(':')
+            for node in walk(root)
+        ],
+    }
+
+
+def load_baseline(path: pathlib.Path) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Regressão de planos das consultas quentes')
+    parser.add_argument('--postgres', action='store_true', help='Sobe um Postgres descartável')
+    parser.add_argument('--database-url', help='Postgres local (vazio ou só com dados sintéticos)')
+    parser.add_argument('--sslmode', default=os.environ.get('DATABASE_SSLMODE', 'disable'))
+    parser.add_argument('--users', type=int, default=DEFAULT_USERS)
+    parser.add_argument('--target-rank', type=int, default=1000,
+                        help='Posição no ranking do usuário consultado')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Fração de aumento de buffers aceita (0.25 = 25%%)')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output', help='Diretório para gravar os planos completos em JSON')
+    args = parser.parse_args()
+
+    if not args.postgres and not args.database_url:
+        parser.error('informe --postgres ou --database-url')
+
+    with ExitStack() as stack:
+        database_url: Optional[str] = args.database_url
+        if args.postgres:
+            database_url = stack.enter_context(TemporaryPostgres())
+
+        # ✅ Schema e índices pelo próprio create_tables (o DatabaseManager lê o ambiente no import)
+        os.environ['DATABASE_URL'] = database_url
+        os.environ['DATABASE_SSLMODE'] = args.sslmode
+        from database import db_models
+        if not db_models.db_manager or not db_models.db_manager.pool_stats()['max']:
+            print("❌ Não foi possível conectar ao Postgres")
+            sys.exit(2)
+
+        conn = connect(database_url, args.sslmode)
+        stack.callback(conn.close)
+        try:
+            seed(conn, args.users)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(2)
+        # ✅ O create_tables só dispara os índices em segundo plano; os planos precisam deles prontos
+        if not db_models.db_manager.ensure_indexes(wait=True):
+            print("❌ Falha ao criar os índices")
+            sys.exit(2)
+
+        user_id = target_user(conn, args.target_rank)
+        baseline_path = pathlib.Path(args.baseline)
+        baseline = load_baseline(baseline_path)
+        if baseline and baseline.get('users') != args.users:
+            print(f"⚠️ Baseline gravado com {baseline.get('users')} usuários; comparação de buffers desligada")
+            baseline = {}
+        reference = baseline.get('queries', {})
+
+        output_dir = pathlib.Path(args.output) if args.output else None
+        if output_dir:
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+        print(f"\n{'consulta':<20}{'buffers':>10}{'baseline':>10}{'tempo ms':>10}  problemas")
+        summaries = {}
+        failures = []
+        for name, sql, params in hot_queries(db_models, user_id):
+            plan = explain(conn, sql, params)
+            summary = plan_summary(plan)
+            summaries[name] = summary
+            if output_dir:
+                (output_dir / f'{name}.json').write_text(json.dumps(plan, indent=2))
+
+            issues = plan_issues(plan)
+            previous = reference.get(name)
+            if previous:
+                limit = max(previous['buffers'] * (1 + args.threshold), previous['buffers'] + MIN_BUFFER_DELTA)
+                if summary['buffers'] > limit:
+                    issues.append(f"buffers {previous['buffers']} -> {summary['buffers']}")
+                if summary['shape'] != previous['shape']:
+                    print(f"   ℹ️ {name}: plano mudou: {' > '.join(summary['shape'])}")
+            if issues:
+                failures.append(name)
+
+            print(f"{name:<20}{summary['buffers']:>10}{previous['buffers'] if previous else '-':>10}"
+                  f"{summary['execution_ms']:>10.2f}  {'; '.join(issues) or '✅'}")
+
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as baseline_file:
+            json.dump({'users': args.users, 'target_rank': args.target_rank, 'queries': summaries},
+                      baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f"\n✅ Baseline gravado em {baseline_path}")
+
+    if failures:
+        print(f"\n❌ Planos com problema: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n✅ Nenhum Seq Scan, spill ou regressão de buffers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+# tools/replay.py
+"""
+Replay do diário de ações: estado de um jogador em qualquer instante
+
+Lê do game_events (database/event_log.py) o snapshot ou save mais recente
+até --at e reaplica só os eventos seguintes com as regras do GameManager
+(game/replay.py), em blocos de --chunk-size via cursor no servidor. Mostra o
+ponto de partida, quantos eventos e ações foram reaplicados e a vazão.
+
+Com --apply o estado reconstruído vira o estado atual do jogador (restaurar
+depois de um save ruim): é salvo pelo GameManager em um DatabaseManager de
+--state-database-url (padrão: o próprio --database-url, nunca a DATABASE_URL
+do ambiente) e registrado como um save, que passa a ser o novo ponto de
+partida, no diário de --database-url.
+
+--synthetic N não usa banco: gera um diário de N ações com as regras do
+jogo (snapshots a cada --snapshot-every cliques), reconstrói o estado final
+pelo último snapshot e desde o cadastro, confere que os dois batem com o
+estado gerado e compara as vazões.
+
+Uso:
+    python -m tools.replay --user UID [--at 2026-10-19T12:00:00] [--chunk-size 5000]
+    python -m tools.replay --user UID --at 2026-10-19T12:00:00 --apply
+    python -m tools.replay --user UID --apply --database-url $EVENTOS --state-database-url $JOGO
+    python -m tools.replay --synthetic 1000000 [--snapshot-every 100]
+"""
+import argparse
+import json
+import logging
+import os
+import pathlib
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from database.event_log import EventRecorder  # noqa: E402
+from game.game_logic import game_manager  # noqa: E402
+from game.journal import ActionJournal, compact_state  # noqa: E402
+from game.replay import JournalEntry, ReplayEngine  # noqa: E402
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def parse_instant(value: str) -> datetime:
+    """ISO 8601; sem fuso é UTC (o created_at do game_events é timestamptz)"""
+    instant = datetime.fromisoformat(value)
+    return instant if instant.tzinfo else instant.replace(tzinfo=timezone.utc)
+
+
+def chunked(entries: List[JournalEntry], chunk_size: int):
+    for start in range(0, len(entries), chunk_size):
+        yield entries[start:start + chunk_size]
+
+
+def print_result(label: str, result: Dict[str, Any]) -> None:
+    print(f"  {label}: {result['entries']} eventos / {result['actions']} ações em {result['seconds']:.3f}s "
+          f"({result['entries_per_second']:,.0f} eventos/s, {result['actions_per_second']:,.0f} ações/s)")
+    if result['rejected']:
+        print(f"  ⚠️ {result['rejected']} ações recusadas pelas regras atuais (diário e regras divergem)")
+
+
+# ========== DIÁRIO SINTÉTICO ==========
+
+def synthetic_journal(engine: ReplayEngine, actions: int, snapshot_every: int,
+                      seed: int) -> Tuple[List[JournalEntry], Dict[str, Any]]:
+    """Diário gerado jogando de verdade: cliques em rajada, upgrades e prestígios
+
+    Snapshots seguem a regra do ActionJournal (a cada `snapshot_every` cliques).
+    """
+    rng = random.Random(seed)
+    state = engine.initial_state()
+    entries: List[JournalEntry] = []
+    instant = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    pending = done = 0
+
+    def record(event_type: str, payload: Dict[str, Any]) -> None:
+        nonlocal instant
+        instant += timedelta(milliseconds=1)
+        entries.append((instant, event_type, payload))
+
+    while done < actions:
+        roll = rng.random()
+        if roll < 0.01 and engine.game_manager.apply_prestige(state)['success']:
+            record('prestige', {})
+            count = 1
+        elif roll < 0.2:
+            upgrade_type = rng.choice(('click_power', 'auto_clickers', 'click_bots'))
+            if not engine.game_manager.apply_upgrade(state, upgrade_type)['success']:
+                continue
+            record('upgrade', {'upgrade_type': upgrade_type})
+            count = 1
+        else:
+            count = min(rng.randint(1, 20), actions - done)
+            for _ in range(count):
+                engine.game_manager.apply_click(state)
+            record('click', {'count': count})
+
+        done += count
+        pending += count
+        if pending >= snapshot_every:
+            record('snapshot', compact_state(state))
+            pending = 0
+
+    return entries, state
+
+
+def run_synthetic(engine: ReplayEngine, args) -> int:
+    print(f"🧪 Gerando diário sintético de {args.synthetic} ações (snapshot a cada {args.snapshot_every})...")
+    entries, expected = synthetic_journal(engine, args.synthetic, args.snapshot_every, args.seed)
+    anchors = [idx for idx, (_, event_type, _) in enumerate(entries) if event_type == 'snapshot']
+    print(f"  {len(entries)} eventos, {len(anchors)} snapshots")
+
+    print("⏱️ Reconstruindo o estado final:")
+    if anchors:
+        last = anchors[-1]
+        from_snapshot = engine.replay(chunked(entries[last + 1:], args.chunk_size),
+                                      engine.restore(entries[last][2]))
+    else:
+        from_snapshot = engine.replay(chunked(entries, args.chunk_size))
+    print_result('snapshot + cauda', from_snapshot)
+
+    # Desde o cadastro: só as ações, sem pular para os snapshots
+    actions_only = [entry for entry in entries if entry[1] != 'snapshot']
+    full = engine.replay(chunked(actions_only, args.chunk_size))
+    print_result('desde o cadastro', full)
+    if from_snapshot['seconds']:
+        print(f"  🚀 {full['seconds'] / from_snapshot['seconds']:,.0f}x mais rápido pelo snapshot")
+
+    expected = compact_state(expected)
+    mismatched = [name for name, result in (('snapshot + cauda', from_snapshot), ('desde o cadastro', full))
+                  if compact_state(result['state']) != expected]
+    if mismatched:
+        print(f"❌ Estado reconstruído diverge do gerado: {', '.join(mismatched)}")
+        return 1
+    print("✅ Estados reconstruídos iguais ao estado gerado")
+    return 0
+
+
+# ========== REPLAY DE UM JOGADOR ==========
+
+def run_user(engine: ReplayEngine, args) -> int:
+    import psycopg2
+
+    database_url = args.database_url
+    if not database_url:
+        print("❌ Informe --database-url (ou GAME_EVENTS_DATABASE_URL / DATABASE_URL)")
+        return 2
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+    until = args.at or datetime.now(timezone.utc)
+    conn = psycopg2.connect(dsn=database_url, sslmode=args.sslmode, connect_timeout=10)
+    try:
+        print(f"🔎 Reconstruindo {args.user} em {until.isoformat()}...")
+        result = engine.restore_user(conn, args.user, until, args.chunk_size)
+    finally:
+        conn.close()
+
+    anchor = result['anchor']
+    if anchor:
+        print(f"  ponto de partida: {anchor['type']} de {anchor['created_at'].isoformat()}")
+    else:
+        print("  sem snapshot nem save: reaplicando desde o cadastro")
+    if not anchor and not result['entries']:
+        print(f"❌ Nenhum evento de {args.user} até {until.isoformat()}")
+        return 1
+    print_result('cauda', result)
+
+    state = compact_state(result['state'])
+    print(json.dumps(state, indent=2, ensure_ascii=False, default=str))
+
+    if args.apply:
+        return apply_state(args, database_url, result['state'], until)
+    return 0
+
+
+def apply_state(args, database_url: str, state: Dict[str, Any], until: datetime) -> int:
+    """Salva o estado nos bancos dos argumentos (não nos singletons do app, que seguem o ambiente)"""
+    state_database_url = args.state_database_url or database_url
+    if state_database_url.startswith('postgres://'):
+        state_database_url = state_database_url.replace('postgres://', 'postgresql://', 1)
+
+    os.environ['DATABASE_SSLMODE'] = args.sslmode
+    from database.db_models import DatabaseManager
+    storage = DatabaseManager(state_database_url, name='replay', use_replicas=False)
+    if not storage.pool_stats()['max']:
+        print("❌ Não foi possível conectar ao banco do estado")
+        return 2
+
+    if not game_manager.save_game_state(args.user, state, storage=storage) or not state.get('save_applied'):
+        print("❌ Falha ao salvar o estado reconstruído")
+        return 1
+
+    recorder = EventRecorder(database_url, args.sslmode)
+    ActionJournal(recorder, snapshot_every=args.snapshot_every).record_state(args.user, state)
+    recorder.close()
+    if recorder.last_error:
+        print(f"⚠️ Estado salvo, mas o save pode não ter entrado no diário: {recorder.last_error}")
+        return 1
+    print(f"✅ Estado de {args.user} restaurado para {until.isoformat()}")
+    return 0
+
+
+# ========== CLI ==========
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Reconstrói o estado de um jogador pelo diário de ações')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--user', help='user_id do jogador')
+    target.add_argument('--synthetic', type=int, metavar='N', help='Benchmark sem banco com N ações')
+    parser.add_argument('--at', type=parse_instant, help='Instante (ISO 8601; sem fuso = UTC). Padrão: agora')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--apply', action='store_true', help='Salva o estado reconstruído como estado atual')
+    parser.add_argument('--database-url',
+                        default=os.environ.get('GAME_EVENTS_DATABASE_URL') or os.environ.get('DATABASE_URL'))
+    parser.add_argument('--state-database-url',
+                        help='--apply: banco do estado, se o diário estiver em outro (padrão: --database-url)')
+    parser.add_argument('--sslmode', default=os.environ.get('DATABASE_SSLMODE', 'require'))
+    parser.add_argument('--snapshot-every', type=int,
+                        default=int(os.environ.get('GAME_JOURNAL_SNAPSHOT_EVERY', 100)))
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.synthetic is not None and (args.apply or args.at):
+        parser.error('--apply e --at só valem com --user')
+    if args.state_database_url and not args.apply:
+        parser.error('--state-database-url só vale com --apply')
+
+    # Um log por clique/upgrade reaplicado afogaria a saída
+    logging.getLogger('game.game_logic').setLevel(logging.WARNING)
+
+    engine = ReplayEngine(game_manager)
+    sys.exit(run_synthetic(engine, args) if args.synthetic is not None else run_user(engine, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+# tools/reshard.py
+"""
+Resharding online: move jogadores entre os shards do Postgres quando o anel muda
+
+Compara o anel atual (--from, padrão DATABASE_SHARD_URLS) com o novo (--to),
+percorre cada shard de origem em lotes por user_id e leva para o novo dono
+os usuários que mudaram de shard (users + user_game_states). A paginação é
+por chave (user_id > último), então cada lote é uma transação curta: o app
+continua atendendo durante todo o processo.
+
+Etapas:
+1. copy: copia os usuários que mudam de shard, sem apagar nada. Pode ser
+   repetido; com --since, só os alterados depois do instante dado (passadas
+   de alcance enquanto o app ainda usa o anel antigo).
+2. finalize (ainda no anel antigo): para cada lote, trava os usuários na
+   origem (FOR UPDATE), copia de novo o que mudou desde o copy, confere que
+   state_version e updated_at ficaram iguais nos dois lados e coloca os
+   usuários na cerca (tabela reshard_fence na origem). Um trigger instalado
+   pelo finalize faz a origem recusar qualquer escrita de usuário cercado.
+3. Trocar DATABASE_SHARD_URLS do app pelo novo anel (deploy / restart).
+4. cleanup: confere que o destino tem cada usuário cercado com state_version
+   igual ou maior que a origem, apaga-o da origem e, com a cerca vazia,
+   remove o trigger.
+
+Entre o finalize e o fim da troca os usuários movidos ficam somente leitura
+no anel antigo: instâncias que ainda não trocaram recebem erro ao salvar
+(o save falha e o cliente tenta de novo), e só o novo dono aceita escritas.
+Assim os dois anéis nunca escrevem o mesmo usuário em bancos diferentes, que
+o upsert por state_version não saberia reconciliar.
+
+O upsert no destino só sobrescreve o estado se a origem tiver state_version
+maior (e o usuário se tiver updated_at maior): repetir copy ou retomar o
+finalize depois de uma falha é seguro. Um usuário que falhar na cópia (ex.:
+e-mail já usado por outro usuário no shard de destino) ou cujas versões não
+batam é listado e fica na origem, fora da cerca: não troque o anel com falhas.
+
+Nomes de shard iguais em --from e --to são o mesmo banco. Shards novos
+recebem o schema pelo próprio create_tables do DatabaseManager.
+
+Uso:
+    python -m tools.reshard --to "a=postgresql://...,b=postgresql://...,c=postgresql://..." plan
+    python -m tools.reshard --to "$NOVOS_SHARDS" copy [--batch-size 500]
+    python -m tools.reshard --to "$NOVOS_SHARDS" copy --since 2026-10-19T12:00:00
+    python -m tools.reshard --to "$NOVOS_SHARDS" finalize
+    python -m tools.reshard --to "$NOVOS_SHARDS" cleanup
+"""
+import argparse
+import os
+import pathlib
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import psycopg2  # noqa: E402
+from psycopg2.extras import Json, execute_values  # noqa: E402
+
+from database.sharding import HashRing, load_vnodes, parse_shard_urls  # noqa: E402
+
+DEFAULT_BATCH_SIZE = 500
+
+# Páginas por user_id (índice da chave primária); --since filtra pelas duas tabelas
+PAGE_QUERY = '''
+SELECT u.user_id
+FROM users u
+LEFT JOIN user_game_states g ON g.user_id = u.user_id
+WHERE u.user_id > %s
+  AND (%s::timestamp IS NULL OR u.updated_at >= %s::timestamp OR g.updated_at >= %s::timestamp)
+ORDER BY u.user_id
+LIMIT %s
+'''
+
+# Condição do upsert de cada tabela: só sobrescreve com dado mais novo
+UPSERT_GUARDS = {
+    'users': 'users.updated_at < EXCLUDED.updated_at',
+    'user_game_states': 'user_game_states.state_version < EXCLUDED.state_version',
+}
+
+# Versões de cada usuário (comparadas entre origem e destino antes de cercar ou apagar)
+VERSIONS_QUERY = '''
+SELECT u.user_id, u.updated_at, g.state_version
+FROM users u
+LEFT JOIN user_game_states g ON g.user_id = u.user_id
+WHERE u.user_id = ANY(%s)
+'''
+
+# Cerca na origem: usuários já copiados pelo finalize ficam somente leitura até o cleanup
+FENCE_SQL = '''
+CREATE TABLE IF NOT EXISTS reshard_fence (
+    user_id VARCHAR(255) PRIMARY KEY,
+    target TEXT NOT NULL,
+    fenced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE OR REPLACE FUNCTION reshard_fence_check() RETURNS trigger AS $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM reshard_fence WHERE user_id = NEW.user_id) THEN
+        RAISE EXCEPTION 'usuário % em migração de shard (somente leitura)', NEW.user_id
+            USING ERRCODE = 'read_only_sql_transaction';
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS reshard_fence_users ON users;
+CREATE TRIGGER reshard_fence_users BEFORE INSERT OR UPDATE ON users
+    FOR EACH ROW EXECUTE FUNCTION reshard_fence_check();
+DROP TRIGGER IF EXISTS reshard_fence_game_states ON user_game_states;
+CREATE TRIGGER reshard_fence_game_states BEFORE INSERT OR UPDATE ON user_game_states
+    FOR EACH ROW EXECUTE FUNCTION reshard_fence_check();
+'''
+
+UNFENCE_SQL = '''
+DROP TRIGGER IF EXISTS reshard_fence_users ON users;
+DROP TRIGGER IF EXISTS reshard_fence_game_states ON user_game_states;
+DROP FUNCTION IF EXISTS reshard_fence_check();
+DROP TABLE IF EXISTS reshard_fence;
+'''
+
+
+class VersionMismatch(Exception):
+    """Origem e destino com versões diferentes: o usuário não é cercado nem apagado"""
+
+
+# ========== CONEXÕES ==========
+
+def connect(dsn: str, sslmode: str):
+    return psycopg2.connect(dsn=dsn, sslmode=sslmode, connect_timeout=10)
+
+
+def prepare_schema(name: str, dsn: str, sslmode: str) -> None:
+    """Tabelas e índices pelo create_tables do app (shards novos chegam vazios)"""
+    os.environ['DATABASE_SSLMODE'] = sslmode
+    from database.db_models import DatabaseManager
+    manager = DatabaseManager(dsn, name=name, use_replicas=False)
+    # Índices prontos antes da cópia (no boot do app eles são criados em segundo plano)
+    manager.ensure_indexes(wait=True)
+
+
+# ========== CÓPIA ==========
+
+def iter_pages(conn, batch_size: int, since: Optional[datetime]) -> Iterator[List[str]]:
+    """user_ids da origem em páginas; cada página é lida em sua própria transação"""
+    last = ''
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(PAGE_QUERY, (last, since, since, since, batch_size))
+            page = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        if not page:
+            return
+        yield page
+        last = page[-1]
+
+
+def fetch_rows(cur, table: str, user_ids: Sequence[str], lock: bool) -> Tuple[List[str], List[tuple]]:
+    cur.execute(f"SELECT * FROM {table} WHERE user_id = ANY(%s){' FOR UPDATE' if lock else ''}",
+                (list(user_ids),))
+    columns = [column.name for column in cur.description]
+    rows = [tuple(Json(value) if isinstance(value, (dict, list)) else value for value in row)
+            for row in cur.fetchall()]
+    return columns, rows
+
+
+def upsert_rows(cur, table: str, columns: List[str], rows: List[tuple]) -> None:
+    if not rows:
+        return
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column != 'user_id')
+    execute_values(cur, f'''
+        INSERT INTO {table} ({', '.join(columns)}) VALUES %s
+        ON CONFLICT (user_id) DO UPDATE SET {updates}
+        WHERE {UPSERT_GUARDS[table]}
+    ''', rows)
+
+
+def fetch_versions(cur, user_ids: Sequence[str]) -> Dict[str, Tuple[Any, Optional[int]]]:
+    cur.execute(VERSIONS_QUERY, (list(user_ids),))
+    return {user_id: (updated_at, state_version) for user_id, updated_at, state_version in cur.fetchall()}
+
+
+def check_versions(source, target, user_ids: Sequence[str], exact: bool) -> None:
+    """Falha se o destino não tiver o usuário com as versões da origem
+
+    exact: versões iguais (finalize, com a origem travada). Senão basta o
+    destino não estar atrás (cleanup, quando o novo dono já pode ter salvo).
+    """
+    with source.cursor() as src:
+        expected = fetch_versions(src, user_ids)
+    with target.cursor() as dst:
+        found = fetch_versions(dst, user_ids)
+    target.commit()
+
+    for user_id in user_ids:
+        if user_id not in found:
+            raise VersionMismatch(f'{user_id} ausente no destino')
+        source_updated, source_version = expected.get(user_id, (None, None))
+        target_updated, target_version = found[user_id]
+        if exact and (source_version, source_updated) != (target_version, target_updated):
+            raise VersionMismatch(f'{user_id}: state_version {source_version} na origem, '
+                                  f'{target_version} no destino')
+        if not exact and (target_version or 0) < (source_version or 0):
+            raise VersionMismatch(f'{user_id}: destino atrás da origem '
+                                  f'(state_version {target_version} < {source_version})')
+
+
+def copy_users(source, target, user_ids: Sequence[str], lock: bool) -> None:
+    """Copia os usuários para o destino (commit no destino; a transação da origem fica aberta)"""
+    with source.cursor() as src:
+        tables = [(table, *fetch_rows(src, table, user_ids, lock)) for table in ('users', 'user_game_states')]
+    try:
+        with target.cursor() as dst:
+            for table, columns, rows in tables:
+                upsert_rows(dst, table, columns, rows)
+        target.commit()
+    except Exception:
+        target.rollback()
+        raise
+
+
+class Resharder:
+    """Move os usuários de cada shard de origem para o dono no novo anel"""
+
+    def __init__(self, old: List[Tuple[str, str]], new: List[Tuple[str, str]], sslmode: str,
+                 vnodes: int, batch_size: int):
+        self.new_ring = HashRing([name for name, _ in new], vnodes)
+        self.dsns = {**dict(old), **dict(new)}
+        self.sources = [name for name, _ in old]
+        self.targets = [name for name, _ in new]
+        self.sslmode = sslmode
+        self.batch_size = batch_size
+        self.connections: Dict[str, Any] = {}
+        self.failed: List[Tuple[str, str]] = []
+
+    def conn(self, name: str):
+        if name not in self.connections:
+            self.connections[name] = connect(self.dsns[name], self.sslmode)
+        return self.connections[name]
+
+    def close(self) -> None:
+        for conn in self.connections.values():
+            conn.close()
+
+    def moves(self, source: str, page: List[str]) -> Dict[str, List[str]]:
+        """Usuários da página que pertencem a outro shard no novo anel, por destino"""
+        by_target: Dict[str, List[str]] = {}
+        for user_id in page:
+            target = self.new_ring.node_for(user_id)
+            if target != source:
+                by_target.setdefault(target, []).append(user_id)
+        return by_target
+
+    def install_fences(self) -> None:
+        """Cria a cerca e o trigger em cada origem (idempotente)"""
+        for source in self.sources:
+            conn = self.conn(source)
+            with conn.cursor() as cur:
+                cur.execute(FENCE_SQL)
+            conn.commit()
+
+    def plan(self) -> Counter:
+        moves: Counter = Counter()
+        for source in self.sources:
+            for page in iter_pages(self.conn(source), self.batch_size, None):
+                for target, user_ids in self.moves(source, page).items():
+                    moves[(source, target)] += len(user_ids)
+        return moves
+
+    def run(self, finalize: bool, since: Optional[datetime]) -> int:
+        moved = 0
+        for source in self.sources:
+            started = time.perf_counter()
+            count = 0
+            for page in iter_pages(self.conn(source), self.batch_size, since):
+                for target, user_ids in self.moves(source, page).items():
+                    count += self.move_batch(source, target, user_ids, finalize)
+            elapsed = time.perf_counter() - started
+            print(f"  {source}: {count} usuários em {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f}/s)")
+            moved += count
+        return moved
+
+    def cleanup(self) -> int:
+        """Apaga da origem os usuários cercados e, com a cerca vazia, remove o trigger"""
+        removed = 0
+        for source in self.sources:
+            conn = self.conn(source)
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass('reshard_fence') IS NOT NULL")
+                fenced = cur.fetchone()[0]
+            conn.commit()
+            if not fenced:
+                continue
+
+            count = 0
+            last = ''
+            while True:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT user_id, target FROM reshard_fence WHERE user_id > %s '
+                                'ORDER BY user_id LIMIT %s', (last, self.batch_size))
+                    page = cur.fetchall()
+                conn.commit()
+                if not page:
+                    break
+                last = page[-1][0]
+                by_target: Dict[str, List[str]] = {}
+                for user_id, target in page:
+                    by_target.setdefault(target, []).append(user_id)
+                for target, user_ids in by_target.items():
+                    if target not in self.dsns:
+                        self.failed.extend((user_id, f"shard '{target}' fora do --to") for user_id in user_ids)
+                        continue
+                    count += self.in_batches(user_ids, lambda ids: self._remove(conn, self.conn(target), ids))
+
+            with conn.cursor() as cur:
+                cur.execute('SELECT count(*) FROM reshard_fence')
+                remaining = cur.fetchone()[0]
+                if not remaining:
+                    cur.execute(UNFENCE_SQL)
+            conn.commit()
+            print(f"  {source}: {count} usuários apagados"
+                  f"{f', {remaining} ainda cercados' if remaining else ', cerca removida'}")
+            removed += count
+        return removed
+
+    def move_batch(self, source: str, target: str, user_ids: List[str], finalize: bool) -> int:
+        """Copia (e no finalize cerca na origem) um lote"""
+        source_conn = self.conn(source)
+        target_conn = self.conn(target)
+        return self.in_batches(user_ids, lambda ids: self._move(source_conn, target_conn, target, ids, finalize))
+
+    def in_batches(self, user_ids: List[str], step: Callable[[List[str]], None]) -> int:
+        """Aplica `step` ao lote inteiro; se ele falhar, usuário a usuário (falhas vão para `failed`)"""
+        if len(user_ids) > 1:
+            try:
+                step(user_ids)
+                return len(user_ids)
+            except (psycopg2.Error, VersionMismatch):
+                self.rollback_all()
+        done = 0
+        for user_id in user_ids:
+            try:
+                step([user_id])
+                done += 1
+            except (psycopg2.Error, VersionMismatch) as e:
+                self.rollback_all()
+                self.failed.append((user_id, str(e).strip().splitlines()[0]))
+        return done
+
+    def rollback_all(self) -> None:
+        for conn in self.connections.values():
+            conn.rollback()
+
+    def _move(self, source_conn, target_conn, target: str, user_ids: List[str], finalize: bool) -> None:
+        # finalize: FOR UPDATE segura os saves do anel antigo até a cerca entrar em vigor (commit)
+        copy_users(source_conn, target_conn, user_ids, lock=finalize)
+        if finalize:
+            check_versions(source_conn, target_conn, user_ids, exact=True)
+            with source_conn.cursor() as cur:
+                execute_values(cur, 'INSERT INTO reshard_fence (user_id, target) VALUES %s '
+                                    'ON CONFLICT (user_id) DO UPDATE SET target = EXCLUDED.target',
+                               [(user_id, target) for user_id in user_ids])
+        source_conn.commit()
+
+    def _remove(self, source_conn, target_conn, user_ids: List[str]) -> None:
+        # Cercados não recebem escrita na origem: basta o destino não estar atrás dela
+        check_versions(source_conn, target_conn, user_ids, exact=False)
+        with source_conn.cursor() as cur:
+            cur.execute('DELETE FROM users WHERE user_id = ANY(%s)', (user_ids,))
+            cur.execute('DELETE FROM reshard_fence WHERE user_id = ANY(%s)', (user_ids,))
+        source_conn.commit()
+
+
+# ========== CLI ==========
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Move jogadores entre shards do Postgres (hash consistente)')
+    parser.add_argument('action', choices=('plan', 'copy', 'finalize', 'cleanup'))
+    parser.add_argument('--from', dest='old', default=os.environ.get('DATABASE_SHARD_URLS', ''),
+                        help='Anel atual (padrão: DATABASE_SHARD_URLS)')
+    parser.add_argument('--to', dest='new', required=True, help='Novo anel, no formato de DATABASE_SHARD_URLS')
+    parser.add_argument('--vnodes', type=int, default=load_vnodes())
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--since', type=datetime.fromisoformat,
+                        help='copy: só usuários alterados a partir deste instante (ISO 8601, horário do banco)')
+    parser.add_argument('--sslmode', default=os.environ.get('DATABASE_SSLMODE', 'require'))
+    args = parser.parse_args()
+
+    old, new = parse_shard_urls(args.old), parse_shard_urls(args.new)
+    if not old or not new:
+        parser.error('informe os dois anéis (--from / DATABASE_SHARD_URLS e --to)')
+    for name, dsn in old:
+        if dict(new).get(name, dsn) != dsn:
+            parser.error(f"o shard '{name}' aponta para bancos diferentes em --from e --to")
+    if args.since and args.action != 'copy':
+        parser.error('--since só vale para copy')
+
+    resharder = Resharder(old, new, args.sslmode, args.vnodes, args.batch_size)
+    try:
+        if args.action == 'plan':
+            distribution = resharder.new_ring.distribution()
+            print("🧭 Novo anel (fração do espaço de hash):")
+            for name, share in distribution.items():
+                print(f"  {name}: {share:.1%}")
+            moves = resharder.plan()
+            print(f"🚚 {sum(moves.values())} usuários mudam de shard:")
+            for (source, target), count in sorted(moves.items()):
+                print(f"  {source} -> {target}: {count}")
+            return
+
+        if args.action == 'cleanup':
+            print("🧹 Apagando da origem os usuários cercados...")
+            removed = resharder.cleanup()
+            print(f"✅ {removed} usuários apagados da origem")
+        else:
+            for name in resharder.targets:
+                if name not in resharder.sources:
+                    prepare_schema(name, resharder.dsns[name], args.sslmode)
+
+            if args.action == 'finalize':
+                resharder.install_fences()
+            print(f"{'🔒 Finalizando' if args.action == 'finalize' else '📦 Copiando'} usuários...")
+            moved = resharder.run(args.action == 'finalize', args.since)
+            print(f"✅ {moved} usuários {'cercados na origem' if args.action == 'finalize' else 'copiados'}")
+            if args.action == 'finalize' and not resharder.failed:
+                print("➡️ Troque DATABASE_SHARD_URLS pelo novo anel e depois rode cleanup")
+        if resharder.failed:
+            print(f"❌ {len(resharder.failed)} usuários ficaram na origem:")
+            for user_id, error in resharder.failed:
+                print(f"  {user_id}: {error}")
+            sys.exit(1)
+    finally:
+        resharder.close()
+
+
+if __name__ == '__main__':
+    main()